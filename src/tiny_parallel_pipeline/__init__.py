@@ -1,8 +1,23 @@
 from .entities.resource import ResourceStatus, ResourceID, Resource
-from .entities.transition import TransitionCalculation
+from .entities.shared_data import SharedBuffer
+from .entities.stream import ChunkChannel, StreamResource
+from .entities.transition import RetryPolicy, TransitionCalculation
+from .entities.map_transition import MapTransition
+from .entities.subprocess_transition import SubprocessTransition
+from .duration_history import DurationHistory
+from .cache import ResultCache
+from .checkpoint import CheckpointJournal
+from .worker_registry import TransitionRegistry
+from .tracing import TransitionTrace, Tracer
+from .metrics import ExecutorMetrics, serve_metrics
+from .remote import RemoteWorkerPool, WorkerLostError, launch_local_workers
 from .execute import Scheduler, Executor
 
 
-__all__ = ['ResourceStatus', 'ResourceID', 'Resource',
-           'TransitionCalculation',
+__all__ = ['ResourceStatus', 'ResourceID', 'Resource', 'SharedBuffer',
+           'ChunkChannel', 'StreamResource',
+           'RetryPolicy', 'TransitionCalculation', 'MapTransition', 'SubprocessTransition',
+           'DurationHistory', 'ResultCache', 'CheckpointJournal', 'TransitionRegistry',
+           'TransitionTrace', 'Tracer', 'ExecutorMetrics', 'serve_metrics',
+           'RemoteWorkerPool', 'WorkerLostError', 'launch_local_workers',
            'Scheduler', 'Executor']
@@ -0,0 +1,89 @@
+import argparse
+import asyncio
+import statistics
+import time
+from typing import override
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.benchmarks.scheduler_bench import BenchResource
+
+
+class SumTransition(tpp.TransitionCalculation):
+    'Sum of the input data, modulo modulus if given'
+    def __init__(self, name: str, modulus: int | None = None):
+        super().__init__(name)
+        self._modulus = modulus
+
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        total = sum(r.data for r in in_resources)
+        out_resources[0].populate_data(total if self._modulus is None else total % self._modulus)
+        return True, None
+
+
+def build_groups(group_count: int, chains_per_group: int, chain_length: int, modulus: int
+                 ) -> tuple[tpp.Scheduler, list[tpp.Resource]]:
+    '''Chains from their own leaf input, the first transition taking it modulo modulus, joined per
+    group; returns the scheduler and the leaves.'''
+    leaves, transitions = [], []
+    for g in range(group_count):
+        chain_ends = []
+        for c in range(chains_per_group):
+            leaf = BenchResource(f'g{g}-c{c}-leaf').populate_data(0).update_status(
+                tpp.ResourceStatus.READY)
+            leaves.append(leaf)
+            previous = leaf
+            for i in range(chain_length):
+                r = BenchResource(f'g{g}-c{c}-r{i}')
+                transitions.append(SumTransition(f'g{g}-c{c}-T{i}', modulus if i == 0 else None)
+                                   .set_in_resources(previous).set_out_resources(r))
+                previous = r
+            chain_ends.append(previous)
+        transitions.append(SumTransition(f'g{g}-join').set_in_resources(*chain_ends)
+                           .set_out_resources(BenchResource(f'g{g}-sum')))
+    scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    return scheduler, leaves
+
+
+def update_latency(scheduler: tpp.Scheduler, leaf: tpp.Resource, new_data: int) -> float:
+    start = time.perf_counter()
+    leaf.populate_data(new_data)
+    is_ok, err_msg = scheduler.notify_changed(leaf)
+    assert is_ok, err_msg
+    is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+    assert is_ok, err_msg
+    return time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description='Latency of single input updates re-run by Scheduler.notify_changed')
+    ap.add_argument('-g', '--groups', type=int, default=100)
+    ap.add_argument('-c', '--chains-per-group', type=int, default=100)
+    ap.add_argument('-l', '--chain-length', type=int, default=10)
+    ap.add_argument('-u', '--updates', type=int, default=100)
+    args = ap.parse_args()
+
+    modulus = 1000
+    scheduler, leaves = build_groups(args.groups, args.chains_per_group, args.chain_length,
+                                     modulus)
+    start = time.perf_counter()
+    is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+    assert is_ok, err_msg
+    print(f'{len(scheduler._transitions)} transitions, full run '
+          f'{time.perf_counter() - start:.3f}s')
+
+    step = max(1, len(leaves) // args.updates)
+    # A leaf change goes down its chain to the join; a change by the modulus stops at once.
+    for label, delta in [('propagated', 1), ('cut off', modulus)]:
+        latencies = [update_latency(scheduler, leaf, leaf.data + delta)
+                     for leaf in leaves[::step][:args.updates]]
+        print(f'update {label:<10}: median {statistics.median(latencies) * 1e3:.3f}ms, '
+              f'max {max(latencies) * 1e3:.3f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import time
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.benchmarks.run_all import PayloadTransition
+from tiny_parallel_pipeline.benchmarks.scheduler_bench import BenchResource
+
+
+def build_chains(chain_count: int, chain_length: int, payload_bytes: int) -> tpp.Scheduler:
+    'Independent chains of pool transitions handing a payload along'
+    transitions = []
+    for c in range(chain_count):
+        resources = [BenchResource(f'c{c}-r{i}') for i in range(chain_length + 1)]
+        resources[0].populate_data(b'x' * payload_bytes).update_status(tpp.ResourceStatus.READY)
+        transitions += [PayloadTransition(f'c{c}-T{i}', allow_multiprocess_pool=True)
+                            .set_in_resources(resources[i]).set_out_resources(resources[i + 1])
+                        for i in range(chain_length)]
+    scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    return scheduler
+
+
+def bench_chains(locality: bool, worker_count: int, chain_count: int, chain_length: int,
+                 payload_bytes: int) -> dict:
+    scheduler = build_chains(chain_count, chain_length, payload_bytes)
+    pool = tpp.RemoteWorkerPool(locality=locality)
+    workers = tpp.launch_local_workers(pool.address, worker_count)
+    try:
+        assert pool.wait_for_workers(worker_count, timeout=30.0)
+        start = time.perf_counter()
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+        elapsed = time.perf_counter() - start
+        assert is_ok, err_msg
+        return dict(pool.transfer_stats(), seconds=elapsed)
+    finally:
+        pool.shutdown()
+        for p in workers:
+            p.wait()
+
+
+def main():
+    ap = argparse.ArgumentParser(
+        description='Bytes moved to and from RemoteWorkerPool workers, with and without locality')
+    ap.add_argument('-w', '--workers', type=int, default=4)
+    ap.add_argument('-c', '--chains', type=int, default=8)
+    ap.add_argument('-l', '--chain-length', type=int, default=10)
+    ap.add_argument('-b', '--payload-bytes', type=int, default=4 * 2**20)
+    args = ap.parse_args()
+
+    for locality in [False, True]:
+        result = bench_chains(locality, args.workers, args.chains, args.chain_length,
+                              args.payload_bytes)
+        print(f'locality {'on ' if locality else 'off'}: {result['seconds']:.3f}s, '
+              f'sent {result['bytes_sent'] / 2**20:.1f}MiB, '
+              f'received {result['bytes_received'] / 2**20:.1f}MiB, '
+              f'inputs reused {result['input_bytes_reused'] / 2**20:.1f}MiB')
+
+
+if __name__ == '__main__':
+    main()
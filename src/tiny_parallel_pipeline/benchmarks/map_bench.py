@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import multiprocessing
+import time
+import tracemalloc
+from typing import override
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.benchmarks.scheduler_bench import BenchResource
+
+
+def square(item: int) -> int:
+    return item * item
+
+
+class SquareTransition(tpp.TransitionCalculation):
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        out_resources[0].populate_data(square(in_resources[0].data))
+        return True, None
+
+
+class SquareMapTransition(tpp.MapTransition):
+    @override
+    def map_item(self, item: int) -> int:
+        return square(item)
+
+
+def build_per_item(item_count: int, use_pool: bool) -> tpp.Scheduler:
+    'One transition and two resources per item'
+    transitions = [
+        SquareTransition(f'T{i}', allow_multiprocess_pool=use_pool)
+            .set_in_resources(
+                BenchResource(f'in-{i}').populate_data(i).update_status(tpp.ResourceStatus.READY))
+            .set_out_resources(BenchResource(f'out-{i}'))
+        for i in range(item_count)]
+    return tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+
+
+def build_map(item_count: int, use_pool: bool, batch_size: int) -> tpp.Scheduler:
+    items = (BenchResource('items').populate_data(list(range(item_count)))
+             .update_status(tpp.ResourceStatus.READY))
+    t = (SquareMapTransition('square', batch_size=batch_size, result_typecode='q',
+                             allow_multiprocess_pool=use_pool)
+         .set_in_resources(items).set_out_resources(BenchResource('squares')))
+    return tpp.Scheduler().add_transitions(t).pull_all_resources_from_transitions()
+
+
+def bench(build, pool: multiprocessing.pool.Pool | None) -> tuple[float, float]:
+    'Seconds to build, compile and run, and the peak MiB allocated on the way'
+    tracemalloc.start()
+    start = time.perf_counter()
+    scheduler = build()
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+    assert is_ok, err_msg
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    ap = argparse.ArgumentParser(description='One MapTransition vs one transition per item')
+    ap.add_argument('-n', '--items', type=int, default=100_000)
+    ap.add_argument('-b', '--batch-size', type=int, default=1_000)
+    ap.add_argument('-p', '--pool-size', type=int, default=0,
+                    help='Worker processes, 0 runs everything on the event loop')
+    args = ap.parse_args()
+
+    pool = multiprocessing.Pool(args.pool_size) if args.pool_size > 0 else None
+    try:
+        for label, build in [
+                ('per item', lambda: build_per_item(args.items, pool is not None)),
+                (f'map, batch {args.batch_size}',
+                 lambda: build_map(args.items, pool is not None, args.batch_size))]:
+            elapsed, peak_mib = bench(build, pool)
+            print(f'{label:>20}: {elapsed:8.3f}s {args.items / elapsed:12.0f} items/s '
+                  f'peak {peak_mib:8.1f} MiB')
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import pickle
+from typing import override
+
+import tiny_parallel_pipeline as tpp
+from tiny_parallel_pipeline.execute import _run_transition_execute
+from tiny_parallel_pipeline.worker_registry import run_registered_transition_execute
+
+from tiny_parallel_pipeline.benchmarks.scheduler_bench import BenchResource
+
+
+class LookupTransition(tpp.TransitionCalculation):
+    'Maps its input through a large static lookup table kept on self'
+    def __init__(self, name: str, lookup_table: dict[int, str]):
+        super().__init__(name, allow_multiprocess_pool=True)
+        self._lookup_table = lookup_table
+
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        out_resources[0].populate_data(self._lookup_table[in_resources[0].data])
+        return True, None
+
+
+def build(transition_count: int, table_size: int, static_input_size: int
+          ) -> tuple[list[LookupTransition], list[BenchResource]]:
+    lookup_table = {i: f'value-{i}' for i in range(table_size)}
+    static_input = (BenchResource('static')
+        .populate_data('s' * static_input_size).update_status(tpp.ResourceStatus.READY))
+    inputs = [BenchResource(f'in-{i}') for i in range(transition_count)]
+    transitions = [LookupTransition(f'T{i}', lookup_table)
+                       .set_in_resources(static_input, r)
+                       .set_out_resources(BenchResource(f'out-{i}'))
+                   for i, r in enumerate(inputs)]
+    return transitions, inputs
+
+
+def pickled_size(fn, *args) -> int:
+    'Size of what a pool pickles to send one task'
+    return len(pickle.dumps((fn, args), pickle.HIGHEST_PROTOCOL))
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Bytes pickled per pool task, with/without registry')
+    ap.add_argument('-n', '--transitions', type=int, default=1_000)
+    ap.add_argument('-t', '--table-size', type=int, default=10_000,
+                    help='Entries of the static lookup table each transition keeps on self')
+    ap.add_argument('-s', '--static-input-size', type=int, default=100_000,
+                    help='Bytes of the READY input shared by every transition')
+    args = ap.parse_args()
+
+    transitions, inputs = build(args.transitions, args.table_size, args.static_input_size)
+    registry = tpp.TransitionRegistry(*transitions)
+    registry_size = len(pickle.dumps(registry, pickle.HIGHEST_PROTOCOL))
+    for i, r in enumerate(inputs):
+        r.populate_data(i % args.table_size).update_status(tpp.ResourceStatus.READY)
+
+    before = sum(pickled_size(_run_transition_execute, t) for t in transitions)
+    after = sum(pickled_size(run_registered_transition_execute, *registry.task_args(t))
+                for t in transitions)
+    print(f'whole transition per task: {before / len(transitions):12.0f} bytes/task')
+    print(f'registry key + inputs:     {after / len(transitions):12.0f} bytes/task')
+    print(f'registry, once per worker: {registry_size:12d} bytes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import heapq
+import itertools
+import random
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.benchmarks.scheduler_bench import BenchResource, NoopTransition
+
+
+def build_chain_and_side_tasks(chain_length: int, side_task_count: int) -> list[NoopTransition]:
+    'A long chain competing with short independent tasks that are declared, hence ready, first'
+    root = BenchResource('root').populate_data('root').update_status(tpp.ResourceStatus.READY)
+    transitions = [NoopTransition(f'side-{i}').set_in_resources(root)
+                       .set_out_resources(BenchResource(f'side-{i}')).set_estimated_cost(1.0)
+                   for i in range(side_task_count)]
+    chain = [root] + [BenchResource(f'chain-{i}') for i in range(chain_length)]
+    transitions += [NoopTransition(f'chain-{i}').set_in_resources(chain[i])
+                        .set_out_resources(chain[i + 1]).set_estimated_cost(1.0)
+                    for i in range(chain_length)]
+    return transitions
+
+
+def build_random_layered_dag(layer_count: int, layer_width: int, seed: int
+                             ) -> list[NoopTransition]:
+    rnd = random.Random(seed)
+    root = BenchResource('root').populate_data('root').update_status(tpp.ResourceStatus.READY)
+    previous_layer = [root]
+    transitions = []
+    for layer in range(layer_count):
+        current_layer = []
+        for i in range(layer_width):
+            out = BenchResource(f'{layer}-{i}')
+            in_resources = rnd.sample(previous_layer, min(len(previous_layer), rnd.randint(1, 3)))
+            transitions.append(NoopTransition(f'{layer}-{i}')
+                .set_in_resources(*in_resources)
+                .set_out_resources(out)
+                .set_estimated_cost(rnd.choice([0.1, 0.5, 1.0, 5.0])))
+            current_layer.append(out)
+        previous_layer = current_layer
+    return transitions
+
+
+def simulate_makespan(transitions: list[NoopTransition], worker_count: int,
+                      critical_path_priority: bool) -> float:
+    'Run the scheduler on a virtual clock where each transition takes its estimated cost'
+    scheduler = (tpp.Scheduler(critical_path_priority=critical_path_priority)
+        .add_transitions(*transitions)
+        .pull_all_resources_from_transitions())
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+
+    clock = 0.0
+    sequence = itertools.count()
+    running = []
+    while scheduler.remaining_resources_count() > 0:
+        for t in scheduler.pop_ready_to_execute_transitions(worker_count - len(running)):
+            heapq.heappush(running, (clock + t.estimated_cost, next(sequence), t))
+        clock, _, t = heapq.heappop(running)
+        for r in t._out_resources:
+            r.populate_data(True).update_status(tpp.ResourceStatus.READY)
+        scheduler.on_transition_succeed(t)
+    return clock
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Makespan of critical-path priority vs FIFO order')
+    ap.add_argument('-w', '--workers', type=int, default=4, help='Concurrent transitions')
+    ap.add_argument('-s', '--seed', type=int, default=7, help='Random DAG seed')
+    args = ap.parse_args()
+
+    dags = {
+        'chain+side tasks': lambda: build_chain_and_side_tasks(40, 120),
+        'random layered': lambda: build_random_layered_dag(30, 20, args.seed),
+    }
+    for name, build in dags.items():
+        fifo = simulate_makespan(build(), args.workers, critical_path_priority=False)
+        ranked = simulate_makespan(build(), args.workers, critical_path_priority=True)
+        print(f'{name:>18}: FIFO {fifo:8.1f}  critical path {ranked:8.1f}  '
+              f'speedup {fifo / ranked:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import argparse
+from dataclasses import dataclass
+from functools import total_ordering
+import random
+import timeit
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.benchmarks.scheduler_bench import BenchResource
+
+
+@total_ordering
+@dataclass(frozen=True)
+class DataclassResourceID:
+    'The ResourceID before interning, as a baseline'
+    resource_cls: type
+    in_class_id: str
+
+    def __hash__(self):
+        return hash((self.resource_cls, self.in_class_id))
+
+    def __eq__(self, other):
+        if not isinstance(other, DataclassResourceID):
+            return False
+        return self.resource_cls == other.resource_cls and self.in_class_id == other.in_class_id
+
+    def __lt__(self, other):
+        if not isinstance(other, DataclassResourceID):
+            return NotImplemented
+        return (
+            (self.resource_cls.__name__, self.in_class_id) <
+                (other.resource_cls.__name__, other.in_class_id))
+
+
+def operations(id_cls: type, id_count: int) -> dict[str, tuple[callable, int]]:
+    'The ResourceID operations the Scheduler performs, each as (run once, operation count)'
+    in_class_ids = [f'r{i}' for i in range(id_count)]
+    ids = [id_cls(BenchResource, s) for s in in_class_ids]
+    # Lookups come from other objects carrying equal ids, as transitions' resources do.
+    lookup_ids = [id_cls(BenchResource, s) for s in in_class_ids]
+    id2index = {rid: i for i, rid in enumerate(ids)}
+    id_set = set(ids)
+    shuffled_ids = random.Random(0).sample(ids, len(ids))
+    sort_key = ((lambda rid: rid.sort_key) if id_cls is tpp.ResourceID else
+                (lambda rid: (rid.resource_cls.__name__, rid.in_class_id)))
+
+    return {
+        'construct existing': (lambda: [id_cls(BenchResource, s) for s in in_class_ids], id_count),
+        'hash': (lambda: [hash(rid) for rid in lookup_ids], id_count),
+        'equal': (lambda: [a == b for a, b in zip(ids, lookup_ids)], id_count),
+        'dict get': (lambda: [id2index.get(rid) for rid in lookup_ids], id_count),
+        'dict set': (lambda: {rid: i for i, rid in enumerate(lookup_ids)}, id_count),
+        'set contains': (lambda: [rid in id_set for rid in lookup_ids], id_count),
+        'set build': (lambda: set(lookup_ids), id_count),
+        'sorted': (lambda: sorted(shuffled_ids), id_count),
+        'sorted by key': (lambda: sorted(shuffled_ids, key=sort_key), id_count),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description='ResourceID micro-benchmarks, interned vs dataclass')
+    ap.add_argument('-n', '--ids', type=int, default=100_000)
+    ap.add_argument('-r', '--repeat', type=int, default=5)
+    args = ap.parse_args()
+
+    results = {label: operations(id_cls, args.ids)
+               for label, id_cls in [('dataclass', DataclassResourceID),
+                                     ('interned', tpp.ResourceID)]}
+    print(f'{'ns/op':>20} {'dataclass':>10} {'interned':>10} {'speedup':>8}')
+    for name in results['interned']:
+        ns_per_op = dict()
+        for label, ops in results.items():
+            fn, op_count = ops[name]
+            ns_per_op[label] = min(timeit.repeat(fn, number=1, repeat=args.repeat)) / op_count * 1e9
+        print(f'{name:>20} {ns_per_op['dataclass']:10.1f} {ns_per_op['interned']:10.1f} '
+              f'{ns_per_op['dataclass'] / ns_per_op['interned']:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import datetime
+import json
+import multiprocessing
+import platform
+import subprocess
+import sys
+import time
+from typing import override
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.benchmarks.scheduler_bench import (
+    BenchResource, build_chain, build_fan_out_fan_in, build_random_dag, bench_memory,
+    random_dag_transitions)
+
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+
+class PayloadTransition(tpp.TransitionCalculation):
+    'Sends its input back, so a pool task carries the payload both ways'
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        out_resources[0].populate_data(in_resources[0].data)
+        return True, None
+
+
+def bench_compile(shape: str, num_transitions: int) -> dict:
+    build = {'chain': build_chain, 'fan_out': build_fan_out_fan_in,
+             'random_dag': build_random_dag}[shape]
+    scheduler = build(num_transitions)
+    start = time.perf_counter()
+    is_ok, err_msg = scheduler.compile()
+    elapsed = time.perf_counter() - start
+    assert is_ok, err_msg
+    return {'seconds': elapsed, 'us_per_transition': elapsed / num_transitions * 1e6}
+
+
+def bench_compile_target(num_transitions: int, target_index: int = 100) -> dict:
+    '''Planning one early resource of a random DAG library. Only freeing the dropped part of the
+    scheduler's transition index grows with the library.'''
+    transitions = random_dag_transitions(num_transitions)
+    target = transitions[target_index]._out_resources[0]
+    scheduler = tpp.Scheduler().add_transitions(*transitions)
+    start = time.perf_counter()
+    is_ok, err_msg = scheduler.compile(targets=[target])
+    elapsed = time.perf_counter() - start
+    assert is_ok, err_msg
+    planned_count = len(scheduler._transitions)
+    return {'seconds': elapsed, 'planned_transitions': planned_count,
+            'us_per_transition': elapsed / planned_count * 1e6}
+
+
+def bench_executor(shape: str, num_transitions: int) -> dict:
+    'Executor.run with trivial transitions on the event loop, so scheduling overhead dominates'
+    build = {'chain': build_chain, 'fan_out': build_fan_out_fan_in}[shape]
+    scheduler = build(num_transitions, PayloadTransition)
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    start = time.perf_counter()
+    is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+    elapsed = time.perf_counter() - start
+    assert is_ok, err_msg
+    return {'seconds': elapsed, 'us_per_transition': elapsed / num_transitions * 1e6}
+
+
+def bench_pool(pool: multiprocessing.pool.Pool, payload_bytes: int, task_count: int,
+               max_in_flight: int) -> dict:
+    'Round trips of independent pool transitions; max_in_flight 1 gives the dispatch latency'
+    payload = b'x' * payload_bytes
+    transitions = [
+        PayloadTransition(f'T{i}', allow_multiprocess_pool=True)
+            .set_in_resources(BenchResource(f'in-{i}').populate_data(payload)
+                              .update_status(tpp.ResourceStatus.READY))
+            .set_out_resources(BenchResource(f'out-{i}'))
+        for i in range(task_count)]
+    scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    start = time.perf_counter()
+    is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool, max_in_flight=max_in_flight).run())
+    elapsed = time.perf_counter() - start
+    assert is_ok, err_msg
+    return {'seconds': elapsed, 'us_per_task': elapsed / task_count * 1e6,
+            'tasks_per_second': task_count / elapsed,
+            'mib_per_second': 2 * payload_bytes * task_count / elapsed / 2**20}
+
+
+def run_suites(suites: list[str], max_size: int, pool_size: int, pool_tasks: int,
+               payload_sizes: list[int]) -> dict[str, dict]:
+    sizes = [n for n in SIZES if n <= max_size]
+    results = dict()
+    def record(name: str, result: dict) -> None:
+        results[name] = result
+        print(f'{name:<40} ' + ' '.join(f'{k}={v:.4g}' for k, v in result.items()), flush=True)
+
+    if 'compile' in suites:
+        for shape in ['chain', 'fan_out', 'random_dag']:
+            for n in sizes:
+                record(f'compile/{shape}/{n}', bench_compile(shape, n))
+        for n in sizes:
+            record(f'compile/target/{n}', bench_compile_target(n))
+    if 'executor' in suites:
+        for shape in ['chain', 'fan_out']:
+            for n in sizes:
+                record(f'executor/{shape}/{n}', bench_executor(shape, n))
+    if 'memory' in suites:
+        for n in sizes:
+            record(f'memory/chain/{n}', bench_memory(n))
+    if 'pool' in suites:
+        with multiprocessing.Pool(pool_size) as pool:
+            for payload_bytes in payload_sizes:
+                record(f'pool/latency/{payload_bytes}B',
+                       bench_pool(pool, payload_bytes, max(1, pool_tasks // 10), 1))
+                record(f'pool/throughput/{payload_bytes}B',
+                       bench_pool(pool, payload_bytes, pool_tasks, 2 * pool_size))
+    return results
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': sys.version.split()[0], 'platform': platform.platform(),
+            'cpu_count': multiprocessing.cpu_count(),
+            'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')}
+
+
+# The metric compared between runs, lower is better, per suite.
+_COMPARED_METRICS = {'compile': 'us_per_transition', 'executor': 'us_per_transition',
+                     'memory': 'bytes_per_transition', 'pool': 'us_per_task'}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    'Print current against baseline; returns the names that got slower or bigger than threshold'
+    regressions = []
+    for name, result in current['results'].items():
+        base_result = baseline['results'].get(name)
+        metric = _COMPARED_METRICS[name.split('/')[0]]
+        if base_result is None or not base_result.get(metric):
+            continue
+        ratio = result[metric] / base_result[metric]
+        flag = ''
+        if ratio > threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f'{name:<40} {metric} {base_result[metric]:10.4g} -> {result[metric]:10.4g} '
+              f'x{ratio:5.2f}{flag}')
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Scheduler and Executor benchmark suite, saved as JSON')
+    ap.add_argument('-s', '--suites', nargs='+', default=list(_COMPARED_METRICS),
+                    choices=list(_COMPARED_METRICS))
+    ap.add_argument('-n', '--max-size', type=int, default=100_000,
+                    help=f'Largest graph size in transitions, out of {SIZES}')
+    ap.add_argument('-p', '--pool-size', type=int, default=4)
+    ap.add_argument('-t', '--pool-tasks', type=int, default=1_000)
+    ap.add_argument('--payload-sizes', type=int, nargs='+', default=[100, 100_000, 10_000_000],
+                    help='Bytes sent to and back from each pool task')
+    ap.add_argument('-o', '--output', help='Save results as JSON')
+    ap.add_argument('-c', '--compare', help='Compare with a JSON saved earlier')
+    ap.add_argument('--threshold', type=float, default=1.2,
+                    help='Slowdown ratio counted as a regression; any exits with status 1')
+    args = ap.parse_args()
+
+    current = {'environment': environment(),
+               'results': run_suites(args.suites, args.max_size, args.pool_size, args.pool_tasks,
+                                     args.payload_sizes)}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f'\nagainst {baseline['environment']['commit']}:')
+        if compare(baseline, current, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
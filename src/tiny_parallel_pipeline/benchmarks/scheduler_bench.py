@@ -0,0 +1,150 @@
+import argparse
+import random
+import time
+import tracemalloc
+from typing import override
+
+import tiny_parallel_pipeline as tpp
+
+
+class BenchResource(tpp.Resource):
+    pass
+
+
+class NoopTransition(tpp.TransitionCalculation):
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        return True, None
+
+
+def build_fan_out_fan_in(num_transitions: int,
+                         transition_cls: type[tpp.TransitionCalculation] = NoopTransition
+                         ) -> tpp.Scheduler:
+    'One source feeding num_transitions - 1 parallel transitions, joined by a final transition'
+    root = BenchResource('root').populate_data('root').update_status(tpp.ResourceStatus.READY)
+    mids = [BenchResource(f'mid-{i}') for i in range(num_transitions - 1)]
+    transitions = [transition_cls(f'T{i}').set_in_resources(root).set_out_resources(r)
+                   for i, r in enumerate(mids)]
+    transitions.append(
+        transition_cls('join').set_in_resources(*mids).set_out_resources(BenchResource('sink')))
+    return tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+
+
+def random_dag_transitions(num_transitions: int, max_inputs: int = 3, seed: int = 0
+                           ) -> list[tpp.TransitionCalculation]:
+    'Each transition reads up to max_inputs random earlier outputs or the source'
+    rng = random.Random(seed)
+    resources = [BenchResource('r0').populate_data('r0').update_status(tpp.ResourceStatus.READY)]
+    transitions = []
+    for i in range(1, num_transitions + 1):
+        in_resources = {resources[rng.randrange(len(resources))]
+                        for _ in range(rng.randint(1, max_inputs))}
+        resources.append(BenchResource(f'r{i}'))
+        transitions.append(NoopTransition(f'T{i}')
+                           .set_in_resources(*sorted(in_resources))
+                           .set_out_resources(resources[-1]))
+    return transitions
+
+
+def build_random_dag(num_transitions: int, max_inputs: int = 3, seed: int = 0) -> tpp.Scheduler:
+    return (tpp.Scheduler()
+            .add_transitions(*random_dag_transitions(num_transitions, max_inputs, seed))
+            .pull_all_resources_from_transitions())
+
+
+def chain_transitions(num_transitions: int,
+                      transition_cls: type[tpp.TransitionCalculation] = NoopTransition
+                      ) -> list[tpp.TransitionCalculation]:
+    resources = [BenchResource(f'r{i}') for i in range(num_transitions + 1)]
+    resources[0].populate_data('r0').update_status(tpp.ResourceStatus.READY)
+    return [transition_cls(f'T{i}')
+                .set_in_resources(resources[i - 1])
+                .set_out_resources(resources[i])
+            for i in range(1, len(resources))]
+
+
+def build_chain(num_transitions: int,
+                transition_cls: type[tpp.TransitionCalculation] = NoopTransition
+                ) -> tpp.Scheduler:
+    return (tpp.Scheduler().add_transitions(*chain_transitions(num_transitions, transition_cls))
+            .pull_all_resources_from_transitions())
+
+
+def drain(scheduler: tpp.Scheduler, bucket_size: int) -> int:
+    'Drive the scheduler without an event loop, as Executor would with bounded concurrency'
+    event_count = 0
+    while scheduler.remaining_resources_count() > 0:
+        transition_bucket = scheduler.pop_ready_to_execute_transitions(bucket_size)
+        assert len(transition_bucket) > 0
+        for t in transition_bucket:
+            for r in t._out_resources:
+                r.populate_data(True).update_status(tpp.ResourceStatus.READY)
+            scheduler.on_transition_succeed(t)
+            event_count += 1
+    return event_count
+
+
+def bench_scheduling(num_transitions: int, bucket_size: int) -> dict:
+    scheduler = build_fan_out_fan_in(num_transitions)
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    start = time.perf_counter()
+    event_count = drain(scheduler, bucket_size)
+    elapsed = time.perf_counter() - start
+    return {'transitions': num_transitions, 'bucket_size': bucket_size,
+            'seconds': elapsed, 'us_per_transition': elapsed / event_count * 1e6}
+
+
+def bench_compile(num_transitions: int) -> dict:
+    scheduler = build_chain(num_transitions)
+    start = time.perf_counter()
+    is_ok, err_msg = scheduler.compile()
+    elapsed = time.perf_counter() - start
+    assert is_ok, err_msg
+    return {'transitions': num_transitions, 'seconds': elapsed,
+            'us_per_transition': elapsed / num_transitions * 1e6}
+
+
+def bench_memory(num_transitions: int) -> dict:
+    'Memory the scheduler itself holds for a compiled chain, transitions and resources excluded'
+    transitions = chain_transitions(num_transitions)
+    tracemalloc.start()
+    scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'transitions': num_transitions, 'bytes': held,
+            'bytes_per_transition': held / num_transitions}
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Scheduler compile and ready-queue scaling benchmark')
+    ap.add_argument('-n', '--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                    help='Graph sizes in transitions')
+    ap.add_argument('-b', '--bucket-size', type=int, default=1,
+                    help='Transitions popped per scheduler event, like a max-in-flight limit')
+    ap.add_argument('-c', '--compile-sizes', type=int, nargs='+', default=[10_000, 1_000_000],
+                    help='Chain lengths to compile')
+    ap.add_argument('-m', '--memory-sizes', type=int, nargs='+', default=[100_000],
+                    help='Chain lengths to measure scheduler memory on')
+    args = ap.parse_args()
+
+    for n in args.memory_sizes:
+        result = bench_memory(n)
+        print(f'memory chain {result['transitions']:>10}: {result['bytes'] / 2**20:8.1f}MiB total '
+              f'{result['bytes_per_transition']:6.0f}B/transition')
+
+    for n in args.compile_sizes:
+        result = bench_compile(n)
+        print(f'compile chain {result['transitions']:>9}: {result['seconds']:8.3f}s total '
+              f'{result['us_per_transition']:6.2f}us/transition')
+
+    for n in args.sizes:
+        result = bench_scheduling(n, args.bucket_size)
+        print(f'{result['transitions']:>9} transitions: {result['seconds']:8.3f}s total '
+              f'{result['us_per_transition']:6.2f}us/transition')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+import hashlib
+import os
+import pickle
+
+
+from tiny_parallel_pipeline import StreamResource, TransitionCalculation
+
+
+class ResultCache:
+    '''Content-addressed store of transition outputs, an in-memory LRU in front of an optional
+    on-disk LRU. Both tiers evict least recently used entries once over their byte budget.
+
+    Only transitions with a cache_fingerprint are cached. The key covers the transition class,
+    the fingerprint and the pickled data of every input, so input data must pickle
+    deterministically for hits to happen. Transitions with stream resources are never cached.
+    Passed as Executor(cache=...), a hit gives a transition its outputs instead of executing it.
+    '''
+    def __init__(self, directory: str | None = None,
+                 max_memory_bytes: int = 64 << 20, max_disk_bytes: int = 1 << 30):
+        self._max_memory_bytes = max_memory_bytes
+        self._memory_bytes = 0
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+
+        self._directory = directory
+        self._max_disk_bytes = max_disk_bytes
+        self._disk_bytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    @staticmethod
+    def key(transition: TransitionCalculation) -> str | None:
+        if transition.cache_fingerprint is None:
+            return None
+        if any(isinstance(r, StreamResource)
+               for r in transition._in_resources + transition._out_resources):
+            return None
+        h = hashlib.sha256()
+        cls = transition.__class__
+        for part in (cls.__module__, cls.__qualname__, transition.cache_fingerprint):
+            h.update(part.encode())
+            h.update(b'\0')
+        for r in transition._in_resources:
+            h.update(str(r.id).encode())
+            h.update(b'\0')
+            h.update(hashlib.sha256(pickle.dumps(r.data, pickle.HIGHEST_PROTOCOL)).digest())
+        return h.hexdigest()
+
+    def get(self, key: str) -> list[any] | None:
+        'Output data of a cached transition, in out resources order'
+        payload = self._memory.get(key)
+        if payload is not None:
+            self._memory.move_to_end(key)
+            return pickle.loads(payload)
+        if self._directory is None:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        self._put_memory(key, payload)
+        return pickle.loads(payload)
+
+    def put(self, key: str, out_data: list[any]) -> None:
+        payload = pickle.dumps(out_data, pickle.HIGHEST_PROTOCOL)
+        self._put_memory(key, payload)
+        if self._directory is not None:
+            self._put_disk(key, payload)
+
+    def _put_memory(self, key: str, payload: bytes) -> None:
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        if len(payload) > self._max_memory_bytes:
+            return
+        self._memory[key] = payload
+        self._memory_bytes += len(payload)
+        while self._memory_bytes > self._max_memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _put_disk(self, key: str, payload: bytes) -> None:
+        path = self._path(key)
+        if os.path.exists(path):
+            os.utime(path)
+            return
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        self._disk_bytes += len(payload)
+        if self._disk_bytes > self._max_disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        entries = sorted(self._disk_entries())
+        self._disk_bytes = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if self._disk_bytes <= self._max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._disk_bytes -= size
+
+    def _disk_entries(self) -> list[tuple[float, str, int]]:
+        'Tuples of (last use time, path, size) of the on-disk entries'
+        entries = []
+        with os.scandir(self._directory) as it:
+            for entry in it:
+                if entry.name.endswith('.pkl'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, f'{key}.pkl')
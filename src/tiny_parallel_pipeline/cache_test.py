@@ -0,0 +1,96 @@
+import asyncio
+import os
+import pytest
+
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.entities.resource_test import DummyResource
+from tiny_parallel_pipeline.entities.transition_test import DummyTransitionCalculation
+
+
+# --- Test-specific subclass ---
+
+class CountingTransition(DummyTransitionCalculation):
+    execute_count = 0
+
+    async def _execute_impl(self, in_resources, out_resources):
+        CountingTransition.execute_count += 1
+        return await super()._execute_impl(in_resources, out_resources)
+
+
+def ready_resource(in_class_id, data):
+    return DummyResource(in_class_id).populate_data(data).update_status(tpp.ResourceStatus.READY)
+
+
+def cached_transition(name='T', data='d', fingerprint='v1'):
+    return (DummyTransitionCalculation(name)
+        .set_in_resources(ready_resource('A', data))
+        .set_out_resources(DummyResource('B'))
+        .set_cache_fingerprint(fingerprint))
+
+
+# --- Tests ---
+
+class TestResultCache:
+    def test_key(self):
+        key = tpp.ResultCache.key(cached_transition())
+        assert key == tpp.ResultCache.key(cached_transition(name='renamed'))
+        assert key != tpp.ResultCache.key(cached_transition(data='other'))
+        assert key != tpp.ResultCache.key(cached_transition(fingerprint='v2'))
+        assert tpp.ResultCache.key(cached_transition(fingerprint=None)) is None
+
+    def test_memory_lru(self):
+        cache = tpp.ResultCache(max_memory_bytes=200)
+        cache.put('a', ['x' * 60])
+        cache.put('b', ['y' * 60])
+        assert cache.get('a') == ['x' * 60]
+        cache.put('c', ['z' * 60])
+
+        assert cache.get('a') == ['x' * 60]
+        assert cache.get('b') is None
+        assert cache.get('c') == ['z' * 60]
+
+    def test_disk_persistence_and_lru(self, tmp_path):
+        cache = tpp.ResultCache(str(tmp_path), max_memory_bytes=0, max_disk_bytes=300)
+        cache.put('a', [b'x' * 100])
+        cache.put('b', [b'y' * 100])
+        os.utime(tmp_path / 'a.pkl', (1, 1))
+        os.utime(tmp_path / 'b.pkl', (2, 2))
+        assert cache.get('a') == [b'x' * 100]
+        cache.put('c', [b'z' * 100])
+
+        reopened = tpp.ResultCache(str(tmp_path))
+        assert reopened.get('a') == [b'x' * 100]
+        assert reopened.get('b') is None
+        assert reopened.get('c') == [b'z' * 100]
+
+
+class TestExecutorWithCache:
+    def run_pipeline(self, cache, data='d'):
+        a = ready_resource('A', data)
+        b, c = DummyResource('B'), DummyResource('C')
+        scheduler = tpp.Scheduler().add_transitions(
+            CountingTransition('T1', in_res=[a], out_res=[b]).set_cache_fingerprint('v1'),
+            CountingTransition('T2', in_res=[b], out_res=[c]),
+        ).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        asyncio.run(tpp.Executor(scheduler, cache=cache).run())
+        assert scheduler.remaining_resources_count() == 0
+        return b, c
+
+    def test_skips_cached_transition(self, tmp_path):
+        CountingTransition.execute_count = 0
+        b, c = self.run_pipeline(tpp.ResultCache(str(tmp_path)))
+        assert CountingTransition.execute_count == 2
+        assert b.data == 'by T1 A'
+
+        b, c = self.run_pipeline(tpp.ResultCache(str(tmp_path)))
+        assert CountingTransition.execute_count == 3
+        assert b.status == tpp.ResourceStatus.READY
+        assert b.data == 'by T1 A'
+        assert c.data == 'by T2 B'
+
+        self.run_pipeline(tpp.ResultCache(str(tmp_path)), data='changed')
+        assert CountingTransition.execute_count == 5
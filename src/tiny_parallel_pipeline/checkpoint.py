@@ -0,0 +1,109 @@
+import asyncio
+import concurrent.futures
+import os
+import pickle
+import struct
+
+
+from tiny_parallel_pipeline import ResourceStatus, StreamResource, TransitionCalculation
+
+
+class CheckpointJournal:
+    '''Append-only journal of the outputs of succeeded transitions, to resume a crashed run.
+
+    Executor(journal=...) records each succeeded transition; restore() populates the outputs
+    of a previous run into a new scheduler before it is compiled.
+
+    record() only queues the outputs; pickling, writing and fsync happen in batches on a single
+    writer thread, once batch_size records are queued or flush_interval seconds have passed.
+    Resources are matched by str(ResourceID) on restore, so ids must be stable across runs.
+    '''
+    _HEADER = struct.Struct('<I')
+
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.5):
+        self._path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._batch: list[list[tuple[str, any]]] = []
+        self._flush_timer: asyncio.TimerHandle | None = None
+        self._last_write: concurrent.futures.Future | None = None
+        self._writer = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='tpp-checkpoint')
+        self._file = None
+
+    @staticmethod
+    def load(path: str) -> dict[str, any]:
+        'Resource id string to data, for every record of the journal; a torn tail is ignored'
+        id_str_2_data = dict()
+        if not os.path.exists(path):
+            return id_str_2_data
+        header = CheckpointJournal._HEADER
+        with open(path, 'rb') as f:
+            while True:
+                size_bytes = f.read(header.size)
+                if len(size_bytes) < header.size:
+                    break
+                payload = f.read(header.unpack(size_bytes)[0])
+                try:
+                    records = pickle.loads(payload)
+                except Exception:
+                    break
+                for record in records:
+                    id_str_2_data.update(record)
+        return id_str_2_data
+
+    def restore(self, scheduler: 'Scheduler') -> int:
+        'Mark the journaled resources of a not yet compiled scheduler READY; returns their count'
+        if scheduler._compiled:
+            raise ValueError('Frozen after compiled.')
+        id_str_2_data = CheckpointJournal.load(self._path)
+        restored_count = 0
+        for r in scheduler._resources:
+            data = id_str_2_data.get(str(r.id))
+            if data is not None and r.status != ResourceStatus.READY:
+                r.populate_data(data).update_status(ResourceStatus.READY)
+                restored_count += 1
+        return restored_count
+
+    def record(self, transition: TransitionCalculation) -> None:
+        'Queue the outputs of a succeeded transition; call from the event loop'
+        self._batch.append([(str(r.id), r.data) for r in transition._out_resources
+                            if not isinstance(r, StreamResource)])
+        if len(self._batch) >= self._batch_size:
+            self._submit_batch()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(
+                self._flush_interval, self._submit_batch)
+
+    async def flush(self) -> None:
+        'Wait until everything recorded so far is written and fsynced'
+        self._submit_batch()
+        if self._last_write is not None:
+            await asyncio.wrap_future(self._last_write)
+
+    def close(self) -> None:
+        self._submit_batch()
+        self._writer.submit(self._close_file)
+        self._writer.shutdown(wait=True)
+
+    def _submit_batch(self) -> None:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        self._last_write = self._writer.submit(self._write_batch, batch)
+
+    def _write_batch(self, batch: list[list[tuple[str, any]]]) -> None:
+        if self._file is None:
+            self._file = open(self._path, 'ab')
+        payload = pickle.dumps(batch, pickle.HIGHEST_PROTOCOL)
+        self._file.write(CheckpointJournal._HEADER.pack(len(payload)) + payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
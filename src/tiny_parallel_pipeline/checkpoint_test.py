@@ -0,0 +1,87 @@
+import asyncio
+import os
+import pytest
+
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.entities.resource_test import DummyResource
+from tiny_parallel_pipeline.entities.transition_test import DummyTransitionCalculation
+
+
+# --- Test-specific subclass ---
+
+class CrashingTransition(DummyTransitionCalculation):
+    async def _execute_impl(self, in_resources, out_resources):
+        raise RuntimeError(f'{self.name} crashed')
+
+
+def chain_transitions(last_transition_cls):
+    resources = [DummyResource(f'r{i}') for i in range(4)]
+    resources[0].populate_data('d0').update_status(tpp.ResourceStatus.READY)
+    transitions = [
+        DummyTransitionCalculation('T1', in_res=[resources[0]], out_res=[resources[1]]),
+        DummyTransitionCalculation('T2', in_res=[resources[1]], out_res=[resources[2]]),
+        last_transition_cls('T3', in_res=[resources[2]], out_res=[resources[3]]),
+    ]
+    return resources, transitions
+
+
+# --- Tests ---
+
+class TestCheckpointJournal:
+    def test_resume_after_crash(self, tmp_path):
+        path = str(tmp_path / 'journal.bin')
+
+        _, transitions = chain_transitions(CrashingTransition)
+        scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+        journal = tpp.CheckpointJournal(path)
+        assert journal.restore(scheduler) == 0
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, journal=journal).run())
+        journal.close()
+        assert not is_ok
+        assert 'RuntimeError: T3 crashed' in err_msg
+        assert tpp.CheckpointJournal.load(path) == {
+            'DummyResource:r1': 'by T1 r0', 'DummyResource:r2': 'by T2 r1'}
+
+        resources, transitions = chain_transitions(DummyTransitionCalculation)
+        scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+        journal = tpp.CheckpointJournal(path)
+        assert journal.restore(scheduler) == 2
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        assert [t.name for t in scheduler.get_ready_to_execute_transitions()] == ['T3']
+        asyncio.run(tpp.Executor(scheduler, journal=journal).run())
+        journal.close()
+
+        assert resources[3].data == 'by T3 r2'
+        assert len(tpp.CheckpointJournal.load(path)) == 3
+
+    def test_batches_and_torn_tail(self, tmp_path):
+        path = str(tmp_path / 'journal.bin')
+        journal = tpp.CheckpointJournal(path, batch_size=2, flush_interval=60.0)
+
+        async def record_all():
+            for i in range(5):
+                journal.record(DummyTransitionCalculation(f'T{i}', out_res=[
+                    DummyResource(f'out-{i}').populate_data(i)]))
+            await asyncio.sleep(0.05)
+            # Two full batches are written, the fifth record waits for the timer or a flush.
+            assert len(tpp.CheckpointJournal.load(path)) == 4
+            await journal.flush()
+
+        asyncio.run(record_all())
+        journal.close()
+        assert len(tpp.CheckpointJournal.load(path)) == 5
+
+        with open(path, 'ab') as f:
+            f.write(b'\xff\x00\x00\x00torn')
+        assert len(tpp.CheckpointJournal.load(path)) == 5
+
+    def test_restore_after_compile(self, tmp_path):
+        scheduler = tpp.Scheduler()
+        scheduler.compile()
+        with pytest.raises(ValueError):
+            tpp.CheckpointJournal(str(tmp_path / 'journal.bin')).restore(scheduler)
@@ -0,0 +1,51 @@
+import json
+import os
+
+
+from tiny_parallel_pipeline import TransitionCalculation
+
+
+class DurationHistory:
+    '''Measured transition durations, carried between runs as cost estimates for the Scheduler.
+
+    Transitions are matched by class and name, so names should be stable across runs.
+    '''
+    def __init__(self, smoothing: float = 0.5):
+        if not 0.0 < smoothing <= 1.0:
+            raise ValueError(f'smoothing must be in (0, 1], got {smoothing}')
+        self._smoothing = smoothing
+        self._key_2_seconds: dict[str, float] = dict()
+
+    @staticmethod
+    def key(transition: TransitionCalculation) -> str:
+        return f'{transition.__class__.__name__}:{transition.name}'
+
+    def record(self, transition: TransitionCalculation, seconds: float) -> None:
+        'Blend a new measurement into the estimate with an exponential moving average'
+        key = DurationHistory.key(transition)
+        previous = self._key_2_seconds.get(key)
+        if previous is None:
+            self._key_2_seconds[key] = seconds
+        else:
+            self._key_2_seconds[key] = previous + self._smoothing * (seconds - previous)
+
+    def estimate(self, transition: TransitionCalculation) -> float | None:
+        return self._key_2_seconds.get(DurationHistory.key(transition))
+
+    def save(self, path: str) -> None:
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._key_2_seconds, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, smoothing: float = 0.5) -> 'DurationHistory':
+        'Load saved estimates; a missing file gives an empty history'
+        history = cls(smoothing)
+        if os.path.exists(path):
+            with open(path) as f:
+                history._key_2_seconds.update(json.load(f))
+        return history
+
+    def __len__(self):
+        return len(self._key_2_seconds)
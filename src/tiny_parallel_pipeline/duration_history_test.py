@@ -0,0 +1,39 @@
+import os
+import pytest
+
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.entities.transition_test import DummyTransitionCalculation
+
+
+# --- Tests ---
+
+class TestDurationHistory:
+    def test_record_estimate(self):
+        history = tpp.DurationHistory(smoothing=0.5)
+        t = DummyTransitionCalculation('T1')
+        assert history.estimate(t) is None
+
+        history.record(t, 2.0)
+        assert history.estimate(t) == 2.0
+        history.record(t, 4.0)
+        assert history.estimate(t) == 3.0
+
+        assert history.estimate(DummyTransitionCalculation('T1')) == 3.0
+        assert history.estimate(DummyTransitionCalculation('T2')) is None
+
+    def test_save_load(self, tmp_path):
+        path = str(tmp_path / 'durations.json')
+        assert len(tpp.DurationHistory.load(path)) == 0
+
+        history = tpp.DurationHistory()
+        history.record(DummyTransitionCalculation('T1'), 1.5)
+        history.save(path)
+
+        assert os.listdir(tmp_path) == ['durations.json']
+        assert tpp.DurationHistory.load(path).estimate(DummyTransitionCalculation('T1')) == 1.5
+
+    def test_invalid_smoothing(self):
+        with pytest.raises(ValueError):
+            tpp.DurationHistory(smoothing=0.0)
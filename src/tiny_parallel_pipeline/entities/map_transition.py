@@ -0,0 +1,70 @@
+import array
+import asyncio
+from abc import abstractmethod
+import copy
+import itertools
+from typing import Awaitable, Callable, Sequence
+
+
+from tiny_parallel_pipeline import TransitionCalculation
+
+
+class MapTransition(TransitionCalculation):
+    '''One transition mapping each item of its first input, a sequence, into its first output.
+
+    Items are processed in batches of batch_size. With an Executor pool the batches are spread
+    over the pool like Pool.imap chunks, otherwise they run one after another on the event loop.
+    The output is a list, or an array.array of result_typecode, e.g. 'd' for floats.
+    '''
+    def __init__(self, name: str | None = None, batch_size: int = 256,
+                 result_typecode: str | None = None, allow_multiprocess_pool: bool = False):
+        super().__init__(name, allow_multiprocess_pool=allow_multiprocess_pool)
+        if batch_size < 1:
+            raise ValueError(f'batch_size must be positive, got {batch_size}')
+        self._batch_size = batch_size
+        self._result_typecode = result_typecode
+        self._submit_batch = None
+
+    @property
+    def batch_size(self) -> int:
+        return self._batch_size
+
+    @abstractmethod
+    def map_item(self, item: any) -> any:
+        'Runs in a pool worker on a shell of self, see batch_shell'
+
+    def map_batch(self, items: Sequence[any]) -> list[any]:
+        return [self.map_item(item) for item in items]
+
+    def batch_shell(self) -> 'MapTransition':
+        'A copy without resources, sent to the pool along with each batch'
+        shell = copy.copy(self)
+        shell._in_resources, shell._out_resources = [], []
+        shell._submit_batch = None
+        return shell
+
+    async def execute(self, submit_batch: Callable[[Sequence[any]], Awaitable[list[any]]] | None
+                      = None) -> tuple[bool, str]:
+        'submit_batch maps a batch elsewhere, e.g. in a pool; all batches are submitted at once'
+        self._submit_batch = submit_batch
+        try:
+            return await super().execute()
+        finally:
+            self._submit_batch = None
+
+    async def _execute_impl(self, in_resources, out_resources):
+        items = in_resources[0].data
+        batches = [items[i:i + self._batch_size] for i in range(0, len(items), self._batch_size)]
+        if self._submit_batch is None:
+            results = []
+            for batch in batches:
+                results.append(self.map_batch(batch))
+                # Let other transitions run between batches.
+                await asyncio.sleep(0)
+        else:
+            results = await asyncio.gather(*[self._submit_batch(batch) for batch in batches])
+        out_data = itertools.chain.from_iterable(results)
+        out_resources[0].populate_data(
+            list(out_data) if self._result_typecode is None
+            else array.array(self._result_typecode, out_data))
+        return True, None
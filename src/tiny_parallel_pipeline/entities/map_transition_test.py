@@ -0,0 +1,66 @@
+import array
+import asyncio
+import pytest
+from typing import override
+
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.entities.resource_test import DummyResource
+
+
+# --- Test-specific subclass ---
+
+class SquareMapTransition(tpp.MapTransition):
+    @override
+    def map_item(self, item):
+        return item * item
+
+
+def square_map(item_count, **kwargs):
+    items = DummyResource('items').populate_data(list(range(item_count))).update_status(
+        tpp.ResourceStatus.READY)
+    return (SquareMapTransition('square', **kwargs)
+            .set_in_resources(items).set_out_resources(DummyResource('squares')))
+
+
+# --- Tests ---
+
+class TestMapTransition:
+    def test_execute(self):
+        t = square_map(10, batch_size=3)
+        is_ok, err_msg = asyncio.run(t.execute())
+        assert is_ok, err_msg
+        assert t._out_resources[0].data == [i * i for i in range(10)]
+        assert t._out_resources[0].status == tpp.ResourceStatus.READY
+
+    def test_execute_empty(self):
+        t = square_map(0)
+        is_ok, err_msg = asyncio.run(t.execute())
+        assert is_ok, err_msg
+        assert t._out_resources[0].data == []
+
+    def test_result_typecode(self):
+        t = square_map(5, batch_size=2, result_typecode='q')
+        is_ok, err_msg = asyncio.run(t.execute())
+        assert is_ok, err_msg
+        assert t._out_resources[0].data == array.array('q', [0, 1, 4, 9, 16])
+
+    def test_submit_batch(self):
+        batches = []
+
+        async def submit_batch(batch):
+            batches.append(list(batch))
+            return shell.map_batch(batch)
+
+        t = square_map(5, batch_size=2)
+        shell = t.batch_shell()
+        assert shell._in_resources == [] and shell._out_resources == []
+        is_ok, err_msg = asyncio.run(t.execute(submit_batch))
+        assert is_ok, err_msg
+        assert batches == [[0, 1], [2, 3], [4]]
+        assert t._out_resources[0].data == [0, 1, 4, 9, 16]
+
+    def test_invalid_batch_size(self):
+        with pytest.raises(ValueError, match='batch_size must be positive, got 0'):
+            SquareMapTransition('square', batch_size=0)
@@ -2,6 +2,8 @@ from abc import ABC
 from dataclasses import dataclass, field, InitVar
 from enum import Enum, auto
 from functools import total_ordering
+import threading
+import weakref
 
 
 class ResourceStatus(Enum):
@@ -11,25 +13,50 @@ class ResourceStatus(Enum):
 
 
 @total_ordering
-@dataclass(frozen=True)
 class ResourceID:
-    resource_cls: type
-    in_class_id: str
-
-    def __hash__(self):
-        return hash((self.resource_cls, self.in_class_id))
-
-    def __eq__(self, other):
-        if not isinstance(other, ResourceID):
-            return False
-        return self.resource_cls == other.resource_cls and self.in_class_id == other.in_class_id
+    '''Interned: equal ids are the same object, so equality and hashing are by identity.
+
+    Unpickling and copying intern again, e.g. in pool workers. sort_key orders like the ids do,
+    as a plain tuple for sorted(key=...).
+    '''
+    __slots__ = ('resource_cls', 'in_class_id', 'sort_key', '__weakref__')
+
+    _interned: 'weakref.WeakValueDictionary[tuple[type, str], ResourceID]' = (
+        weakref.WeakValueDictionary())
+    _intern_lock = threading.Lock()
+
+    def __new__(cls, resource_cls: type, in_class_id: str):
+        key = (resource_cls, in_class_id)
+        rid = cls._interned.get(key)
+        if rid is None:
+            with cls._intern_lock:
+                rid = cls._interned.get(key)
+                if rid is None:
+                    rid = super().__new__(cls)
+                    object.__setattr__(rid, 'resource_cls', resource_cls)
+                    object.__setattr__(rid, 'in_class_id', in_class_id)
+                    object.__setattr__(rid, 'sort_key', (resource_cls.__name__, in_class_id))
+                    cls._interned[key] = rid
+        return rid
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'ResourceID is immutable, cannot set {name}')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'ResourceID is immutable, cannot delete {name}')
+
+    def __reduce__(self):
+        return ResourceID, (self.resource_cls, self.in_class_id)
+
+    # __eq__ and __hash__ are object's, by identity.
 
     def __lt__(self, other):
         if not isinstance(other, ResourceID):
             return NotImplemented
-        return (
-            (self.resource_cls.__name__, self.in_class_id) <
-                (other.resource_cls.__name__, other.in_class_id))
+        return self.sort_key < other.sort_key
+
+    def __repr__(self):
+        return f'ResourceID(resource_cls={self.resource_cls!r}, in_class_id={self.in_class_id!r})'
 
     def __str__(self):
         return f'{self.resource_cls.__name__}:{self.in_class_id}'
@@ -69,7 +96,7 @@ class Resource(ABC):
     def __eq__(self, other):
         if not isinstance(other, Resource):
             return False
-        return self.id == other.id
+        return self.id is other.id
 
     def __lt__(self, other):
         if not isinstance(other, Resource):
@@ -1,3 +1,5 @@
+import copy
+import pickle
 import pytest
 from sortedcontainers import SortedSet
 
@@ -95,3 +97,36 @@ class TestResourceBehavior:
         resource_2_count[r2] = 123
         assert resource_2_count[r2] == 123
         assert resource_2_count[DummyResource(in_class_id='test_hash_set_Y')] == 123
+
+
+class OtherDummyResource(tpp.Resource):
+    pass
+
+
+class TestResourceID:
+    def test_interned(self):
+        rid = tpp.ResourceID(DummyResource, 'test_interned')
+        assert tpp.ResourceID(DummyResource, 'test_interned') is rid
+        assert DummyResource('test_interned').id is rid
+        assert OtherDummyResource('test_interned').id is not rid
+        assert tpp.ResourceID(DummyResource, 'test_interned_other') != rid
+
+    def test_pickle_and_copy_intern(self):
+        rid = DummyResource('test_pickle_and_copy_intern').id
+        assert pickle.loads(pickle.dumps(rid)) is rid
+        assert copy.copy(rid) is rid
+        assert copy.deepcopy(DummyResource('test_pickle_and_copy_intern')).id is rid
+
+    def test_ordering(self):
+        a, b = DummyResource('a').id, DummyResource('b').id
+        other_a = OtherDummyResource('a').id
+        assert sorted([other_a, b, a]) == [a, b, other_a]
+        assert a <= a and a < b and b > a and not a > b
+
+    def test_immutable(self):
+        rid = DummyResource('test_immutable').id
+        with pytest.raises(AttributeError):
+            rid.in_class_id = 'other'
+        assert rid.in_class_id == 'test_immutable'
+        assert repr(rid) == (
+            f"ResourceID(resource_cls={DummyResource!r}, in_class_id='test_immutable')")
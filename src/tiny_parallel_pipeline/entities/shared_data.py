@@ -0,0 +1,85 @@
+from multiprocessing import shared_memory
+import secrets
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class SharedBuffer:
+    '''Resource.data backed by a multiprocessing.shared_memory block.
+
+    Pickling carries only the block name and layout, so a pool worker or the parent process
+    attaches to the same memory instead of copying it. Whoever owns the pipeline calls unlink()
+    once the data is no longer needed; until then the block outlives the process that made it.
+    '''
+    def __init__(self, shm: shared_memory.SharedMemory, size: int,
+                 dtype: str | None = None, shape: tuple[int, ...] | None = None):
+        self._shm = shm
+        self._size = size
+        self._dtype = dtype
+        self._shape = shape
+
+    @classmethod
+    def allocate(cls, size: int, dtype: str | None = None,
+                 shape: tuple[int, ...] | None = None) -> 'SharedBuffer':
+        shm = shared_memory.SharedMemory(
+            name=f'tpp_{secrets.token_hex(8)}', create=True, size=max(size, 1))
+        return cls(shm, size, dtype, shape)
+
+    @classmethod
+    def from_bytes(cls, data: bytes | bytearray | memoryview) -> 'SharedBuffer':
+        data = memoryview(data).cast('B')
+        shared = cls.allocate(len(data))
+        shared.buffer[:] = data
+        return shared
+
+    @classmethod
+    def from_array(cls, array: 'numpy.ndarray') -> 'SharedBuffer':
+        if numpy is None:
+            raise ImportError('numpy is required for SharedBuffer.from_array')
+        array = numpy.ascontiguousarray(array)
+        shared = cls.allocate(array.nbytes, array.dtype.str, array.shape)
+        shared.as_array()[...] = array
+        return shared
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def buffer(self) -> memoryview:
+        return self._shm.buf[:self._size]
+
+    def __len__(self):
+        return self._size
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.buffer)
+
+    def as_array(self) -> 'numpy.ndarray':
+        'A numpy view of the shared block, for buffers made by allocate(dtype=...)/from_array'
+        if numpy is None:
+            raise ImportError('numpy is required for SharedBuffer.as_array')
+        if self._dtype is None:
+            raise ValueError(f'{repr(self)} has no array layout')
+        return numpy.ndarray(self._shape, dtype=self._dtype, buffer=self._shm.buf)
+
+    def close(self) -> None:
+        self._shm.close()
+
+    def unlink(self) -> None:
+        self._shm.unlink()
+
+    def __reduce__(self):
+        return (SharedBuffer._attach, (self._shm.name, self._size, self._dtype, self._shape))
+
+    @staticmethod
+    def _attach(name: str, size: int, dtype: str | None,
+                shape: tuple[int, ...] | None) -> 'SharedBuffer':
+        return SharedBuffer(shared_memory.SharedMemory(name=name), size, dtype, shape)
+
+    def __repr__(self):
+        layout = f' {self._dtype}{list(self._shape)}' if self._dtype is not None else ''
+        return f'<SharedBuffer {self._shm.name} {self._size}B{layout}>'
@@ -0,0 +1,78 @@
+import asyncio
+import multiprocessing
+import os
+import pickle
+import pytest
+from typing import override
+
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.entities.resource_test import DummyResource
+
+
+# --- Test-specific subclass ---
+
+class ReverseSharedBufferTransition(tpp.TransitionCalculation):
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        reversed_bytes = bytes(in_resources[0].data.buffer)[::-1]
+        out_resources[0].populate_data(tpp.SharedBuffer.from_bytes(reversed_bytes))
+        return True, None
+
+
+# --- Tests ---
+
+class TestSharedBuffer:
+    def test_from_bytes(self):
+        shared = tpp.SharedBuffer.from_bytes(b'abc')
+        try:
+            assert len(shared) == 3
+            assert shared.to_bytes() == b'abc'
+            assert repr(shared) == f'<SharedBuffer {shared.name} 3B>'
+        finally:
+            shared.unlink()
+
+    def test_pickle_attaches_without_copy(self):
+        shared = tpp.SharedBuffer.from_bytes(b'x' * (1 << 20))
+        try:
+            payload = pickle.dumps(shared)
+            assert len(payload) < 200
+
+            attached = pickle.loads(payload)
+            shared.buffer[0] = ord('y')
+            assert attached.buffer[0] == ord('y')
+            assert attached.to_bytes() == b'y' + b'x' * ((1 << 20) - 1)
+        finally:
+            shared.unlink()
+
+    def test_from_array(self):
+        numpy = pytest.importorskip('numpy')
+        shared = tpp.SharedBuffer.from_array(numpy.arange(6, dtype='int32').reshape(2, 3))
+        try:
+            attached = pickle.loads(pickle.dumps(shared))
+            assert attached.as_array().tolist() == [[0, 1, 2], [3, 4, 5]]
+        finally:
+            shared.unlink()
+
+    def test_pool_transition(self):
+        in_shared = tpp.SharedBuffer.from_bytes(b'0123456789')
+        r_in = DummyResource('in').populate_data(in_shared).update_status(tpp.ResourceStatus.READY)
+        r_out = DummyResource('out')
+        scheduler = (tpp.Scheduler()
+            .add_transitions(ReverseSharedBufferTransition('reverse', allow_multiprocess_pool=True)
+                .set_in_resources(r_in)
+                .set_out_resources(r_out))
+            .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        with multiprocessing.Pool(1) as pool:
+            asyncio.run(tpp.Executor(scheduler, pool).run())
+
+        try:
+            assert isinstance(r_out.data, tpp.SharedBuffer)
+            assert r_out.data.to_bytes() == b'9876543210'
+        finally:
+            in_shared.unlink()
+            r_out.data.unlink()
@@ -0,0 +1,83 @@
+import asyncio
+
+
+from tiny_parallel_pipeline import ResourceStatus, Resource
+
+
+class ChunkChannel:
+    '''Bounded single-consumer channel of chunks between two transitions on one event loop.
+
+    put() waits while max_buffered_chunks are unread, which is the backpressure on the producer.
+    Iterating yields chunks until the producer closes the channel, then raises the producer's
+    error if it failed.
+    '''
+    _END = object()
+
+    def __init__(self, max_buffered_chunks: int):
+        self._queue = asyncio.Queue(max_buffered_chunks)
+        self._closed = False
+        self._abandoned = False
+        self._error: BaseException | None = None
+
+    async def put(self, chunk: any) -> None:
+        if self._abandoned:
+            raise BrokenPipeError('The stream consumer is gone.')
+        if self._closed:
+            raise ValueError('Put to a closed stream.')
+        await self._queue.put(chunk)
+        if self._abandoned:
+            raise BrokenPipeError('The stream consumer is gone.')
+
+    def close(self, error: BaseException | None = None) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._error = error
+        if not self._queue.full():
+            # Wakes a consumer waiting on an empty queue; a full queue is drained first anyway.
+            self._queue.put_nowait(ChunkChannel._END)
+
+    def abandon(self) -> None:
+        'Called on the consumer side when it stops reading, to unblock the producer'
+        self._abandoned = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> any:
+        if self._closed and self._queue.empty():
+            return self._finish()
+        chunk = await self._queue.get()
+        if chunk is ChunkChannel._END:
+            return self._finish()
+        return chunk
+
+    def _finish(self):
+        if self._error is not None:
+            raise self._error
+        raise StopAsyncIteration
+
+    def __reduce__(self):
+        raise TypeError('A ChunkChannel lives on one event loop and can not be pickled.')
+
+
+class StreamResource(Resource):
+    '''Resource whose data is a ChunkChannel, open from the start of its producing transition.
+
+    It has exactly one consumer, started as soon as the producer is, which reads while the
+    producer writes. Both run on the event loop, never in the pool. The consumer runs within the
+    producer's concurrency slot, so concurrency limits do not keep it from starting.
+    '''
+    def __init__(self, in_class_id: str, max_buffered_chunks: int = 16):
+        super().__init__(in_class_id=in_class_id)
+        self._max_buffered_chunks = max_buffered_chunks
+
+    def open(self) -> 'StreamResource':
+        return (self.populate_data(ChunkChannel(self._max_buffered_chunks))
+            .update_status(ResourceStatus.IN_PROGRESS))
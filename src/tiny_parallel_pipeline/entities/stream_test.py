@@ -0,0 +1,75 @@
+import asyncio
+import pickle
+import pytest
+
+
+import tiny_parallel_pipeline as tpp
+
+
+# --- Tests ---
+
+class TestChunkChannel:
+    def test_backpressure(self):
+        async def impl():
+            channel = tpp.ChunkChannel(max_buffered_chunks=2)
+            events = []
+
+            async def produce():
+                for i in range(5):
+                    await channel.put(i)
+                    events.append(f'put {i}')
+                channel.close()
+
+            producer = asyncio.create_task(produce())
+            await asyncio.sleep(0.01)
+            assert events == ['put 0', 'put 1']
+
+            chunks = []
+            async for chunk in channel:
+                chunks.append(chunk)
+            await producer
+            return chunks
+
+        assert asyncio.run(impl()) == [0, 1, 2, 3, 4]
+
+    def test_close_with_error(self):
+        async def impl():
+            channel = tpp.ChunkChannel(max_buffered_chunks=4)
+            await channel.put('a')
+            channel.close(RuntimeError('producer failed'))
+            chunks = []
+            with pytest.raises(RuntimeError, match='producer failed'):
+                async for chunk in channel:
+                    chunks.append(chunk)
+            return chunks
+
+        assert asyncio.run(impl()) == ['a']
+
+    def test_close_wakes_consumer(self):
+        async def impl():
+            channel = tpp.ChunkChannel(max_buffered_chunks=1)
+            consumer = asyncio.create_task(anext(channel, 'end'))
+            await asyncio.sleep(0.01)
+            channel.close()
+            return await consumer
+
+        assert asyncio.run(impl()) == 'end'
+
+    def test_abandon_unblocks_producer(self):
+        async def impl():
+            channel = tpp.ChunkChannel(max_buffered_chunks=1)
+            await channel.put('a')
+            producer = asyncio.create_task(channel.put('b'))
+            await asyncio.sleep(0.01)
+            channel.abandon()
+            with pytest.raises(BrokenPipeError):
+                await producer
+
+        asyncio.run(impl())
+
+    def test_not_picklable(self):
+        async def impl():
+            with pytest.raises(TypeError):
+                pickle.dumps(tpp.ChunkChannel(1))
+
+        asyncio.run(impl())
@@ -0,0 +1,112 @@
+import asyncio
+import codecs
+import os
+import signal
+from typing import Sequence
+
+
+from tiny_parallel_pipeline import Resource, StreamResource, TransitionCalculation
+
+
+class SubprocessTransition(TransitionCalculation):
+    '''Runs a command, without a shell, on the event loop, piping its output into out resources.
+
+    stdout goes to out resource stdout_to and stderr to stderr_to, None to drop it. A
+    StreamResource gets the output chunk by chunk as the process writes it, its backpressure
+    pausing the process, so large outputs are never held whole; other resources get all of it at
+    exit. Chunks are bytes, or str with an encoding.
+
+    A non-zero exit fails the transition with the end of stderr. On timeout or cancellation the
+    process is killed. Transitions are always in the CONCURRENCY_CLASS concurrency class, whose
+    processes the Executor runs at most os.cpu_count() at once, or n with
+    Executor(concurrency_limits={SubprocessTransition.CONCURRENCY_CLASS: n}).
+    '''
+    CONCURRENCY_CLASS = 'subprocess'
+    STDERR_TAIL_BYTES = 4096
+
+    def __init__(self, name: str | None = None, argv: Sequence[str] = (),
+                 stdout_to: int | None = 0, stderr_to: int | None = None,
+                 encoding: str | None = None, cwd: str | None = None,
+                 env: dict[str, str] | None = None, chunk_size: int = 64 * 2**10):
+        super().__init__(name)
+        self._argv = list(argv)
+        self._stdout_to = stdout_to
+        self._stderr_to = stderr_to
+        self._encoding = encoding
+        self._cwd = cwd
+        self._env = env
+        self._chunk_size = chunk_size
+        self.set_concurrency_classes(SubprocessTransition.CONCURRENCY_CLASS)
+
+    def set_concurrency_classes(self, *concurrency_classes: list[str]) -> 'SubprocessTransition':
+        'In addition to CONCURRENCY_CLASS'
+        return super().set_concurrency_classes(
+            SubprocessTransition.CONCURRENCY_CLASS, *concurrency_classes)
+
+    def command(self, in_resources: list[Resource]) -> list[str]:
+        'The argv to execute, by default the one given; override to build it from the inputs'
+        return self._argv
+
+    def on_exited(self, in_resources: list[Resource], out_resources: list[Resource]
+                  ) -> tuple[bool, str | None]:
+        'Called after a zero exit, e.g. to populate out resources of files the command wrote'
+        return True, None
+
+    async def _execute_impl(self, in_resources, out_resources):
+        argv = self.command(in_resources)
+        process = await asyncio.create_subprocess_exec(
+            *argv, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE, cwd=self._cwd, env=self._env)
+        stderr_tail = bytearray()
+        pumps = [
+            asyncio.ensure_future(self._pump(process.stdout, self._out(out_resources, 'stdout'))),
+            asyncio.ensure_future(self._pump(process.stderr, self._out(out_resources, 'stderr'),
+                                             stderr_tail))]
+        try:
+            await asyncio.gather(*pumps)
+            return_code = await process.wait()
+        except BaseException:
+            # Cancelled, timed out or the stream consumer went away: do not leave it running.
+            for pump in pumps:
+                pump.cancel()
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+            raise
+        if return_code != 0:
+            exit_info = (f'killed by {signal.Signals(-return_code).name}' if return_code < 0 else
+                         f'exited with {return_code}')
+            stderr_text = stderr_tail.decode(errors='replace')
+            return False, f'{os.path.basename(argv[0])} {exit_info}:\n{stderr_text}'
+        return self.on_exited(in_resources, out_resources)
+
+    def _out(self, out_resources: list[Resource], pipe: str) -> Resource | None:
+        out_index = self._stdout_to if pipe == 'stdout' else self._stderr_to
+        return None if out_index is None else out_resources[out_index]
+
+    async def _pump(self, reader: asyncio.StreamReader, out_resource: Resource | None,
+                    tail: bytearray | None = None) -> None:
+        'Copy a pipe into out_resource until EOF, keeping the last bytes in tail'
+        decoder = (None if self._encoding is None else
+                   codecs.getincrementaldecoder(self._encoding)(errors='replace'))
+        is_stream = isinstance(out_resource, StreamResource)
+        chunks = []
+        while True:
+            chunk = await reader.read(self._chunk_size)
+            if tail is not None:
+                tail += chunk
+                del tail[:-SubprocessTransition.STDERR_TAIL_BYTES]
+            if out_resource is None:
+                if not chunk:
+                    break
+                continue
+            data = chunk if decoder is None else decoder.decode(chunk, final=not chunk)
+            if data:
+                if is_stream:
+                    await out_resource.data.put(data)
+                else:
+                    chunks.append(data)
+            if not chunk:
+                break
+        if out_resource is not None and not is_stream:
+            out_resource.populate_data(('' if decoder is not None else b'').join(chunks))
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import pytest
+import sys
+import time
+from typing import override
+
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.entities.resource_test import DummyResource
+
+
+def python_argv(code: str) -> list[str]:
+    return [sys.executable, '-c', code]
+
+
+# --- Test-specific subclass ---
+
+class TimedChunkConsumer(tpp.TransitionCalculation):
+    'Joins the chunks of its input stream, noting when each arrived'
+    def __init__(self, name, **kwargs):
+        super().__init__(name, **kwargs)
+        self.chunk_times = []
+
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        chunks = []
+        async for chunk in in_resources[0].data:
+            self.chunk_times.append(time.perf_counter())
+            chunks.append(chunk)
+        out_resources[0].populate_data(''.join(chunks))
+        return True, None
+
+
+class WriteFileTransition(tpp.SubprocessTransition):
+    'Writes its input text to the file at out_path, and outputs the path'
+    def __init__(self, name, out_path):
+        super().__init__(name, stdout_to=None)
+        self._out_path = out_path
+
+    @override
+    def command(self, in_resources):
+        return python_argv(f'open({self._out_path!r}, "w").write({in_resources[0].data!r})')
+
+    @override
+    def on_exited(self, in_resources, out_resources):
+        out_resources[0].populate_data(self._out_path)
+        return True, None
+
+
+def ready_resource(name: str, data: any) -> DummyResource:
+    return DummyResource(name).populate_data(data).update_status(tpp.ResourceStatus.READY)
+
+
+# --- Tests ---
+
+class TestSubprocessTransition:
+    def test_stdout_and_stderr(self):
+        t = tpp.SubprocessTransition(
+            'T', python_argv('import sys; print("out"); sys.stderr.write("err")'), stderr_to=1
+            ).set_in_resources().set_out_resources(DummyResource('out'), DummyResource('err'))
+
+        is_ok, err_msg = asyncio.run(t.execute())
+
+        assert is_ok, err_msg
+        assert [r.data for r in t._out_resources] == [b'out\n', b'err']
+        assert t.concurrency_classes == ('subprocess',)
+
+    def test_no_shell(self):
+        t = tpp.SubprocessTransition('T', ['echo', '$HOME; exit 1'], encoding='utf-8'
+                                     ).set_in_resources().set_out_resources(DummyResource('out'))
+
+        assert asyncio.run(t.execute()) == (True, None)
+        assert t._out_resources[0].data == '$HOME; exit 1\n'
+
+    def test_exit_code(self):
+        t = tpp.SubprocessTransition(
+            'T', python_argv('import sys; print("out"); sys.stderr.write("broke"); sys.exit(3)')
+            ).set_in_resources().set_out_resources(DummyResource('out'))
+
+        is_ok, err_msg = asyncio.run(t.execute())
+
+        assert not is_ok
+        assert err_msg == f'{os.path.basename(sys.executable)} exited with 3:\nbroke'
+        assert t._out_resources[0].status == tpp.ResourceStatus.EMPTY
+        assert t._out_resources[0].data is None
+
+    def test_command_and_on_exited(self, tmp_path):
+        out_path = str(tmp_path / 'out.txt')
+        t = (WriteFileTransition('T', out_path)
+             .set_in_resources(ready_resource('text', 'written'))
+             .set_out_resources(DummyResource('path')))
+
+        assert asyncio.run(t.execute()) == (True, None)
+        assert t._out_resources[0].data == out_path
+        assert open(out_path).read() == 'written'
+
+    def test_kill_on_timeout(self, tmp_path):
+        pid_path = tmp_path / 'pid'
+        t = tpp.SubprocessTransition('T', python_argv(
+            f'import os, time; open({str(pid_path)!r}, "w").write(str(os.getpid())); '
+            'time.sleep(10)')).set_in_resources().set_out_resources(DummyResource('out'))
+        t.set_timeout(0.5)
+
+        start = time.perf_counter()
+        is_ok, err_msg = asyncio.run(t.execute())
+
+        assert time.perf_counter() - start < 2.0
+        assert (is_ok, err_msg) == (False, 'Timed out after 0.5s.')
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(pid_path.read_text()), 0)
+
+    def test_stream_incremental(self):
+        stream = tpp.StreamResource('stdout')
+        producer = tpp.SubprocessTransition('P', python_argv(
+            'import time; print("first", flush=True); time.sleep(0.5); print("second")'),
+            encoding='utf-8').set_in_resources().set_out_resources(stream)
+        consumer = TimedChunkConsumer('C').set_in_resources(stream).set_out_resources(
+            DummyResource('joined'))
+        scheduler = (tpp.Scheduler().add_transitions(producer, consumer)
+                     .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        start = time.perf_counter()
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+
+        assert is_ok, err_msg
+        assert consumer._out_resources[0].data == 'first\nsecond\n'
+        # The first line is read while the process still sleeps.
+        assert consumer.chunk_times[0] - start < 0.4
+        assert consumer.chunk_times[-1] - start > 0.5
+
+    def test_concurrency_limit(self):
+        root = ready_resource('root', 'd')
+        argv = python_argv('import time; time.sleep(0.2)')
+        transitions = [tpp.SubprocessTransition(f'T{i}', argv)
+                           .set_in_resources(root).set_out_resources(DummyResource(f'out-{i}'))
+                       for i in range(6)]
+        scheduler = (tpp.Scheduler().add_transitions(*transitions)
+                     .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        start = time.perf_counter()
+        is_ok, err_msg = asyncio.run(tpp.Executor(
+            scheduler, concurrency_limits={tpp.SubprocessTransition.CONCURRENCY_CLASS: 2}).run())
+
+        assert is_ok, err_msg
+        assert time.perf_counter() - start >= 0.6
+
+    def test_default_concurrency_limit(self, monkeypatch):
+        monkeypatch.setattr(os, 'cpu_count', lambda: 2)
+        root = ready_resource('root', 'd')
+        argv = python_argv('import time; time.sleep(0.2)')
+        transitions = [tpp.SubprocessTransition(f'T{i}', argv)
+                           .set_concurrency_classes('network')
+                           .set_in_resources(root).set_out_resources(DummyResource(f'out-{i}'))
+                       for i in range(6)]
+        assert transitions[0].concurrency_classes == ('network', 'subprocess')
+        scheduler = (tpp.Scheduler().add_transitions(*transitions)
+                     .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        start = time.perf_counter()
+        is_ok, err_msg = asyncio.run(tpp.Executor(
+            scheduler, concurrency_limits={'network': 6}).run())
+
+        assert is_ok, err_msg
+        assert time.perf_counter() - start >= 0.6
@@ -1,17 +1,52 @@
 import asyncio
 from abc import ABC, abstractmethod
+import concurrent.futures
+import copy
+from dataclasses import dataclass
 import multiprocessing
+import random
+import traceback
 
 
-from tiny_parallel_pipeline import ResourceStatus, Resource
+from tiny_parallel_pipeline import ResourceStatus, Resource, StreamResource
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    initial_delay: float = 0.1
+    multiplier: float = 2.0
+    max_delay: float = 30.0
+    # Each delay is scaled by a random factor in [1 - jitter, 1 + jitter].
+    jitter: float = 0.1
+
+    def delay(self, attempt: int) -> float:
+        'Seconds to wait after the given failed attempt, counted from 1'
+        delay = min(self.max_delay, self.initial_delay * self.multiplier ** (attempt - 1))
+        return delay * random.uniform(1.0 - self.jitter, 1.0 + self.jitter)
 
 
 class TransitionCalculation(ABC):
-    def __init__(self, name: str | None = None, allow_multiprocess_pool: bool = False):
+    def __init__(self, name: str | None = None, allow_multiprocess_pool: bool = False,
+                 allow_thread_pool: bool = False):
+        '''With allow_thread_pool, _execute_impl is a plain synchronous method run in the Executor
+        thread pool, for blocking calls like os.system that would otherwise stall the event loop.'''
+        if allow_multiprocess_pool and allow_thread_pool:
+            raise ValueError(f'{name}: allow_multiprocess_pool and allow_thread_pool are exclusive')
         self._name = name
         self._allow_multiprocess_pool = allow_multiprocess_pool
+        self._allow_thread_pool = allow_thread_pool
         self._in_resources: list[Resource] | None = []
         self._out_resources: list[Resource] | None = []
+        self._concurrency_classes: tuple[str, ...] = ()
+        self._priority = 0
+        self._estimated_cost: float | None = None
+        self._cache_fingerprint: str | None = None
+        self._retry_policy: RetryPolicy | None = None
+        self._timeout: float | None = None
+        self._emitted_transitions: list['TransitionCalculation'] = []
+        # The thread of an allow_thread_pool attempt that timed out or was cancelled.
+        self._abandoned_thread: asyncio.Future | None = None
 
         self._compiled = False
 
@@ -27,6 +62,76 @@ class TransitionCalculation(ABC):
     def allow_multiprocess_pool(self):
         return self._allow_multiprocess_pool
 
+    @property
+    def allow_thread_pool(self):
+        return self._allow_thread_pool
+
+    @property
+    def concurrency_classes(self) -> tuple[str, ...]:
+        return self._concurrency_classes
+
+    def set_concurrency_classes(self, *concurrency_classes: list[str]) -> 'Transition':
+        'Opt into named Executor concurrency limits, e.g. "network" or "ffmpeg"'
+        if self._compiled:
+            raise ValueError('Frozen after compiled.')
+        self._concurrency_classes = tuple(sorted(set(concurrency_classes)))
+        return self
+
+    @property
+    def priority(self) -> int:
+        return self._priority
+
+    def set_priority(self, priority: int) -> 'Transition':
+        'Higher priority transitions are started first among the ready ones'
+        if self._compiled:
+            raise ValueError('Frozen after compiled.')
+        self._priority = priority
+        return self
+
+    @property
+    def estimated_cost(self) -> float | None:
+        return self._estimated_cost
+
+    def set_estimated_cost(self, estimated_cost: float | None) -> 'Transition':
+        'Expected duration in seconds, used to rank transitions on the critical path first'
+        if self._compiled:
+            raise ValueError('Frozen after compiled.')
+        self._estimated_cost = estimated_cost
+        return self
+
+    @property
+    def cache_fingerprint(self) -> str | None:
+        return self._cache_fingerprint
+
+    def set_cache_fingerprint(self, cache_fingerprint: str | None) -> 'Transition':
+        'Opt into result caching; the fingerprint must change whenever parameters do'
+        if self._compiled:
+            raise ValueError('Frozen after compiled.')
+        self._cache_fingerprint = cache_fingerprint
+        return self
+
+    @property
+    def retry_policy(self) -> RetryPolicy | None:
+        return self._retry_policy
+
+    def set_retry_policy(self, retry_policy: RetryPolicy | None) -> 'Transition':
+        'An allow_thread_pool transition whose thread outlived its timeout is not retried'
+        if self._compiled:
+            raise ValueError('Frozen after compiled.')
+        self._retry_policy = retry_policy
+        return self
+
+    @property
+    def timeout(self) -> float | None:
+        return self._timeout
+
+    def set_timeout(self, timeout: float | None) -> 'Transition':
+        'Seconds an attempt may run before it is cancelled and counted as failed'
+        if self._compiled:
+            raise ValueError('Frozen after compiled.')
+        self._timeout = timeout
+        return self
+
     def set_in_resources(self, *in_resources: list[Resource]) -> 'Transition':
         if self._compiled:
             raise ValueError('Frozen after compiled.')
@@ -59,6 +164,16 @@ class TransitionCalculation(ABC):
             assert isinstance(r, Resource)
         return self
 
+    def emit_transitions(self, *transitions: list['TransitionCalculation']) -> None:
+        '''Call from _execute_impl to add transitions to the running pipeline, e.g. one per item
+        of a listing that is only known now. They are compiled into the scheduler once this
+        transition succeeds and may take its out resources as inputs.'''
+        self._emitted_transitions.extend(transitions)
+
+    def pop_emitted_transitions(self) -> list['TransitionCalculation']:
+        emitted_transitions, self._emitted_transitions = self._emitted_transitions, []
+        return emitted_transitions
+
     def compile(self) -> 'TransitionCalculation':
         self._compiled = True
         return self
@@ -69,22 +184,75 @@ class TransitionCalculation(ABC):
     def __hash__(self):
         return id(self)
 
-    async def execute(self) -> tuple[bool, str]:
+    async def execute(self, thread_pool: concurrent.futures.Executor | None = None
+                      ) -> tuple[bool, str]:
+        'thread_pool runs an allow_thread_pool _execute_impl, by default the loop default executor'
         for r in self._in_resources:
-            assert r.status == ResourceStatus.READY
+            assert r.status == ResourceStatus.READY or isinstance(r, StreamResource), str(r)
             assert r.data is not None, str(r)
         for r in self._out_resources:
+            if isinstance(r, StreamResource) and r.data is None:
+                r.open()
             r.update_status(ResourceStatus.IN_PROGRESS)
+        # A fresh list, pool shells are shallow copies sharing the original one.
+        self._emitted_transitions = []
 
-        is_ok, err_msg = await self._execute_impl(self._in_resources, self._out_resources)
-
-#
-        for r in self._out_resources:
-            r.update_status(ResourceStatus.READY)
-#
+        try:
+            is_ok, err_msg = await self._execute_with_timeout(thread_pool)
+        except asyncio.CancelledError:
+            self._finish_out_resources(False, f'{self._name} was cancelled.')
+            raise
+        finally:
+            for r in self._in_resources:
+                if isinstance(r, StreamResource):
+                    r.data.abandon()
+        self._finish_out_resources(is_ok, err_msg)
+        return is_ok, err_msg
 
+    async def _execute_with_timeout(self, thread_pool: concurrent.futures.Executor | None = None
+                                    ) -> tuple[bool, str | None]:
+        timeout = asyncio.timeout(self._timeout)
+        try:
+            async with timeout:
+                if self._allow_thread_pool:
+                    # A thread cannot be interrupted, on timeout or cancellation it is only
+                    # abandoned and runs to its end. It writes to copies of the out resources,
+                    # so an abandoned one cannot touch them anymore.
+                    out_copies = [copy.copy(r) for r in self._out_resources]
+                    thread = asyncio.get_running_loop().run_in_executor(
+                        thread_pool, self._execute_impl, self._in_resources, out_copies)
+                    try:
+                        is_ok, err_msg = await asyncio.shield(thread)
+                    except BaseException:
+                        if not thread.done():
+                            self._abandoned_thread = thread
+                        raise
+                    if is_ok:
+                        self.post_execute_populate_out_resource_data(out_copies)
+                else:
+                    is_ok, err_msg = await self._execute_impl(
+                        self._in_resources, self._out_resources)
+        except TimeoutError:
+            if not timeout.expired():
+                is_ok, err_msg = False, traceback.format_exc()
+            else:
+                is_ok, err_msg = False, f'Timed out after {self._timeout}s.'
+        except Exception:
+            is_ok, err_msg = False, traceback.format_exc()
         return is_ok, err_msg
 
+    def _finish_out_resources(self, is_ok: bool, err_msg: str | None) -> None:
+        for r in self._out_resources:
+            if isinstance(r, StreamResource):
+                # Keep the closed channel, the consumer may not have started reading yet.
+                r.data.close(None if is_ok else RuntimeError(
+                    f'Stream producer {self._name} failed: {err_msg}'))
+                r.update_status(ResourceStatus.READY if is_ok else ResourceStatus.EMPTY)
+            elif is_ok:
+                r.update_status(ResourceStatus.READY)
+            else:
+                r.populate_data(None).update_status(ResourceStatus.EMPTY)
+
     @abstractmethod
     async def _execute_impl(self) -> tuple[bool, str]:
         return self._execute_impl()
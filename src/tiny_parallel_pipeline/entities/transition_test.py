@@ -1,7 +1,9 @@
 import asyncio
+import concurrent.futures
 import os
 import pytest
 from sortedcontainers import SortedSet
+import threading
 from typing import override
 
 
@@ -18,8 +20,10 @@ class DummyTransitionCalculation(tpp.TransitionCalculation):
     def __init__(self, name, in_res=None, out_res=None,
                  simulate_async_sleep_period=0.0,
                  data_add_pid=False,
-                 allow_multiprocess_pool=False):
-        super().__init__(name, allow_multiprocess_pool=allow_multiprocess_pool)
+                 allow_multiprocess_pool=False,
+                 allow_thread_pool=False):
+        super().__init__(name, allow_multiprocess_pool=allow_multiprocess_pool,
+                         allow_thread_pool=allow_thread_pool)
         in_res = in_res or [DummyResource('in')]
         self.set_in_resources(*in_res)
         out_res = out_res or [DummyResource('out')]
@@ -40,6 +44,20 @@ class DummyTransitionCalculation(tpp.TransitionCalculation):
         return True, None
 
 
+class RaisingTransitionCalculation(DummyTransitionCalculation):
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        raise ValueError(f'{self._name} raised')
+
+
+class ThreadNameTransitionCalculation(DummyTransitionCalculation):
+    'Synchronous, outputs the name of the thread it ran in'
+    @override
+    def _execute_impl(self, in_resources, out_resources):
+        out_resources[0].populate_data(threading.current_thread().name)
+        return True, None
+
+
 # --- Tests ---
 
 class TestDummyTransitionCalculation:
@@ -109,3 +127,45 @@ class TestDummyTransitionCalculation:
             ' <DummyResource id=DummyResource:IN=1 status=READY data=set>] -> '
             '[<DummyResource id=DummyResource:OUT=0 status=READY data=set>]>')
         assert r3.data == 'by Dummy-A IN=0|IN=1'
+
+    def test_execute_exception(self):
+        r1 = DummyResource('IN=0').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        r2 = DummyResource('OUT=0')
+        t = RaisingTransitionCalculation(name='Dummy-R').set_in_resources(r1).set_out_resources(r2)
+
+        is_ok, err_msg = asyncio.run(t.execute())
+
+        assert not is_ok
+        assert err_msg.startswith('Traceback')
+        assert err_msg.endswith('ValueError: Dummy-R raised\n')
+        assert r2.status == tpp.ResourceStatus.EMPTY
+
+    def test_execute_in_thread_pool(self):
+        r1 = DummyResource('IN=0').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        r2 = DummyResource('OUT=0')
+        t = (ThreadNameTransitionCalculation(name='Dummy-T', allow_thread_pool=True)
+                .set_in_resources(r1).set_out_resources(r2))
+
+        with concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='test-pool') as pool:
+            is_ok, err_msg = asyncio.run(t.execute(pool))
+
+        assert is_ok, err_msg
+        assert r2.status == tpp.ResourceStatus.READY
+        assert r2.data.startswith('test-pool')
+
+    def test_pool_modes_exclusive(self):
+        with pytest.raises(ValueError):
+            DummyTransitionCalculation(
+                name='Dummy-A', allow_multiprocess_pool=True, allow_thread_pool=True)
+
+
+class TestRetryPolicy:
+    def test_delay(self):
+        policy = tpp.RetryPolicy(initial_delay=1.0, multiplier=2.0, max_delay=5.0, jitter=0.0)
+        assert [policy.delay(attempt) for attempt in range(1, 5)] == [1.0, 2.0, 4.0, 5.0]
+
+    def test_delay_jitter(self):
+        policy = tpp.RetryPolicy(initial_delay=1.0, jitter=0.5)
+        delays = [policy.delay(1) for _ in range(100)]
+        assert all(0.5 <= d <= 1.5 for d in delays)
+        assert len(set(delays)) > 1
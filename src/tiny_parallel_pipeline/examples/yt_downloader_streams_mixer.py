@@ -1,10 +1,6 @@
 import argparse
 import asyncio
-from asyncio.subprocess import PIPE
-import multiprocessing
 import os
-import subprocess
-from typing import List, Optional
 from typing import override
 
 import tiny_parallel_pipeline as tpp
@@ -28,81 +24,56 @@ class TxtResource(tpp.Resource):
             self.populate_data(ready_txt_data).update_status(tpp.ResourceStatus.READY)
 
 
-class WgetUrlTransition(tpp.TransitionCalculation):
-    def __init__(self,
-                 name, out_file_path, allow_multiprocess_pool,
-                 *post_wget_file_commands):
-        super().__init__(name, allow_multiprocess_pool=allow_multiprocess_pool)
+class WgetUrlTransition(tpp.SubprocessTransition):
+    def __init__(self, name, out_file_path, mode: int | None = None):
+        super().__init__(name, stdout_to=None)
         self._out_file_path = out_file_path
-        self._post_wget_file_commands = post_wget_file_commands
+        self._mode = mode
 
     @override
-    async def _execute_impl(self, in_resources, out_resources):
+    def command(self, in_resources):
         assert len(in_resources) == 1
+        return ['wget', in_resources[0].data, '-O', self._out_file_path]
+
+    @override
+    def on_exited(self, in_resources, out_resources):
         assert len(out_resources) == 1
-        url_str = in_resources[0].data
-        os.system(f'wget "{url_str}" -O "{self._out_file_path}"')
-        for c in self._post_wget_file_commands:
-            os.system(f'{c} "{self._out_file_path}"')
-        out_resources[0].populate_data(self._out_file_path).update_status(tpp.ResourceStatus.READY)
+        if self._mode is not None:
+            os.chmod(self._out_file_path, self._mode)
+        out_resources[0].populate_data(self._out_file_path)
         return True, None
 
 
-class CliCommandStdoutTransition(tpp.TransitionCalculation):
-    def __init__(self, name, allow_multiprocess_pool, *cmd: list[str]):
-        super().__init__(name, allow_multiprocess_pool=allow_multiprocess_pool)
-        self._cmd = list(cmd)
-        self._timeout = None
-
-    def set_timeout(self, timeout: int | None):
-        self._timeout = timeout
-        return self
+class YtDlpInfoTransition(tpp.SubprocessTransition):
+    'Lists the formats of a video, stdout to the out resource'
+    def __init__(self, name):
+        super().__init__(name, encoding='utf-8')
 
     @override
-    async def _execute_impl(self, in_resources, out_resources):
-        assert len(out_resources) == 1
-        # process = await asyncio.create_subprocess_exec(
-        #     *(self._cmd),
-        process = await asyncio.create_subprocess_shell(
-            ' '.join(self._cmd),
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        stdout, stderr = await process.communicate()
-        stdout_text = stdout.decode('utf-8')
-        stderr_text = stderr.decode('utf-8')
-        # if process.returncode != 0:
-        #     raise RuntimeError(f"yt-dlp command failed with error: {stderr_text}")
-#
-        print(
-f'\n{self.__class__.__name__}\n{repr(self._cmd)}\n{' '.join(self._cmd)}\n=+=\n{stdout_text}\n=+=\n'
-)
-#
-        out_resources[0].populate_data(stdout_text).update_status(tpp.ResourceStatus.READY)
-
-        return True, None
+    def command(self, in_resources):
+        assert len(in_resources) == 2
+        yt_dlp_bin = in_resources[0].data
+        video_url = in_resources[1].data
+        return [yt_dlp_bin, '-F', video_url]
 
 
-class YtDlpTransition(tpp.TransitionCalculation):
-    def __init__(self, name, out_file_path, allow_multiprocess_pool):
-        super().__init__(name, allow_multiprocess_pool=allow_multiprocess_pool)
+class YtDlpTransition(tpp.SubprocessTransition):
+    def __init__(self, name, out_file_path):
+        super().__init__(name, stdout_to=None)
         self._out_file_path = out_file_path
 
     @override
-    async def _execute_impl(self, in_resources, out_resources):
+    def command(self, in_resources):
         assert len(in_resources) == 3
-        assert len(out_resources) == 1
         yt_dlp_bin = in_resources[0].data
         video_url = in_resources[1].data
         info_txt = in_resources[2].data
-        cmd = (f'{yt_dlp_bin} -f {self._get(info_txt, 'audio')}+{self._get(info_txt, 'video')} '
-               f'"{video_url}" -o "{self._out_file_path}"')
-# #
-#         print(
-# f'\n{cmd}\n'
-# )
-# #
-        os.system(cmd) # %(ext)
+        return [yt_dlp_bin, '-f', f'{self._get(info_txt, 'audio')}+{self._get(info_txt, 'video')}',
+                video_url, '-o', self._out_file_path]
+
+    @override
+    def on_exited(self, in_resources, out_resources):
+        assert len(out_resources) == 1
         out_resources[0].populate_data(self._out_file_path)
         return True, None
 
@@ -139,23 +110,22 @@ def main():
 
     yt_dlp_bin_res = FileResource(args.yt_dlp_local_bin)
     wget_yt_dlp_transition = (WgetUrlTransition(
-            'yt-dlp', args.yt_dlp_local_bin, True, 'chmod 755')
+            'yt-dlp', args.yt_dlp_local_bin, 0o755)
         .set_in_resources(UrlStrResource('yt-dlp', args.yt_dlp_url))
         .set_out_resources(yt_dlp_bin_res)
         .compile())
 
     video_url_res = UrlStrResource('video', args.video_url)
     video_info_txt_res = TxtResource(f'yt-info-{args.video_url}')
-    yt_dlp_get_info_transition = (CliCommandStdoutTransition(
-            'yt-dlp-F', True,
-            args.yt_dlp_local_bin, '-F', f'"{video_url_res.data}"')
+    yt_dlp_get_info_transition = (YtDlpInfoTransition('yt-dlp-F')
         # .set_timeout(10)
+        .set_in_resources(yt_dlp_bin_res, video_url_res)
         .set_out_resources(video_info_txt_res)
         .compile())
 
     local_video_res = FileResource(args.video_local_path)
     yt_dlp_download_transition = (YtDlpTransition(
-            f'yt-dlp-{video_url_res.data}', args.video_local_path, True)
+            f'yt-dlp-{video_url_res.data}', args.video_local_path)
         .set_in_resources(yt_dlp_bin_res, video_url_res, video_info_txt_res)
         .set_out_resources(local_video_res)
         .compile())
@@ -170,15 +140,15 @@ def main():
         print(f'Pipeline compilation failed: {err_msg}')
         return
 
-    num_pool_workers = 3
-    # pool = multiprocessing.Pool(num_pool_workers)
-    # executor = tpp.Executor(scheduler, pool)
-    executor = tpp.Executor(scheduler)
+    max_processes = 3
+    executor = tpp.Executor(
+        scheduler, concurrency_limits={tpp.SubprocessTransition.CONCURRENCY_CLASS: max_processes})
 
-    asyncio.run(executor.run())
-
-    # pool.close()
-    # pool.join()
+    is_ok, err_msg = asyncio.run(executor.run())
+    if not is_ok:
+        print(f'Pipeline failed: {err_msg}')
+    else:
+        print(video_info_txt_res.data)
 
 
 if __name__ == '__main__':
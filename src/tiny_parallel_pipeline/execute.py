@@ -1,232 +1,1260 @@
+import array
 import asyncio
-from dataclasses import dataclass
-from enum import Enum, auto
+import concurrent.futures
+import contextlib
+from enum import IntEnum
+import heapq
+import itertools
 import multiprocessing
+import multiprocessing.pool
+import os
+import pickle
 import queue
 import threading
+import time
+import traceback
+from typing import Callable, Sequence
 
 
 from tiny_parallel_pipeline import (
-    ResourceStatus, ResourceID, Resource, TransitionCalculation)
+    ResourceStatus, ResourceID, Resource, StreamResource, TransitionCalculation, MapTransition,
+    SubprocessTransition, DurationHistory, ResultCache,
+    CheckpointJournal, TransitionRegistry, Tracer, ExecutorMetrics, RemoteWorkerPool)
+from tiny_parallel_pipeline.remote import worker_data_store
+from tiny_parallel_pipeline.worker_registry import (
+    run_registered_transition_execute, worker_deadline, worker_trace)
+
+
+_POOL_TIMEOUT_GRACE_SECONDS = 1.0
 
 
 class Scheduler:
-    @dataclass
-    class _TransitionStatus:
-        class _Status(Enum):
-            UNSCHEDULED = auto()
-            IN_PROGRESS = auto()
-            SUCCEED = auto()
-            # FAILED = auto()
-        dependency_count: int = 0
-        status: _Status = _Status.UNSCHEDULED
-        failure_message: str | None = None
+    class _Status(IntEnum):
+        UNSCHEDULED = 0
+        IN_PROGRESS = 1
+        SUCCEED = 2
+        FAILED = 3
+        # An upstream transition failed.
+        CANCELLED = 4
 
-        def __repr__(self):
-            return (f'deps: {self.dependency_count} status: {self.status.name} '
-                    f'msg: {self.failure_message}')
 
-        def __str__(self):
-            return repr(self)
+    def __init__(self, duration_history: DurationHistory | None = None,
+                 critical_path_priority: bool = True):
+        '''Ready transitions are ordered by TransitionCalculation.priority, then, with
+        critical_path_priority, by upward rank: the estimated cost of the longest remaining chain
+        through the transition. Costs come from TransitionCalculation.estimated_cost, else from
+        duration_history, else count as 1. Ties keep readiness order.'''
+        self._duration_history = duration_history
+        self._critical_path_priority = critical_path_priority
 
+        # Transitions and resources are interned, internally each one is its index in these lists.
+        self._transitions: list[TransitionCalculation] = []
+        self._transition2index: dict[TransitionCalculation, int] = dict()
+        self._resources: list[Resource] = []
+        self._resource_id2index: dict[ResourceID, int] = dict()
+        # Kept by add_transitions until compile(targets=...), with the first extra producer of a
+        # resource made by more than one transition.
+        self._resource_id2producer: dict[ResourceID, TransitionCalculation] = dict()
+        self._resource_id2extra_producer: dict[ResourceID, TransitionCalculation] = dict()
 
-    def __init__(self):
-        self._id2resource: dict[ResourceID, Resource] = dict()
-        self._transition2status: dict[TransitionCalculation, Scheduler._TransitionStatus] = dict()
+        # CSR adjacency: the in resources of transition i are
+        # _in_indices[_in_offsets[i]:_in_offsets[i + 1]], likewise out resources, and the
+        # transitions waiting for resource j in _dependents. Dependents of transitions added after
+        # compile go to _extra_dependents instead.
+        self._in_offsets = array.array('q', [0])
+        self._in_indices = array.array('q')
+        self._out_offsets = array.array('q', [0])
+        self._out_indices = array.array('q')
+        self._dependent_offsets = array.array('q', [0])
+        self._dependents = array.array('q')
+        self._extra_dependents: dict[int, list[int]] = dict()
+        # Producing transition per resource, -1 for none.
+        self._producers = array.array('q')
+        self._is_stream = bytearray()
 
-        self._resource_id_2_from_transition: dict[ResourceID, TransitionCalculation] = dict()
-        self._resource_id_2_dependent_transitions: dict[ResourceID,
-                                                        list[TransitionCalculation]] = dict()
+        # Per transition state.
+        self._dependency_counts = array.array('q')
+        self._statuses = bytearray()
+        self._wanted = bytearray()
+        # Estimated cost of the transition plus its longest chain of dependents.
+        self._upward_ranks = array.array('d')
+        # Reads a stream, so runs within the concurrency slot of the stream's producer.
+        self._reads_stream = bytearray()
+        self._failure_messages: dict[int, str | None] = dict()
 
-        self._ready_to_execute_transitions = []
+        self._wanted_resources = bytearray()
+        self._remaining_resource_count = 0
 
-        self._want_resource_ids = set()
-        self._want_transitions = set()
+        # Incremental updates, see notify_changed: every transition reading each resource, built
+        # on first use for _consumers_transition_count transitions, the transitions to re-run
+        # unless their inputs come out unchanged, the data their outputs had, the resources
+        # found changed, and the transitions that emitted others, which cannot be re-run.
+        self._consumer_offsets = array.array('q', [0])
+        self._consumers = array.array('q')
+        self._consumers_transition_count = 0
+        self._unverified_transitions: set[int] = set()
+        self._stale_data: dict[int, any] = dict()
+        self._changed_resource_indices: set[int] = set()
+        self._emitting_transitions: set[int] = set()
+
+        # Heaps of (-priority, -upward rank, readiness sequence number, transition index), one
+        # per concurrency classes tuple, so a saturated class does not block the rest. Entries
+        # taken by mark_transitions_in_progress stay behind and are skipped lazily when they
+        # reach the top.
+        self._ready_to_execute_transitions: dict[
+            tuple[str, ...], list[tuple[int, float, int, int]]] = dict()
+        self._ready_sequence = itertools.count()
+        # Ready stream consumers, taken along with their producers regardless of limits.
+        self._ready_stream_consumers: list[int] = []
 
         self._compiled = False
 
+    @property
+    def duration_history(self) -> DurationHistory | None:
+        return self._duration_history
+
     def add_resources(self, *resources) -> 'Scheduler':
         if self._compiled:
             raise ValueError('Frozen after compiled.')
         for r in resources:
-            self._id2resource[r.id] = r
+            self._register_resource(r)
         return self
 
     def add_transitions(self, *transitions) -> 'Scheduler':
         if self._compiled:
             raise ValueError('Frozen after compiled.')
+        resource_id2producer = self._resource_id2producer
         for t in transitions:
-            self._transition2status[t] = Scheduler._TransitionStatus()
+            if t not in self._transition2index:
+                self._transition2index[t] = len(self._transitions)
+                self._transitions.append(t)
+                for r in t._out_resources:
+                    producer = resource_id2producer.setdefault(r.id, t)
+                    if producer is not t:
+                        self._resource_id2extra_producer.setdefault(r.id, t)
         return self
 
     def pull_all_resources_from_transitions(self) -> 'Scheduler':
         if self._compiled:
             raise ValueError('Frozen after compiled.')
-        self._id2resource.clear()
-        for t in self._transition2status.keys():
-# #
-#             if (t._in_resources is None):
-#                 print(
-# f't: {t.name}'
-# )
-# #
+        self._resources.clear()
+        self._resource_id2index.clear()
+        for t in self._transitions:
             for r in t._in_resources + t._out_resources:
-                self._id2resource[r.id] = r
+                self._register_resource(r)
         return self
 
-    def compile(self) -> tuple[bool, str | None]:
+    def _register_resource(self, resource: Resource) -> None:
+        ri = self._resource_id2index.setdefault(resource.id, len(self._resources))
+        if ri == len(self._resources):
+            self._resources.append(resource)
+        else:
+            self._resources[ri] = resource
+
+    def get_resource(self, resource_id: ResourceID) -> Resource | None:
+        ri = self._resource_id2index.get(resource_id)
+        return None if ri is None else self._resources[ri]
+
+    def compile(self, targets: Sequence[Resource | ResourceID] | None = None
+                ) -> tuple[bool, str | None]:
+        '''Plan the transitions needed for every EMPTY registered resource.
+
+        With targets, only for those: the graph is walked back from them through producers and
+        the transitions not in their ancestry are dropped, so planning takes time in proportion
+        to the ancestry rather than the whole graph. Resources need not be pulled then.
+        '''
         if self._compiled:
             return (True, None)
         self._compiled = True
 
-        for t, s in self._transition2status.items():
-            seen_resource_ids = set();
+        if targets is not None:
+            target_indices, err_msg = self._select_ancestry(targets)
+        # Only used to select the ancestry, they would keep the dropped transitions alive.
+        self._resource_id2producer.clear()
+        self._resource_id2extra_producer.clear()
+        if targets is not None and err_msg is not None:
+            return (False, err_msg)
+        registered_count = len(self._resources)
+        self._intern_transitions_graph(0)
+        transitions, resources = self._transitions, self._resources
+        in_offsets, in_indices = self._in_offsets, self._in_indices
+        out_offsets, out_indices = self._out_offsets, self._out_indices
+        producers = self._producers
+        dependency_counts = self._dependency_counts
+        empty = ResourceStatus.EMPTY
+        # (resource, dependent transition) pairs, in transition order.
+        edge_resources, edge_transitions = [], []
+        for ti in range(len(transitions)):
+            row = [ri for ri in in_indices[in_offsets[ti]:in_offsets[ti + 1]]
+                   if resources[ri].status == empty]
+            if len(row) > 1 and len(set(row)) < len(row):
+                seen = set()
+                for ri in row:
+                    if ri in seen:
+                        return (False,
+                                f'{repr(resources[ri])} multiple times in {repr(transitions[ti])}')
+                    seen.add(ri)
+            dependency_counts[ti] = len(row)
+            edge_resources += row
+            edge_transitions += [ti] * len(row)
+            for ri in out_indices[out_offsets[ti]:out_offsets[ti + 1]]:
+                from_ti = producers[ri]
+                if from_ti < 0:
+                    producers[ri] = ti
+                elif from_ti != ti:
+                    return (
+                        False, f'{repr(resources[ri])} out of multiple transitions '
+                        f'{repr(transitions[ti])} and {repr(transitions[from_ti])}')
+        self._dependent_offsets, self._dependents = self._group_by_resource(
+            edge_resources, edge_transitions)
+
+        ri = self._is_stream.find(1)
+        while ri >= 0:
+            dependents = self._dependents_of(ri)
+            if len(dependents) == 0:
+                return (False, f'{repr(resources[ri])} streamed to no transition.')
+            if len(dependents) > 1:
+                return (False, f'{repr(resources[ri])} streamed to multiple transitions ' +
+                        ' and '.join(repr(transitions[ti]) for ti in dependents))
+            ri = self._is_stream.find(1, ri + 1)
+
+        if targets is None:
+            want_resource_indices = [ri for ri in range(registered_count)
+                                     if resources[ri].status == empty]
+        else:
+            want_resource_indices = [ri for ri in dict.fromkeys(target_indices)
+                                     if resources[ri].status == empty]
+        for ri in want_resource_indices:
+            self._wanted_resources[ri] = 1
+        self._remaining_resource_count = len(want_resource_indices)
+
+        dependency_order = []
+        err_msg = self._walk_producers(want_resource_indices, dependency_order)
+        if err_msg is not None:
+            # Re-walk in resource id order so the reported problem does not depend on graph order.
+            self._wanted[:] = bytes(len(self._wanted))
+            return (False, self._walk_producers(
+                sorted(want_resource_indices, key=lambda ri: resources[ri].id.sort_key), []))
+
+        if targets is not None:
+            # Intermediate resources of the ancestry are produced on the way.
+            for ti in dependency_order:
+                for ri in out_indices[out_offsets[ti]:out_offsets[ti + 1]]:
+                    if not self._wanted_resources[ri]:
+                        self._wanted_resources[ri] = 1
+                        self._remaining_resource_count += 1
+
+        if self._critical_path_priority:
+            self._compute_upward_ranks(reversed(dependency_order))
+
+        wanted = self._wanted
+        for ti in range(len(transitions)):
+            if dependency_counts[ti] == 0 and wanted[ti]:
+                self._push_ready_to_execute_transition(ti)
+
+        return (True, None)
+
+    def _select_ancestry(self, targets: Sequence[Resource | ResourceID]
+                         ) -> tuple[list[int], str | None]:
+        '''Keep only the transitions the targets depend on, in the order they were added, and
+        register the targets; returns the target resource indices.'''
+        resource_id2producer = self._resource_id2producer
+        target_resources = []
+        for target in targets:
+            if isinstance(target, Resource):
+                target_resources.append(target)
+                continue
+            producer = resource_id2producer.get(target)
+            r = self.get_resource(target) or (None if producer is None else next(
+                r for r in producer._out_resources if r.id is target))
+            if r is None:
+                return [], f'No transition to calculate {target}.'
+            target_resources.append(r)
+
+        ancestry = set()
+        stack = list(target_resources)
+        while stack:
+            r = stack.pop()
+            r = self.get_resource(r.id) or r
+            if r.status == ResourceStatus.READY:
+                continue
+            producer = resource_id2producer.get(r.id)
+            if producer is None or producer in ancestry:
+                continue
+            extra_producer = self._resource_id2extra_producer.get(r.id)
+            if extra_producer is not None:
+                return [], (f'{repr(r)} out of multiple transitions '
+                            f'{repr(extra_producer)} and {repr(producer)}')
+            ancestry.add(producer)
+            stack.extend(producer._in_resources)
+
+        self._transitions = sorted(ancestry, key=self._transition2index.__getitem__)
+        self._transition2index = {t: ti for ti, t in enumerate(self._transitions)}
+        target_indices = []
+        for r in target_resources:
+            ri = self._resource_id2index.get(r.id)
+            if ri is None:
+                ri = self._resource_id2index[r.id] = len(self._resources)
+                self._resources.append(r)
+            target_indices.append(ri)
+        return target_indices, None
+
+    def _intern_transitions_graph(self, first: int) -> None:
+        '''Append the CSR rows of transitions from index first on, interning their resources, and
+        size the per transition and per resource arrays to match.'''
+        resource_id2index, resources = self._resource_id2index, self._resources
+        in_offsets, in_indices = self._in_offsets, self._in_indices
+        out_offsets, out_indices = self._out_offsets, self._out_indices
+        for t in itertools.islice(self._transitions, first, None):
             for r in t._in_resources:
-                if r.status == ResourceStatus.EMPTY:
-                    if r.id in seen_resource_ids:
-                        return (False, f'{repr(r)} multiple times in {repr(t)}')
-                    seen_resource_ids.add(r.id);
-                    s.dependency_count += 1
-                    if r.id not in self._resource_id_2_dependent_transitions:
-                        self._resource_id_2_dependent_transitions[r.id] = []
-                    self._resource_id_2_dependent_transitions[r.id].append(t)
+                ri = resource_id2index.get(r.id)
+                if ri is None:
+                    ri = resource_id2index[r.id] = len(resources)
+                    resources.append(r)
+                in_indices.append(ri)
+            in_offsets.append(len(in_indices))
             for r in t._out_resources:
-                if r.id in self._resource_id_2_from_transition:
-                    return (
-                        False, f'{repr(r)} out of multiple transitions {repr(t)} and ' +
-                        repr(self._resource_id_2_from_transition[r.id]))
-                self._resource_id_2_from_transition[r.id] = t
-
-        resource_id_2_status = dict();
-        dependency_stack = []
-        def dfs(r: Resource) -> str | None:
-            if (r.status == ResourceStatus.READY or
-                    resource_id_2_status.get(r.id, '') == 'satisfied'):
-                return None
-            elif resource_id_2_status.get(r.id, '') == 'in_stack':
-                return '\n'.join(['Dependency loop'] + dependency_stack + [repr(r)])
-            elif r.id not in self._resource_id_2_from_transition:
-                return f'No transition to calculate {repr(r)}.'
-            dependency_stack.append(repr(r))
-            resource_id_2_status[r.id] = 'in_stack'
-            t = self._resource_id_2_from_transition[r.id]
-            self._want_transitions.add(t)
-            dependency_stack.append(repr(t))
-            for dr in t._in_resources:
-                err_msg = dfs(dr)
-                if err_msg is not None:
-                    return err_msg
-            dependency_stack.pop()
-            dependency_stack.pop()
-            resource_id_2_status[r.id] = 'satisfied'
-            return None
+                ri = resource_id2index.get(r.id)
+                if ri is None:
+                    ri = resource_id2index[r.id] = len(resources)
+                    resources.append(r)
+                out_indices.append(ri)
+            out_offsets.append(len(out_indices))
+
+        first_resource = len(self._producers)
+        added_resource_count = len(resources) - first_resource
+        self._is_stream.extend(isinstance(r, StreamResource)
+                               for r in itertools.islice(resources, first_resource, None))
+        self._producers.extend(array.array('q', [-1]) * added_resource_count)
+        self._dependent_offsets.extend(
+            array.array('q', [self._dependent_offsets[-1]]) * added_resource_count)
+        self._wanted_resources.extend(bytes(added_resource_count))
+
+        added_transition_count = len(self._transitions) - len(self._statuses)
+        self._dependency_counts.extend(array.array('q', [0]) * added_transition_count)
+        self._statuses.extend(bytes(added_transition_count))
+        self._wanted.extend(bytes(added_transition_count))
+        self._upward_ranks.extend(array.array('d', [0.0]) * added_transition_count)
+        if self._is_stream.find(1, first_resource) < 0:
+            # Known streams have their consumer already.
+            self._reads_stream.extend(bytes(added_transition_count))
+        else:
+            is_stream = self._is_stream
+            self._reads_stream.extend(
+                any(is_stream[ri] for ri in in_indices[in_offsets[ti]:in_offsets[ti + 1]])
+                for ti in range(first, len(self._transitions)))
+
+    def _group_by_resource(self, edge_resources: list[int], edge_transitions: list[int]
+                           ) -> tuple[array.array, array.array]:
+        'Counting sort of the (resource, transition) pairs into CSR offsets and transitions'
+        counts = [0] * (len(self._resources) + 1)
+        for ri in edge_resources:
+            counts[ri + 1] += 1
+        offsets = list(itertools.accumulate(counts))
+        dependents = [0] * len(edge_resources)
+        next_slots = offsets[:-1]
+        for ri, ti in zip(edge_resources, edge_transitions):
+            dependents[next_slots[ri]] = ti
+            next_slots[ri] += 1
+        return array.array('q', offsets), array.array('q', dependents)
+
+    def _dependents_of(self, ri: int) -> Sequence[int]:
+        dependents = self._dependents[self._dependent_offsets[ri]:self._dependent_offsets[ri + 1]]
+        if not self._extra_dependents:
+            return dependents
+        extra_dependents = self._extra_dependents.get(ri)
+        return dependents if extra_dependents is None else dependents.tolist() + extra_dependents
 
-        for r in self._id2resource.values():
-            if r.status == ResourceStatus.EMPTY:
-                self._want_resource_ids.add(r.id)
+    def _in_indices_of(self, ti: int) -> Sequence[int]:
+        return self._in_indices[self._in_offsets[ti]:self._in_offsets[ti + 1]]
 
-        for rid in sorted(self._want_resource_ids):
-            err_msg = dfs(self._id2resource[rid])
-            if err_msg is not None:
-                return (False, err_msg)
+    def _out_indices_of(self, ti: int) -> Sequence[int]:
+        return self._out_indices[self._out_offsets[ti]:self._out_offsets[ti + 1]]
 
-        for t in self._want_transitions:
-            s = self._transition2status[t]
-            if s.dependency_count == 0:
-                self._ready_to_execute_transitions.append(t)
+    def add_dynamic_transitions(self, *transitions, emitter: TransitionCalculation | None = None
+                                ) -> tuple[bool, str | None]:
+        '''Compile transitions emitted at runtime, by emitter if given, into the running scheduler.
 
+        Their out resources must be new, so a loop can only go through the added transitions and
+        only they are checked, and so must be the one consumer of each stream they produce. Inputs
+        are matched to known resources by id. A transition with a failed upstream is cancelled
+        right away.
+        '''
+        if not self._compiled:
+            raise ValueError('Not compiled yet.')
+        resource_id_2_new_transition = dict()
+        for t in transitions:
+            if t in self._transition2index:
+                return (False, f'{repr(t)} added multiple times')
+            for r in t._out_resources:
+                if r.id in self._resource_id2index or r.id in resource_id_2_new_transition:
+                    return (False, f'{repr(r)} out of {repr(t)} is already known')
+                resource_id_2_new_transition[r.id] = t
+        new_transition_2_dependents = {t: [] for t in transitions}
+        new_transition_2_in_count = dict.fromkeys(transitions, 0)
+        # Pool workers send back copies, the scheduler tracks the known objects. They replace
+        # the copies only once all checks passed, a refused transition is left as it was.
+        transition_2_in_resources = {
+            t: [self.get_resource(r.id) or r for r in t._in_resources] for t in transitions}
+        stream_id_2_consumers = dict()
+        for t, in_resources in transition_2_in_resources.items():
+            seen_resource_ids = set()
+            for r in in_resources:
+                if r.status == ResourceStatus.READY:
+                    continue
+                if r.id in seen_resource_ids:
+                    return (False, f'{repr(r)} multiple times in {repr(t)}')
+                seen_resource_ids.add(r.id)
+                producer = resource_id_2_new_transition.get(r.id)
+                ri = self._resource_id2index.get(r.id)
+                if producer is not None:
+                    new_transition_2_dependents[producer].append(t)
+                    new_transition_2_in_count[t] += 1
+                    if isinstance(r, StreamResource):
+                        stream_id_2_consumers.setdefault(r.id, []).append(t)
+                elif ri is None or self._producers[ri] < 0:
+                    return (False, f'No transition to calculate {repr(r)}.')
+                if isinstance(r, StreamResource) and ri is not None and self._dependents_of(ri):
+                    return (False, f'{repr(r)} streamed to multiple transitions ' + ' and '.join(
+                        [repr(self._transitions[dti]) for dti in self._dependents_of(ri)] +
+                        [repr(t)]))
+        for t in transitions:
+            for r in t._out_resources:
+                if not isinstance(r, StreamResource):
+                    continue
+                consumers = stream_id_2_consumers.get(r.id, [])
+                if len(consumers) == 0:
+                    return (False, f'{repr(r)} streamed to no transition.')
+                if len(consumers) > 1:
+                    return (False, f'{repr(r)} streamed to multiple transitions ' +
+                            ' and '.join(repr(ct) for ct in consumers))
+
+        # Kahn's algorithm over the added transitions only, producers ahead of dependents.
+        dependency_order = [t for t, count in new_transition_2_in_count.items() if count == 0]
+        for t in dependency_order:
+            for dt in new_transition_2_dependents[t]:
+                new_transition_2_in_count[dt] -= 1
+                if new_transition_2_in_count[dt] == 0:
+                    dependency_order.append(dt)
+        if len(dependency_order) < len(transitions):
+            return (False, '\n'.join(['Dependency loop'] + [
+                repr(t) for t, count in new_transition_2_in_count.items() if count > 0]))
+
+        first = len(self._transitions)
+        for t in dependency_order:
+            t._in_resources = transition_2_in_resources[t]
+            self._transition2index[t] = len(self._transitions)
+            self._transitions.append(t)
+        self._intern_transitions_graph(first)
+        added_indices = range(first, len(self._transitions))
+        for ti in added_indices:
+            for ri in self._out_indices_of(ti):
+                self._producers[ri] = ti
+
+        for ti in added_indices:
+            failed_producer = -1
+            for ri in self._in_indices_of(ti):
+                r = self._resources[ri]
+                producer = self._producers[ri]
+                if r.status == ResourceStatus.READY or producer < 0:
+                    continue
+                producer_status = self._statuses[producer]
+                if producer_status in (Scheduler._Status.FAILED, Scheduler._Status.CANCELLED):
+                    failed_producer = producer
+                elif (producer_status == Scheduler._Status.UNSCHEDULED or
+                        not isinstance(r, StreamResource)):
+                    # An open stream is readable already.
+                    self._dependency_counts[ti] += 1
+                self._extra_dependents.setdefault(ri, []).append(ti)
+            if failed_producer >= 0:
+                self._statuses[ti] = Scheduler._Status.CANCELLED
+                self._failure_messages[ti] = (
+                    f'Upstream {self._transitions[failed_producer].name} failed.')
+            else:
+                self._wanted[ti] = 1
+                for ri in self._out_indices_of(ti):
+                    self._wanted_resources[ri] = 1
+                    self._remaining_resource_count += 1
+
+        if self._critical_path_priority:
+            self._compute_upward_ranks(reversed(added_indices))
+
+        for ti in added_indices:
+            if (self._dependency_counts[ti] == 0 and
+                    self._statuses[ti] == Scheduler._Status.UNSCHEDULED):
+                self._push_ready_to_execute_transition(ti)
+
+        if emitter is not None:
+            self._emitting_transitions.add(self._transition2index[emitter])
+        return (True, None)
+
+    def notify_changed(self, *resources: Resource | ResourceID) -> tuple[bool, str | None]:
+        '''Take new data of READY resources into account after a run, for the next run() of an
+        Executor to re-run only the transitions it reaches.
+
+        The transitions reading the resources are re-run, and the ones downstream of them only if
+        an input came out different, compared with ==. Failed and cancelled transitions of the
+        cone are retried when their inputs allow. A cone with streams, or with transitions that
+        emitted others, is refused.
+        '''
+        if not self._compiled:
+            raise ValueError('Not compiled yet.')
+        if self._remaining_resource_count > 0:
+            raise ValueError('Still running.')
+        changed_indices = []
+        for r in resources:
+            resource_id = r.id if isinstance(r, Resource) else r
+            ri = self._resource_id2index.get(resource_id)
+            if ri is None:
+                return (False, f'Unknown resource {resource_id}.')
+            if self._resources[ri].status != ResourceStatus.READY:
+                return (False, f'{repr(self._resources[ri])} is not READY.')
+            changed_indices.append(ri)
+
+        if self._consumers_transition_count != len(self._transitions):
+            self._consumers_transition_count = len(self._transitions)
+            self._consumer_offsets, self._consumers = self._group_by_resource(
+                self._in_indices.tolist(), [ti for ti in range(len(self._transitions))
+                                            for _ in self._in_indices_of(ti)])
+        consumer_offsets, consumers = self._consumer_offsets, self._consumers
+        statuses, producers = self._statuses, self._producers
+        unscheduled = Scheduler._Status.UNSCHEDULED
+
+        # Transitions run before downstream of the changed resources, counting their inputs
+        # made by one another.
+        candidate_2_in_count: dict[int, int] = dict()
+        resource_stack = list(changed_indices)
+        while resource_stack:
+            ri = resource_stack.pop()
+            for ti in consumers[consumer_offsets[ri]:consumer_offsets[ri + 1]]:
+                if ti in candidate_2_in_count or statuses[ti] == unscheduled:
+                    continue
+                t = self._transitions[ti]
+                if ti in self._emitting_transitions:
+                    return (False, f'{repr(t)} emitted transitions, it cannot be re-run.')
+                for r in t._in_resources + t._out_resources:
+                    if isinstance(r, StreamResource):
+                        return (False, f'{repr(r)} streamed by {repr(t)} cannot be re-run.')
+                candidate_2_in_count[ti] = 0
+                resource_stack += self._out_indices_of(ti)
+        for ti in candidate_2_in_count:
+            for ri in self._in_indices_of(ti):
+                if producers[ri] in candidate_2_in_count:
+                    candidate_2_in_count[ti] += 1
+
+        # Kahn's algorithm, leaving out the transitions missing an input made outside the cone.
+        dependency_order = [ti for ti, count in candidate_2_in_count.items() if count == 0]
+        cone = set()
+        for ti in dependency_order:
+            if all(self._resources[ri].status == ResourceStatus.READY or producers[ri] in cone
+                   for ri in self._in_indices_of(ti)):
+                cone.add(ti)
+            for ri in self._out_indices_of(ti):
+                for dti in consumers[consumer_offsets[ri]:consumer_offsets[ri + 1]]:
+                    if dti in candidate_2_in_count:
+                        candidate_2_in_count[dti] -= 1
+                        if candidate_2_in_count[dti] == 0:
+                            dependency_order.append(dti)
+
+        for heap in self._ready_to_execute_transitions.values():
+            if any(entry[-1] in cone for entry in heap):
+                heap[:] = [entry for entry in heap if entry[-1] not in cone]
+                heapq.heapify(heap)
+        self._changed_resource_indices = set(changed_indices)
+        self._unverified_transitions = cone
+        self._stale_data = dict()
+        for ti in dependency_order:
+            if ti not in cone:
+                continue
+            statuses[ti] = unscheduled
+            self._wanted[ti] = 1
+            self._failure_messages.pop(ti, None)
+            self._dependency_counts[ti] = sum(
+                producers[ri] in cone for ri in self._in_indices_of(ti))
+            for ri in self._out_indices_of(ti):
+                self._stale_data[ri] = self._resources[ri].data
+                self._wanted_resources[ri] = 1
+                self._remaining_resource_count += 1
+        for ti in dependency_order:
+            if ti in cone and self._dependency_counts[ti] == 0:
+                self._push_ready_to_execute_transition(ti)
         return (True, None)
 
-    def get_ready_to_execute_transitions(self) -> None:
-        return list(self._ready_to_execute_transitions)
+    def _walk_producers(self, resource_indices, dependency_order: list[int]) -> str | None:
+        '''Mark the transitions needed for resource_indices wanted, and collect them into
+        dependency_order with producers ahead of their dependents.
+
+        Iterative DFS over producing transitions, so chain depth is not bounded by the recursion
+        limit. Nothing is rendered unless a loop or an unreachable resource is found.
+        '''
+        in_stack, satisfied = 1, 2
+        resource_states = bytearray(len(self._resources))
+        resources, producers, wanted = self._resources, self._producers, self._wanted
+        in_offsets, in_indices = self._in_offsets, self._in_indices
+        ready = ResourceStatus.READY
+        for ri in resource_indices:
+            if resource_states[ri] == satisfied:
+                continue
+            # Parallel stacks: a resource, its producing transition, the next input to visit.
+            resource_stack, transition_stack, index_stack = [], [], []
+            while True:
+                if ri >= 0 and resources[ri].status != ready:
+                    state = resource_states[ri]
+                    if state == 0:
+                        ti = producers[ri]
+                        if ti < 0:
+                            return f'No transition to calculate {repr(resources[ri])}.'
+                        resource_states[ri] = in_stack
+                        wanted[ti] = 1
+                        resource_stack.append(ri)
+                        transition_stack.append(ti)
+                        index_stack.append(in_offsets[ti])
+                    elif state == in_stack:
+                        return '\n'.join(
+                            ['Dependency loop'] +
+                            [repr(x) for rti in zip(resource_stack, transition_stack)
+                             for x in (resources[rti[0]], self._transitions[rti[1]])] +
+                            [repr(resources[ri])])
+                if not index_stack:
+                    break
+                i = index_stack[-1]
+                if i < in_offsets[transition_stack[-1] + 1]:
+                    ri = in_indices[i]
+                    index_stack[-1] = i + 1
+                else:
+                    resource_states[resource_stack.pop()] = satisfied
+                    dependency_order.append(transition_stack.pop())
+                    index_stack.pop()
+                    ri = -1
+        return None
+
+    def _compute_upward_ranks(self, reverse_dependency_order) -> None:
+        upward_ranks = self._upward_ranks
+        for ti in reverse_dependency_order:
+            downstream_rank = 0.0
+            for ri in self._out_indices_of(ti):
+                for dti in self._dependents_of(ri):
+                    downstream_rank = max(downstream_rank, upward_ranks[dti])
+            upward_ranks[ti] = self._estimate_cost(self._transitions[ti]) + downstream_rank
+
+    def _estimate_cost(self, transition: TransitionCalculation) -> float:
+        if transition.estimated_cost is not None:
+            return transition.estimated_cost
+        if self._duration_history is not None:
+            estimated_cost = self._duration_history.estimate(transition)
+            if estimated_cost is not None:
+                return estimated_cost
+        return 1.0
+
+    def get_ready_to_execute_transitions(self) -> list[TransitionCalculation]:
+        indices = self._ready_stream_consumers[::-1] + [entry[-1] for entry in sorted(
+            entry for heap in self._ready_to_execute_transitions.values() for entry in heap)]
+        return [self._transitions[ti] for ti in indices
+                if self._statuses[ti] == Scheduler._Status.UNSCHEDULED]
+
+    def pop_ready_to_execute_transitions(
+            self, max_count: int | None = None,
+            try_acquire: Callable[[TransitionCalculation], bool] | None = None
+            ) -> list[TransitionCalculation]:
+        '''Take up to max_count ready transitions, best ranked first, and mark them in progress.
+
+        try_acquire is asked before each transition is taken; a refusal leaves the transition
+        queued and skips its concurrency classes for the rest of this call. Ready consumers of
+        streams come on top, without try_acquire: they run within their producer's slot.
+        '''
+        bucket = []
+        self._take_ready_stream_consumers(bucket)
+        taken_count = 0
+        blocked_keys = set()
+        statuses = self._statuses
+        unscheduled = Scheduler._Status.UNSCHEDULED
+        while max_count is None or taken_count < max_count:
+            best_heap = None
+            for key, heap in self._ready_to_execute_transitions.items():
+                while heap and statuses[heap[0][-1]] != unscheduled:
+                    heapq.heappop(heap)
+                if (heap and key not in blocked_keys and
+                        (best_heap is None or heap[0] < best_heap[0])):
+                    best_heap = heap
+            if best_heap is None:
+                break
+            ti = best_heap[0][-1]
+            t = self._transitions[ti]
+            if try_acquire is not None and not try_acquire(t):
+                blocked_keys.add(t.concurrency_classes)
+                continue
+            heapq.heappop(best_heap)
+            bucket.append(t)
+            taken_count += 1
+            # Marked one by one, so consumers of its streams can be taken in this same call.
+            self._mark_in_progress(ti)
+            self._take_ready_stream_consumers(bucket)
+        return bucket
+
+    def _take_ready_stream_consumers(self, bucket: list[TransitionCalculation]) -> None:
+        consumers = self._ready_stream_consumers
+        while consumers:
+            ti = consumers.pop()
+            if self._statuses[ti] == Scheduler._Status.UNSCHEDULED:
+                bucket.append(self._transitions[ti])
+                # It may produce streams in turn.
+                self._mark_in_progress(ti)
 
     def mark_transitions_in_progress(self, *transitions: list[TransitionCalculation]) -> None:
         for t in transitions:
-            self._transition2status[t].status = Scheduler._TransitionStatus._Status.IN_PROGRESS
-        self._refilter_ready_to_execute_transitions()
+            self._mark_in_progress(self._transition2index[t])
+
+    def _mark_in_progress(self, ti: int) -> None:
+        self._statuses[ti] = Scheduler._Status.IN_PROGRESS
+        for ri in self._out_indices_of(ti):
+            if self._is_stream[ri]:
+                # Readable from now on, consumers need not wait for the producer to finish.
+                self._resources[ri].open()
+                self._release_dependent_transitions(ri)
 
     def on_transition_succeed(self, transition: TransitionCalculation) -> None:
-        self._transition2status[transition].status = Scheduler._TransitionStatus._Status.SUCCEED
-        self._want_transitions.remove(transition)
-        for r in transition._out_resources:
-            assert r.status == ResourceStatus.READY
-            self._want_resource_ids.remove(r.id)
-            if r.id not in self._resource_id_2_dependent_transitions:
-                continue
-            for t in self._resource_id_2_dependent_transitions[r.id]:
-                s = self._transition2status[t]
-                assert s.status == Scheduler._TransitionStatus._Status.UNSCHEDULED
-                s.dependency_count -= 1
-                if s.dependency_count == 0 and t in self._want_transitions:
-                    self._ready_to_execute_transitions.append(t)
-        self._refilter_ready_to_execute_transitions()
+        ti = self._transition2index[transition]
+        self._statuses[ti] = Scheduler._Status.SUCCEED
+        self._wanted[ti] = 0
+        for ri in self._out_indices_of(ti):
+            assert self._resources[ri].status == ResourceStatus.READY
+            assert self._wanted_resources[ri]
+            self._wanted_resources[ri] = 0
+            self._remaining_resource_count -= 1
+            if self._stale_data and ri in self._stale_data:
+                if _data_changed(self._stale_data.pop(ri), self._resources[ri].data):
+                    self._changed_resource_indices.add(ri)
+            if not self._is_stream[ri]:
+                self._release_dependent_transitions(ri)
+
+    def _release_dependent_transitions(self, ri: int) -> None:
+        statuses, dependency_counts = self._statuses, self._dependency_counts
+        # Outputs of transitions cut off after an update are released in turn.
+        released_resources = [ri]
+        while released_resources:
+            for ti in self._dependents_of(released_resources.pop()):
+                status = statuses[ti]
+                if status == Scheduler._Status.CANCELLED:
+                    continue
+                assert status == Scheduler._Status.UNSCHEDULED
+                dependency_counts[ti] -= 1
+                if dependency_counts[ti] == 0 and self._wanted[ti]:
+                    if (ti in self._unverified_transitions and
+                            self._changed_resource_indices.isdisjoint(self._in_indices_of(ti))):
+                        released_resources += self._cut_off(ti)
+                    else:
+                        self._push_ready_to_execute_transition(ti)
+
+    def _cut_off(self, ti: int) -> list[int]:
+        'Keep the outputs of a transition whose inputs did not change, and return them'
+        self._statuses[ti] = Scheduler._Status.SUCCEED
+        self._wanted[ti] = 0
+        out_indices = self._out_indices_of(ti)
+        for ri in out_indices:
+            del self._stale_data[ri]
+            self._wanted_resources[ri] = 0
+            self._remaining_resource_count -= 1
+        return out_indices.tolist()
+
+    def on_transition_failed(self, transition: TransitionCalculation, err_msg: str | None) -> None:
+        'Mark the transition failed and cancel everything that depends on it'
+        ti = self._transition2index[transition]
+        self._statuses[ti] = Scheduler._Status.FAILED
+        self._failure_messages[ti] = err_msg
+        self._wanted[ti] = 0
+        failed_transitions = [ti]
+        while failed_transitions:
+            for ri in self._out_indices_of(failed_transitions.pop()):
+                if self._wanted_resources[ri]:
+                    self._wanted_resources[ri] = 0
+                    self._remaining_resource_count -= 1
+                for dti in self._dependents_of(ri):
+                    if (not self._wanted[dti] or
+                            self._statuses[dti] != Scheduler._Status.UNSCHEDULED):
+                        # Running stream consumers fail on their own when the stream breaks.
+                        continue
+                    self._wanted[dti] = 0
+                    self._statuses[dti] = Scheduler._Status.CANCELLED
+                    self._failure_messages[dti] = f'Upstream {transition.name} failed.'
+                    failed_transitions.append(dti)
+
+    def cancel_remaining(self, message: str) -> None:
+        'Give up on every transition not yet done, e.g. when a deadline passes'
+        for ti, is_wanted in enumerate(self._wanted):
+            if is_wanted:
+                self._statuses[ti] = Scheduler._Status.CANCELLED
+                self._failure_messages[ti] = message
+        self._wanted[:] = bytes(len(self._wanted))
+        self._wanted_resources[:] = bytes(len(self._wanted_resources))
+        self._remaining_resource_count = 0
+
+    def get_failures(self) -> list[tuple[TransitionCalculation, str | None]]:
+        'Failed and cancelled transitions with their failure messages'
+        return [(self._transitions[ti], err_msg)
+                for ti, err_msg in sorted(self._failure_messages.items())]
 
     def remaining_resources_count(self):
-        return len(self._want_resource_ids)
+        return self._remaining_resource_count
 
-    def _refilter_ready_to_execute_transitions(self):
-        self._ready_to_execute_transitions = [t for t in self._ready_to_execute_transitions
-            if self._transition2status[t].status == Scheduler._TransitionStatus._Status.UNSCHEDULED]
+    def ready_count(self) -> int:
+        'Ready transitions not taken yet; scans the ready queues, so meant for metrics'
+        statuses, unscheduled = self._statuses, Scheduler._Status.UNSCHEDULED
+        return sum(statuses[ti] == unscheduled for ti in itertools.chain(
+            self._ready_stream_consumers,
+            (entry[-1] for heap in self._ready_to_execute_transitions.values() for entry in heap)))
+
+    def _push_ready_to_execute_transition(self, ti: int) -> None:
+        if self._reads_stream[ti]:
+            self._ready_stream_consumers.append(ti)
+            return
+        transition = self._transitions[ti]
+        heap = self._ready_to_execute_transitions.get(transition.concurrency_classes)
+        if heap is None:
+            heap = self._ready_to_execute_transitions[transition.concurrency_classes] = []
+        heapq.heappush(heap, (-transition.priority, -self._upward_ranks[ti],
+                              next(self._ready_sequence), ti))
 
 
 class Executor:
     def __init__(self, scheduler: Scheduler,
-                 pool: multiprocessing.Pool = None):
+                 pool: multiprocessing.pool.Pool | concurrent.futures.Executor | None = None,
+                 max_in_flight: int | None = None,
+                 concurrency_limits: dict[str, int] | None = None,
+                 cache: ResultCache | None = None,
+                 journal: CheckpointJournal | None = None,
+                 registry: TransitionRegistry | None = None,
+                 deadline: float | None = None,
+                 tracer: Tracer | None = None,
+                 metrics: ExecutorMetrics | None = None,
+                 on_progress: Callable[[dict[str, float]], None] | None = None,
+                 progress_interval: float = 1.0,
+                 thread_pool_size: int | None = None):
+        '''Runs the transitions of a compiled scheduler: allow_multiprocess_pool ones in pool,
+        allow_thread_pool ones in a thread pool of thread_pool_size threads created for each run(),
+        the rest on the event loop.
+
+        max_in_flight caps running transitions overall, concurrency_limits per concurrency class
+        (see TransitionCalculation.set_concurrency_classes), SubprocessTransition.CONCURRENCY_CLASS
+        to os.cpu_count() unless given; transitions over a limit stay queued in the scheduler.
+        cache, journal, registry, tracer and metrics are optional, see their classes. on_progress
+        is called with a metrics snapshot every progress_interval seconds and once at the end.'''
         self._scheduler = scheduler
         self._pool = pool
+        # Processes beyond the cores would only compete for them.
+        concurrency_limits = {SubprocessTransition.CONCURRENCY_CLASS: os.cpu_count() or 1,
+                              **(concurrency_limits or {})}
+        self._limits = _ConcurrencyLimits(max_in_flight, concurrency_limits)
+        self._cache = cache
+        self._journal = journal
+        self._registry = registry
+        self._deadline = deadline
+        self._deadline_time: float | None = None
+        self._tracer = tracer
+        if metrics is None and on_progress is not None:
+            metrics = ExecutorMetrics()
+        self._metrics = metrics
+        self._on_progress = on_progress
+        self._progress_interval = progress_interval
+        self._thread_pool_size = thread_pool_size
+        self._thread_pool: concurrent.futures.ThreadPoolExecutor | None = None
+        self._pool_slots: asyncio.Semaphore | None = None
+
+    async def run(self) -> tuple[bool, str | None]:
+        '''Execute until every wanted resource is produced or cannot be.
+
+        A failed transition, after the retries of its RetryPolicy, cancels its dependents while
+        independent branches keep running; the failures are then reported. Transitions are
+        cancelled after their own timeout, and everything in flight once deadline seconds have
+        passed. Pool workers stop their task a grace period after the deadline, by the alarm used
+        for timeouts, and a multiprocessing.Pool worker still stuck in native code another grace
+        period later exits and is replaced. Thread pool transitions and pool code that blocks
+        signals run on, abandoned; remote workers go by their own clock.
+        '''
+        if self._metrics is not None:
+            self._metrics.attach(self._scheduler, self._pool)
+        progress_reporter = None
+        if self._on_progress is not None:
+            progress_reporter = asyncio.create_task(self._report_progress())
+        # Threads start on demand, so this costs nothing without thread pool transitions.
+        self._thread_pool = concurrent.futures.ThreadPoolExecutor(
+            self._thread_pool_size, thread_name_prefix='tpp-transition')
+        self._pool_slots = _pool_slots(self._pool)
+        try:
+            return await self._run()
+        finally:
+            # Threads abandoned on a timeout write only to copies of the out resources, so they
+            # are not waited for.
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+            if progress_reporter is not None:
+                progress_reporter.cancel()
+                self._on_progress(self._metrics.snapshot())
 
-    async def run(self):
+    async def _report_progress(self) -> None:
+        while True:
+            await asyncio.sleep(self._progress_interval)
+            self._on_progress(self._metrics.snapshot())
+
+    async def _run(self) -> tuple[bool, str | None]:
         pending: set[asyncio.Task] = set()
+        duration_history = self._scheduler.duration_history
+        transition_2_start_time: dict[TransitionCalculation, float] = dict()
+        transition_2_cache_key: dict[TransitionCalculation, str] = dict()
+        loop = asyncio.get_running_loop()
+        deadline_at = None if self._deadline is None else loop.time() + self._deadline
+        # By the wall clock for pool workers, a grace period later so that the run stops first.
+        self._deadline_time = (None if self._deadline is None else
+                               time.time() + self._deadline + _POOL_TIMEOUT_GRACE_SECONDS)
+        tracer, metrics = self._tracer, self._metrics
+        if tracer is not None:
+            tracer.on_run_started()
         while self._scheduler.remaining_resources_count() > 0 or len(pending) > 0:
-            transition_bucket = self._scheduler.get_ready_to_execute_transitions()
+            transition_bucket = self._scheduler.pop_ready_to_execute_transitions(
+                self._limits.free_slot_count(), self._limits.try_acquire)
             assert len(transition_bucket) > 0 or len(pending) > 0
-            self._scheduler.mark_transitions_in_progress(*transition_bucket)
             for transition in transition_bucket:
-                if self._pool is not None and transition.allow_multiprocess_pool:
-                    task = _transition_as_asyncio_task_in_pool(transition, self._pool)
-                else:
-                    task = _transition_as_asyncio_task(transition)
-                pending.add(task)
+                if tracer is not None:
+                    tracer.on_dispatched(transition)
+                if self._cache is not None:
+                    cache_key = ResultCache.key(transition)
+                    if cache_key is not None:
+                        if self._populate_from_cache(transition, cache_key):
+                            if tracer is not None:
+                                tracer.on_applied(transition, True, cached=True)
+                            if metrics is not None:
+                                metrics.cache_hits_total += 1
+                                metrics.transitions_completed_total += 1
+                            continue
+                        transition_2_cache_key[transition] = cache_key
+                pending.add(asyncio.create_task(self._execute_with_retries(transition)))
+                if duration_history is not None:
+                    transition_2_start_time[transition] = time.perf_counter()
+                if metrics is not None:
+                    metrics.transitions_started_total += 1
+            if metrics is not None:
+                metrics.in_flight_transitions = len(pending)
+            if len(pending) == 0:
+                continue
 
             done_tasks, still_pending = await asyncio.wait(
-                pending, return_when=asyncio.FIRST_COMPLETED)
+                pending, return_when=asyncio.FIRST_COMPLETED,
+                timeout=None if deadline_at is None else max(0.0, deadline_at - loop.time()))
             # asyncio.ALL_COMPLETED
             pending = still_pending
+            if not done_tasks:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                pending = set()
+                self._scheduler.cancel_remaining(
+                    f'Pipeline deadline of {self._deadline}s exceeded.')
+                break
             for task in done_tasks:
                 transition, is_ok, err_msg = task.result()
+                self._limits.release(transition)
+                if duration_history is not None:
+                    duration_history.record(
+                        transition, time.perf_counter() - transition_2_start_time.pop(transition))
+                cache_key = transition_2_cache_key.pop(transition, None)
+                emitted_transitions = transition.pop_emitted_transitions() if is_ok else []
+                if emitted_transitions:
+                    is_ok, err_msg = self._scheduler.add_dynamic_transitions(
+                        *emitted_transitions, emitter=transition)
+                    if not is_ok:
+                        for r in transition._out_resources:
+                            r.populate_data(None).update_status(ResourceStatus.EMPTY)
                 if is_ok:
-                    self._scheduler.on_transition_succeed(transition)
-                # else:
-                #     self._scheduler.on_transition_failed(transition)
-
-
-def _transition_as_asyncio_task(
-        transition: TransitionCalculation
-        ) -> asyncio.Task[tuple[TransitionCalculation, bool, str]]:
-    async def impl():
-        is_ok, err_msg = await transition.execute()
-        return transition, is_ok, err_msg
-    return asyncio.create_task(impl())
-
-
-def _transition_as_asyncio_task_in_pool(transition: TransitionCalculation,
-                                        pool: multiprocessing.Pool) -> asyncio.Task:
-    async def impl():
-        loop = asyncio.get_event_loop()
-        is_ok, err_msg, out_resources = await loop.run_in_executor(
-            None,
-            lambda: pool.apply(_run_transition_execute, (transition, )))
-        if is_ok:
-# #
-#             print(
-# f'\nout_resources:\n{repr(out_resources)}\n'
-# )
-# #
-            transition.post_execute_populate_out_resource_data(out_resources)
-        return transition, is_ok, err_msg
-    return asyncio.create_task(impl())
-
-
-def _run_transition_execute(transition: TransitionCalculation):
-    is_ok, err_msg = asyncio.run(transition.execute())
-    return is_ok, err_msg, transition._out_resources
+                    # Only a re-run emits again, so an emitting transition is not cached or
+                    # journaled.
+                    if cache_key is not None and not emitted_transitions:
+                        self._cache.put(cache_key, [r.data for r in transition._out_resources])
+                    self._on_transition_succeed(transition, journaled=not emitted_transitions)
+                else:
+                    self._scheduler.on_transition_failed(transition, err_msg)
+                if tracer is not None:
+                    tracer.on_applied(transition, is_ok)
+                if metrics is not None:
+                    if is_ok:
+                        metrics.transitions_completed_total += 1
+                    else:
+                        metrics.transitions_failed_total += 1
+                    metrics.in_flight_transitions = len(pending)
+        if metrics is not None:
+            metrics.in_flight_transitions = 0
+        if self._journal is not None:
+            await self._journal.flush()
+        if tracer is not None:
+            tracer.on_run_finished()
+
+        failures = self._scheduler.get_failures()
+        if failures:
+            return (False, '\n'.join([f'{len(failures)} transitions failed or cancelled'] +
+                                     [f'{t.name}: {err_msg}' for t, err_msg in failures]))
+        return (True, None)
+
+    async def _execute_with_retries(self, transition: TransitionCalculation
+                                    ) -> tuple[TransitionCalculation, bool, str | None]:
+        uses_streams = any(isinstance(r, StreamResource)
+                           for r in transition._in_resources + transition._out_resources)
+        # A stream is consumed once, so stream transitions get one attempt, on the event loop.
+        retry_policy = None if uses_streams else transition.retry_policy
+        attempt = 1
+        while True:
+            if (self._pool is not None and transition.allow_multiprocess_pool and
+                    not uses_streams):
+                if isinstance(transition, MapTransition):
+                    is_ok, err_msg = await self._execute_traced(
+                        transition,
+                        _execute_map_in_pool(transition, self._pool, self._deadline_time,
+                                             self._pool_slots))
+                else:
+                    is_ok, err_msg = await _execute_in_pool(
+                        transition, self._pool, self._registry, self._tracer,
+                        self._deadline_time, self._pool_slots)
+            elif transition.allow_thread_pool:
+                is_ok, err_msg = await self._execute_traced(
+                    transition, transition.execute(self._thread_pool), 'thread pool')
+            else:
+                is_ok, err_msg = await self._execute_traced(transition, transition.execute())
+            if is_ok or retry_policy is None or attempt >= retry_policy.max_attempts:
+                return transition, is_ok, err_msg
+            abandoned_thread = transition._abandoned_thread
+            if abandoned_thread is not None and not abandoned_thread.done():
+                # Another attempt would run alongside it.
+                return transition, is_ok, err_msg
+            if self._metrics is not None:
+                self._metrics.retries_total += 1
+            await asyncio.sleep(retry_policy.delay(attempt))
+            attempt += 1
+
+    async def _execute_traced(self, transition: TransitionCalculation, execution,
+                              worker: str = 'event loop') -> tuple[bool, str | None]:
+        'Await an execution driven from the event loop, with a tracer record it'
+        if self._tracer is None:
+            return await execution
+        started = time.time()
+        try:
+            return await execution
+        finally:
+            self._tracer.on_executed(transition, worker, started, time.time())
+
+    def _populate_from_cache(self, transition: TransitionCalculation, cache_key: str) -> bool:
+        out_data = self._cache.get(cache_key)
+        if out_data is None or len(out_data) != len(transition._out_resources):
+            return False
+        for r, data in zip(transition._out_resources, out_data):
+            r.populate_data(data).update_status(ResourceStatus.READY)
+        self._limits.release(transition)
+        self._on_transition_succeed(transition)
+        return True
+
+    def _on_transition_succeed(self, transition: TransitionCalculation,
+                               journaled: bool = True) -> None:
+        if self._journal is not None and journaled:
+            self._journal.record(transition)
+        self._scheduler.on_transition_succeed(transition)
+
+
+class _ConcurrencyLimits:
+    def __init__(self, max_in_flight: int | None, concurrency_limits: dict[str, int] | None):
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError(f'max_in_flight must be positive, got {max_in_flight}')
+        for concurrency_class, limit in (concurrency_limits or {}).items():
+            if limit < 1:
+                raise ValueError(f'Limit for {concurrency_class} must be positive, got {limit}')
+        self._max_in_flight = max_in_flight
+        self._class_2_limit = dict(concurrency_limits or {})
+        self._in_flight_count = 0
+        self._class_2_in_flight_count = dict.fromkeys(self._class_2_limit, 0)
+
+    def free_slot_count(self) -> int | None:
+        if self._max_in_flight is None:
+            return None
+        return self._max_in_flight - self._in_flight_count
+
+    def try_acquire(self, transition: TransitionCalculation) -> bool:
+        limited_classes = [c for c in transition.concurrency_classes if c in self._class_2_limit]
+        if any(self._class_2_in_flight_count[c] >= self._class_2_limit[c]
+               for c in limited_classes):
+            return False
+        self._in_flight_count += 1
+        for c in limited_classes:
+            self._class_2_in_flight_count[c] += 1
+        return True
+
+    def release(self, transition: TransitionCalculation) -> None:
+        if any(isinstance(r, StreamResource) for r in transition._in_resources):
+            # Taken by the scheduler within its producer's slot, see Scheduler._reads_stream.
+            return
+        self._in_flight_count -= 1
+        for c in transition.concurrency_classes:
+            if c in self._class_2_limit:
+                self._class_2_in_flight_count[c] -= 1
+
+
+async def _execute_in_pool(transition: TransitionCalculation,
+                           pool: multiprocessing.pool.Pool | concurrent.futures.Executor,
+                           registry: TransitionRegistry | None,
+                           tracer: Tracer | None = None,
+                           deadline: float | None = None,
+                           slots: asyncio.Semaphore | None = None) -> tuple[bool, str | None]:
+    registered_args = registry.task_args(transition) if registry is not None else None
+    timeout = transition.timeout
+    hard_kill_grace = _hard_kill_grace(pool)
+    if registered_args is None:
+        fn, args = _run_transition_execute, (transition, hard_kill_grace, deadline)
+    else:
+        fn, args = (run_registered_transition_execute,
+                    (*registered_args, hard_kill_grace, deadline))
+    no_answer_after = None if timeout is None else timeout + 2 * _POOL_TIMEOUT_GRACE_SECONDS
+    try:
+        if tracer is not None:
+            tracer.on_request_pickled(
+                transition, len(pickle.dumps((fn, args), pickle.HIGHEST_PROTOCOL)))
+            args += (True,)
+        async with (contextlib.nullcontext() if slots is None else slots,
+                    asyncio.timeout(None) as no_answer):
+            if isinstance(pool, RemoteWorkerPool):
+                # Inputs by ResourceID, so a worker that holds them does not get them again.
+                remote_future = pool.submit_with_data(
+                    {r.id: r.data for r in transition._in_resources},
+                    _run_storing_outputs, fn, *args)
+                future = asyncio.wrap_future(remote_future)
+                # Queued until a worker is free, the clock starts once one has the task.
+                loop = asyncio.get_running_loop()
+                remote_future.add_started_callback(lambda: _call_soon_threadsafe(
+                    loop, _start_clock, no_answer, future, no_answer_after))
+            else:
+                # Within the pool's slots, so the task starts once submitted.
+                future = _submit_to_pool(pool, fn, *args)
+                _start_clock(no_answer, future, no_answer_after)
+            is_ok, err_msg, out_resources, emitted_transitions, trace = await future
+    except TimeoutError:
+        return False, f'Timed out after {timeout}s, no answer from the pool worker.'
+    except Exception:
+        return False, traceback.format_exc()
+    if trace is not None:
+        tracer.on_executed(transition, *trace)
+    if is_ok:
+        transition.post_execute_populate_out_resource_data(out_resources)
+        transition.emit_transitions(*emitted_transitions)
+    return is_ok, err_msg
+
+
+async def _execute_map_in_pool(transition: MapTransition,
+                               pool: multiprocessing.pool.Pool | concurrent.futures.Executor,
+                               deadline: float | None = None,
+                               slots: asyncio.Semaphore | None = None
+                               ) -> tuple[bool, str | None]:
+    'Run the transition on the event loop, its batches in the pool'
+    shell = transition.batch_shell()
+    hard_kill_grace = _hard_kill_grace(pool)
+    async def submit_batch(batch) -> list:
+        async with contextlib.nullcontext() if slots is None else slots:
+            return await _submit_to_pool(
+                pool, _run_map_batch, shell, batch, hard_kill_grace, deadline)
+    return await transition.execute(submit_batch)
+
+
+def _run_map_batch(shell: MapTransition, batch, hard_kill_grace: float | None = None,
+                   deadline: float | None = None) -> list:
+    with worker_deadline(None, hard_kill_grace, deadline):
+        return shell.map_batch(batch)
+
+
+def _pool_slots(pool: multiprocessing.pool.Pool | concurrent.futures.Executor | None
+                ) -> asyncio.Semaphore | None:
+    '''A slot per process of a local pool, for tasks to wait in the Executor rather than in the
+    pool queue; a RemoteWorkerPool tells when a task starts instead'''
+    if isinstance(pool, multiprocessing.pool.Pool):
+        process_count = pool._processes
+    elif isinstance(pool, RemoteWorkerPool):
+        process_count = None
+    else:
+        process_count = getattr(pool, '_max_workers', None)
+    return None if process_count is None else asyncio.Semaphore(process_count)
+
+
+def _start_clock(no_answer: asyncio.Timeout, future: asyncio.Future, delay: float | None
+                 ) -> None:
+    'Give a started pool task delay seconds to answer'
+    if delay is not None and not future.done():
+        no_answer.reschedule(asyncio.get_running_loop().time() + delay)
+
+
+def _hard_kill_grace(pool: multiprocessing.pool.Pool | concurrent.futures.Executor
+                     ) -> float | None:
+    # multiprocessing.Pool replaces a worker that exits, a ProcessPoolExecutor would break.
+    return _POOL_TIMEOUT_GRACE_SECONDS if isinstance(pool, multiprocessing.pool.Pool) else None
+
+
+def _submit_to_pool(pool: multiprocessing.pool.Pool | concurrent.futures.Executor,
+                    fn, *args) -> asyncio.Future:
+    '''Submit fn(*args) to the pool and bridge its completion into an asyncio future.
+
+    No thread is held per task: multiprocessing.Pool results arrive through the pool's own
+    result-handler thread, concurrent.futures results through done-callbacks.
+    '''
+    loop = asyncio.get_running_loop()
+    if isinstance(pool, concurrent.futures.Executor):
+        return asyncio.wrap_future(pool.submit(fn, *args), loop=loop)
+
+    future = loop.create_future()
+    pool.apply_async(
+        fn, args,
+        callback=lambda result: _call_soon_threadsafe(
+            loop, _set_future_result, future, result),
+        error_callback=lambda exc: _call_soon_threadsafe(
+            loop, _set_future_exception, future, exc))
+    return future
+
+
+def _call_soon_threadsafe(loop: asyncio.AbstractEventLoop, fn, *args) -> None:
+    try:
+        loop.call_soon_threadsafe(fn, *args)
+    except RuntimeError:
+        # The run was cancelled and its loop closed before the pool answered.
+        pass
+
+
+def _set_future_result(future: asyncio.Future, result) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_future_exception(future: asyncio.Future, exc: BaseException) -> None:
+    if not future.done():
+        future.set_exception(exc)
+
+
+def _data_changed(old_data, new_data) -> bool:
+    try:
+        return bool(new_data != old_data)
+    except Exception:
+        # E.g. arrays, compared elementwise.
+        return True
+
+
+def _run_storing_outputs(fn, *args):
+    'Run a transition task in a remote worker, keeping its outputs there for consumers'
+    result = fn(*args)
+    store = worker_data_store()
+    is_ok, _, out_resources = result[:3]
+    if is_ok and store is not None:
+        for r in out_resources:
+            if r.data is not None:
+                store.put_output(r.id, r.data)
+    return result
+
+
+def _run_transition_execute(transition: TransitionCalculation,
+                            hard_kill_grace: float | None = None, deadline: float | None = None,
+                            traced: bool = False):
+    started = time.time()
+    try:
+        with worker_deadline(transition.timeout, hard_kill_grace, deadline):
+            is_ok, err_msg = asyncio.run(transition.execute())
+        result = is_ok, err_msg, transition._out_resources, transition.pop_emitted_transitions()
+    except TimeoutError as e:
+        result = False, str(e), transition._out_resources, []
+    return result + (worker_trace(started, result) if traced else None,)
@@ -1,15 +1,180 @@
 import asyncio
+import concurrent.futures
 import multiprocessing
 import os
+import threading
+import time
+import weakref
 import pytest
+import signal
 from sortedcontainers import SortedSet
 from typing import override
 
 
 import tiny_parallel_pipeline as tpp
 
+from tiny_parallel_pipeline.entities.map_transition_test import square_map
 from tiny_parallel_pipeline.entities.resource_test import DummyResource
-from tiny_parallel_pipeline.entities.transition_test import DummyTransitionCalculation
+from tiny_parallel_pipeline.entities.transition_test import (
+    DummyTransitionCalculation, RaisingTransitionCalculation)
+
+
+# --- Test-specific subclass ---
+
+class InFlightCountingTransition(DummyTransitionCalculation):
+    in_flight_count = 0
+    max_in_flight_count = 0
+
+    async def _execute_impl(self, in_resources, out_resources):
+        cls = InFlightCountingTransition
+        cls.in_flight_count += 1
+        cls.max_in_flight_count = max(cls.max_in_flight_count, cls.in_flight_count)
+        try:
+            return await super()._execute_impl(in_resources, out_resources)
+        finally:
+            cls.in_flight_count -= 1
+
+
+class FlakyTransition(DummyTransitionCalculation):
+    'Fails the first failure_count attempts'
+    def __init__(self, name, failure_count, **kwargs):
+        super().__init__(name, **kwargs)
+        self._failure_count = failure_count
+        self.attempt_count = 0
+
+    async def _execute_impl(self, in_resources, out_resources):
+        self.attempt_count += 1
+        if self.attempt_count <= self._failure_count:
+            return False, f'{self._name} attempt {self.attempt_count} failed'
+        return await super()._execute_impl(in_resources, out_resources)
+
+
+class BlockingSleepTransition(DummyTransitionCalculation):
+    'Blocks its thread, like os.system or native code would'
+    def __init__(self, name, sleep_period, block_alarm=False, **kwargs):
+        super().__init__(name, **kwargs)
+        self._sleep_period = sleep_period
+        self._block_alarm = block_alarm
+
+    async def _execute_impl(self, in_resources, out_resources):
+        if self._block_alarm:
+            signal.pthread_sigmask(signal.SIG_BLOCK, [signal.SIGALRM])
+        time.sleep(self._sleep_period)
+        return await super()._execute_impl(in_resources, out_resources)
+
+
+class ThreadBlockingTransition(DummyTransitionCalculation):
+    'Synchronous, blocks its pool thread and counts the transitions blocking at once'
+    lock = threading.Lock()
+    in_flight_count = 0
+    max_in_flight_count = 0
+
+    def __init__(self, name, sleep_period, **kwargs):
+        super().__init__(name, allow_thread_pool=True, **kwargs)
+        self._sleep_period = sleep_period
+
+    @override
+    def _execute_impl(self, in_resources, out_resources):
+        cls = ThreadBlockingTransition
+        with cls.lock:
+            cls.in_flight_count += 1
+            cls.max_in_flight_count = max(cls.max_in_flight_count, cls.in_flight_count)
+        try:
+            time.sleep(self._sleep_period)
+        finally:
+            with cls.lock:
+                cls.in_flight_count -= 1
+        out_resources[0].populate_data(threading.current_thread().name)
+        return True, None
+
+
+class ThreadAttemptsTransition(DummyTransitionCalculation):
+    'Synchronous, counts its attempts and outputs once its sleep is over'
+    def __init__(self, name, sleep_period, **kwargs):
+        super().__init__(name, allow_thread_pool=True, **kwargs)
+        self._sleep_period = sleep_period
+        self.attempt_count = 0
+
+    @override
+    def _execute_impl(self, in_resources, out_resources):
+        self.attempt_count += 1
+        time.sleep(self._sleep_period)
+        out_resources[0].populate_data('late')
+        return True, None
+
+
+class ChunkProducer(DummyTransitionCalculation):
+    def __init__(self, name, chunks, events, fail_after=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self._chunks = chunks
+        self._events = events
+        self._fail_after = fail_after
+
+    async def _execute_impl(self, in_resources, out_resources):
+        for i, chunk in enumerate(self._chunks):
+            if i == self._fail_after:
+                raise RuntimeError('producer broke')
+            await out_resources[0].data.put(chunk)
+            self._events.append(f'put {chunk}')
+            await asyncio.sleep(0)
+        self._events.append('producer done')
+        return True, None
+
+
+class ChunkConsumer(DummyTransitionCalculation):
+    def __init__(self, name, events, **kwargs):
+        super().__init__(name, **kwargs)
+        self._events = events
+
+    async def _execute_impl(self, in_resources, out_resources):
+        chunks = []
+        async for chunk in in_resources[0].data:
+            self._events.append(f'got {chunk}')
+            chunks.append(chunk)
+        out_resources[0].populate_data(''.join(chunks))
+        return True, None
+
+
+class ListingEmitter(DummyTransitionCalculation):
+    'Emits a transition per listed item and one more gathering their outputs'
+    def __init__(self, name, item_count, **kwargs):
+        super().__init__(name, **kwargs)
+        self._item_count = item_count
+
+    async def _execute_impl(self, in_resources, out_resources):
+        await super()._execute_impl(in_resources, out_resources)
+        items = [InFlightCountingTransition(
+            f'item-{i}', in_res=[out_resources[0]], out_res=[DummyResource(f'item-{i}')],
+            simulate_async_sleep_period=0.05, allow_multiprocess_pool=True)
+                 for i in range(self._item_count)]
+        self.emit_transitions(*items, DummyTransitionCalculation(
+            'gather', in_res=[t._out_resources[0] for t in items],
+            out_res=[DummyResource('gathered')]))
+        return True, None
+
+
+class FunctionTransition(DummyTransitionCalculation):
+    'Outputs fn of the input data, counting its runs'
+    def __init__(self, name, fn, **kwargs):
+        super().__init__(name, **kwargs)
+        self._fn = fn
+        self.run_count = 0
+
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        self.run_count += 1
+        out_resources[0].populate_data(self._fn(*[r.data for r in in_resources]))
+        return True, None
+
+
+def fan_out_scheduler(transitions: list[tpp.TransitionCalculation]) -> tpp.Scheduler:
+    root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+    for i, t in enumerate(transitions):
+        t.set_in_resources(root).set_out_resources(DummyResource(f'out-{i}'))
+    scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    return scheduler
 
 
 # --- Tests ---
@@ -22,9 +187,9 @@ class TestScheduler:
 
         scheduler = tpp.Scheduler().add_resources(r1, r2).add_transitions(t)
 
-        assert r1.id in scheduler._id2resource
-        assert r2.id in scheduler._id2resource
-        assert t in scheduler._transition2status
+        assert r1.id in scheduler._resource_id2index
+        assert r2.id in scheduler._resource_id2index
+        assert t in scheduler._transition2index
 
         is_ok, err_msg = scheduler.compile()
         assert is_ok
@@ -47,9 +212,9 @@ class TestScheduler:
 
         scheduler = tpp.Scheduler().add_resources(r1, r2).add_transitions(t)
 
-        assert r1.id in scheduler._id2resource
-        assert r2.id in scheduler._id2resource
-        assert t in scheduler._transition2status
+        assert r1.id in scheduler._resource_id2index
+        assert r2.id in scheduler._resource_id2index
+        assert t in scheduler._transition2index
 
         is_ok, err_msg = scheduler.compile()
         assert not is_ok
@@ -78,6 +243,89 @@ class TestScheduler:
                 '<DummyResource id=DummyResource:A status=EMPTY data=empty>',
             ]
 
+    def test_compile_deep_chain(self):
+        resources = [DummyResource(f'r{i}') for i in range(20_001)]
+        resources[0].populate_data('d0').update_status(tpp.ResourceStatus.READY)
+        transitions = [DummyTransitionCalculation(f'T{i}')
+                           .set_in_resources(resources[i - 1])
+                           .set_out_resources(resources[i])
+                       for i in range(1, len(resources))]
+
+        scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        assert scheduler.remaining_resources_count() == 20_000
+        assert [t.name for t in scheduler.get_ready_to_execute_transitions()] == ['T1']
+
+    def test_compile_targets(self):
+        # A library of 100 chains of 10, one chain wanted up to its 5th resource.
+        root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        chains = [[DummyResource(f'c{c}-r{i}') for i in range(10)] for c in range(100)]
+        transitions = [DummyTransitionCalculation(f'c{c}-T{i}')
+                           .set_in_resources(root if i == 0 else chain[i - 1])
+                           .set_out_resources(chain[i])
+                       for c, chain in enumerate(chains) for i in range(10)]
+        target = chains[42][4]
+
+        scheduler = tpp.Scheduler().add_transitions(*transitions)
+        is_ok, err_msg = scheduler.compile(targets=[target.id, target])
+        assert is_ok, err_msg
+
+        assert [t.name for t in scheduler._transitions] == [f'c42-T{i}' for i in range(5)]
+        assert len(scheduler._resources) == 6
+        assert scheduler.remaining_resources_count() == 5
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+        assert is_ok, err_msg
+        assert target.status == tpp.ResourceStatus.READY
+        assert chains[42][5].status == tpp.ResourceStatus.EMPTY
+        assert chains[41][0].status == tpp.ResourceStatus.EMPTY
+
+    def test_compile_targets_stops_at_ready(self):
+        r1, r2, r3 = DummyResource('A'), DummyResource('B'), DummyResource('C')
+        r2.populate_data('b').update_status(tpp.ResourceStatus.READY)
+        t1 = DummyTransitionCalculation('T1', out_res=[r1])
+        t2 = DummyTransitionCalculation('T2', in_res=[r1], out_res=[r2])
+        t3 = DummyTransitionCalculation('T3', in_res=[r2], out_res=[r3])
+
+        scheduler = tpp.Scheduler().add_transitions(t1, t2, t3)
+        is_ok, err_msg = scheduler.compile(targets=[r3])
+        assert is_ok, err_msg
+        assert [t.name for t in scheduler.get_ready_to_execute_transitions()] == ['T3']
+        assert scheduler._transitions == [t3]
+
+    def test_compile_targets_frees_dropped(self):
+        root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        wanted = DummyTransitionCalculation('wanted', in_res=[root], out_res=[DummyResource('A')])
+        dropped = DummyTransitionCalculation('dropped', in_res=[root],
+                                             out_res=[DummyResource('B')])
+        dropped_ref = weakref.ref(dropped)
+
+        scheduler = tpp.Scheduler().add_transitions(wanted, dropped)
+        del dropped
+        is_ok, err_msg = scheduler.compile(targets=[wanted._out_resources[0]])
+        assert is_ok, err_msg
+
+        assert dropped_ref() is None
+
+    def test_compile_targets_errors(self):
+        r1, r2 = DummyResource('A'), DummyResource('B')
+        t1 = DummyTransitionCalculation('T1', in_res=[r1], out_res=[r2])
+        t2 = DummyTransitionCalculation('T2', out_res=[r2])
+        unknown = DummyResource('unknown')
+
+        is_ok, err_msg = tpp.Scheduler().add_transitions(t1).compile(targets=[unknown.id])
+        assert not is_ok
+        assert err_msg == 'No transition to calculate DummyResource:unknown.'
+
+        is_ok, err_msg = tpp.Scheduler().add_transitions(t1).compile(targets=[r2])
+        assert not is_ok
+        assert err_msg == 'No transition to calculate <DummyResource id=DummyResource:A status=EMPTY data=empty>.'
+
+        is_ok, err_msg = tpp.Scheduler().add_transitions(t1, t2).compile(targets=[r2])
+        assert not is_ok
+        assert err_msg.startswith('<DummyResource id=DummyResource:B status=EMPTY data=empty> out '
+                                  'of multiple transitions <DummyTransitionCalculation T2')
+
     def test_ready_to_execute_transitions(self):
         r1 = DummyResource('A').update_status(tpp.ResourceStatus.READY)
         r2 = DummyResource('B')
@@ -101,6 +349,182 @@ class TestScheduler:
         scheduler.mark_transitions_in_progress(t12)
         assert [t.name for t in scheduler.get_ready_to_execute_transitions()] == ['T23']
 
+    def test_pop_ready_to_execute_transitions(self):
+        r0 = DummyResource('A').update_status(tpp.ResourceStatus.READY).populate_data('data-A')
+        outs = [DummyResource(f'B{i}') for i in range(3)]
+        transitions = [DummyTransitionCalculation(f'T{i}').set_in_resources(r0).set_out_resources(r)
+                       for i, r in enumerate(outs)]
+        scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        scheduler.mark_transitions_in_progress(transitions[0])
+        assert [t.name for t in scheduler.pop_ready_to_execute_transitions(1)] == ['T1']
+        assert [t.name for t in scheduler.get_ready_to_execute_transitions()] == ['T2']
+        assert [t.name for t in scheduler.pop_ready_to_execute_transitions()] == ['T2']
+        assert scheduler.pop_ready_to_execute_transitions() == []
+
+    def test_pop_ready_to_execute_transitions_try_acquire(self):
+        transitions = [
+            DummyTransitionCalculation('N0').set_concurrency_classes('network'),
+            DummyTransitionCalculation('C0'),
+            DummyTransitionCalculation('N1').set_concurrency_classes('network'),
+            DummyTransitionCalculation('C1'),
+        ]
+        scheduler = fan_out_scheduler(transitions)
+
+        bucket = scheduler.pop_ready_to_execute_transitions(
+            try_acquire=lambda t: 'network' not in t.concurrency_classes)
+        assert [t.name for t in bucket] == ['C0', 'C1']
+        assert [t.name for t in scheduler.get_ready_to_execute_transitions()] == ['N0', 'N1']
+
+    def test_pop_ready_to_execute_transitions_priority(self):
+        def build(critical_path_priority, side_priority=0):
+            root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+            chain = [DummyResource(f'chain-{i}') for i in range(3)]
+            transitions = [
+                DummyTransitionCalculation('side', in_res=[root], out_res=[DummyResource('side')])
+                    .set_priority(side_priority),
+                DummyTransitionCalculation('chain-0', in_res=[root], out_res=[chain[0]]),
+                DummyTransitionCalculation('chain-1', in_res=[chain[0]], out_res=[chain[1]]),
+                DummyTransitionCalculation('chain-2', in_res=[chain[1]], out_res=[chain[2]])
+                    .set_estimated_cost(5.0),
+            ]
+            scheduler = (tpp.Scheduler(critical_path_priority=critical_path_priority)
+                .add_transitions(*transitions)
+                .pull_all_resources_from_transitions())
+            is_ok, err_msg = scheduler.compile()
+            assert is_ok, err_msg
+            return scheduler, transitions
+
+        scheduler, transitions = build(critical_path_priority=True)
+        assert [scheduler._upward_ranks[scheduler._transition2index[t]] for t in transitions] == [
+            1.0, 7.0, 6.0, 5.0]
+        assert [t.name for t in scheduler.pop_ready_to_execute_transitions(1)] == ['chain-0']
+
+        scheduler, _ = build(critical_path_priority=False)
+        assert [t.name for t in scheduler.pop_ready_to_execute_transitions(1)] == ['side']
+
+        scheduler, _ = build(critical_path_priority=True, side_priority=1)
+        assert [t.name for t in scheduler.pop_ready_to_execute_transitions(1)] == ['side']
+
+    def test_compile_costs_from_duration_history(self):
+        history = tpp.DurationHistory()
+        root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        slow = DummyTransitionCalculation('slow', in_res=[root], out_res=[DummyResource('slow')])
+        fast = DummyTransitionCalculation('fast', in_res=[root], out_res=[DummyResource('fast')])
+        history.record(slow, 3.0)
+
+        scheduler = (tpp.Scheduler(duration_history=history)
+            .add_transitions(fast, slow)
+            .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        assert [t.name for t in scheduler.get_ready_to_execute_transitions()] == ['slow', 'fast']
+
+    def test_compile_stream_multiple_consumers(self):
+        stream = tpp.StreamResource('S')
+        scheduler = tpp.Scheduler().add_transitions(
+            DummyTransitionCalculation('P', out_res=[stream]),
+            DummyTransitionCalculation('C1', in_res=[stream], out_res=[DummyResource('C1')]),
+            DummyTransitionCalculation('C2', in_res=[stream], out_res=[DummyResource('C2')]),
+        ).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert not is_ok
+        assert err_msg.startswith(
+            '<StreamResource id=StreamResource:S status=EMPTY data=empty> streamed to multiple '
+            'transitions <DummyTransitionCalculation C1')
+
+    def test_compile_stream_no_consumer(self):
+        scheduler = tpp.Scheduler().add_transitions(
+            DummyTransitionCalculation('P', out_res=[tpp.StreamResource('S')]),
+        ).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert not is_ok
+        assert err_msg == ('<StreamResource id=StreamResource:S status=EMPTY data=empty> '
+                           'streamed to no transition.')
+
+    def test_add_dynamic_transitions(self):
+        listing = DummyResource('listing')
+        t = DummyTransitionCalculation('T1', out_res=[listing])
+        scheduler = tpp.Scheduler().add_transitions(t).pull_all_resources_from_transitions()
+        scheduler.get_resource(DummyResource('in').id).update_status(tpp.ResourceStatus.READY)
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        assert scheduler.pop_ready_to_execute_transitions() == [t]
+
+        items = [DummyTransitionCalculation(f'item-{i}', in_res=[listing],
+                                            out_res=[DummyResource(f'item-{i}')])
+                 for i in range(3)]
+        is_ok, err_msg = scheduler.add_dynamic_transitions(*items)
+        assert is_ok, err_msg
+        assert scheduler.get_ready_to_execute_transitions() == []
+        assert scheduler.remaining_resources_count() == 4
+
+        listing.update_status(tpp.ResourceStatus.READY)
+        scheduler.on_transition_succeed(t)
+        assert scheduler.get_ready_to_execute_transitions() == items
+
+    def test_add_dynamic_transitions_errors(self):
+        known = DummyResource('known')
+        scheduler = tpp.Scheduler().add_transitions(
+            DummyTransitionCalculation('T1', out_res=[known])).pull_all_resources_from_transitions()
+        with pytest.raises(ValueError, match='Not compiled yet.'):
+            scheduler.add_dynamic_transitions()
+        scheduler.get_resource(DummyResource('in').id).update_status(tpp.ResourceStatus.READY)
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        is_ok, err_msg = scheduler.add_dynamic_transitions(
+            DummyTransitionCalculation('T2', out_res=[DummyResource('known')]))
+        assert not is_ok
+        assert err_msg.startswith('<DummyResource id=DummyResource:known status=EMPTY data=empty> '
+                                  'out of <DummyTransitionCalculation T2')
+
+        is_ok, err_msg = scheduler.add_dynamic_transitions(
+            DummyTransitionCalculation('T2', in_res=[DummyResource('nowhere')]))
+        assert not is_ok
+        assert err_msg == ('No transition to calculate '
+                           '<DummyResource id=DummyResource:nowhere status=EMPTY data=empty>.')
+
+        # A refused transition keeps its own input objects.
+        known_copy = DummyResource('known')
+        refused = DummyTransitionCalculation('T2', in_res=[known_copy, DummyResource('nowhere')])
+        is_ok, _ = scheduler.add_dynamic_transitions(refused)
+        assert not is_ok
+        assert refused._in_resources[0] is known_copy
+
+        r1, r2 = DummyResource('B'), DummyResource('C')
+        is_ok, err_msg = scheduler.add_dynamic_transitions(
+            DummyTransitionCalculation('T2', in_res=[r1], out_res=[r2]),
+            DummyTransitionCalculation('T3', in_res=[r2], out_res=[r1]))
+        assert not is_ok
+        assert err_msg.startswith('Dependency loop\n<DummyTransitionCalculation T2')
+        assert scheduler.remaining_resources_count() == 1
+
+        stream = tpp.StreamResource('S')
+        is_ok, err_msg = scheduler.add_dynamic_transitions(
+            DummyTransitionCalculation('T2', in_res=[known], out_res=[stream]))
+        assert not is_ok
+        assert err_msg == ('<StreamResource id=StreamResource:S status=EMPTY data=empty> '
+                           'streamed to no transition.')
+
+    def test_add_dynamic_transitions_failed_upstream(self):
+        listing = DummyResource('listing')
+        t = DummyTransitionCalculation('T1', out_res=[listing])
+        scheduler = tpp.Scheduler().add_transitions(t).pull_all_resources_from_transitions()
+        scheduler.get_resource(DummyResource('in').id).update_status(tpp.ResourceStatus.READY)
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        scheduler.pop_ready_to_execute_transitions()
+        scheduler.on_transition_failed(t, 'T1 broke')
+
+        item = DummyTransitionCalculation('item', in_res=[listing])
+        is_ok, err_msg = scheduler.add_dynamic_transitions(item)
+        assert is_ok, err_msg
+        assert scheduler.get_failures() == [(t, 'T1 broke'), (item, 'Upstream T1 failed.')]
+        assert scheduler.remaining_resources_count() == 0
+
     # async def test_on_transition_succeed(self):
     def test_on_transition_succeed(self):
         r1 = DummyResource('A').update_status(tpp.ResourceStatus.READY).populate_data('data-A')
@@ -205,3 +629,530 @@ class TestExecutor:
         transition_pids = set(r.data[1] for r in resources)
         assert main_pid not in transition_pids, f'{repr(main_pid)} {repr(transition_pids)}'
         assert len(transition_pids) > 1, f'{repr(main_pid)} {repr(transition_pids)}'
+
+    def test_executor_process_pool_executor(self):
+        resources = [DummyResource(f'r{i}') for i in range(6)]
+        resources[0].populate_data('d0').update_status(tpp.ResourceStatus.READY)
+        transitions = [
+            DummyTransitionCalculation(f'T{i}', data_add_pid=True, allow_multiprocess_pool=True)
+                    .set_in_resources(resources[i - 1])
+                    .set_out_resources(resources[i])
+                for i in range(1, len(resources))
+        ]
+
+        scheduler = (tpp.Scheduler()
+            .add_transitions(*transitions)
+            .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        with concurrent.futures.ProcessPoolExecutor(2) as pool:
+            asyncio.run(tpp.Executor(scheduler, pool).run())
+
+        assert set(r.status for r in resources) == {tpp.ResourceStatus.READY}
+        assert resources[-1].data[0] == 'by T5 r4'
+        assert os.getpid() not in set(r.data[1] for r in resources[1:])
+
+    def test_executor_pool_uses_no_thread_per_task(self):
+        num_transitions = 200
+        resources = [DummyResource(f'r{i}') for i in range(num_transitions + 1)]
+        resources[0].populate_data('d0').update_status(tpp.ResourceStatus.READY)
+        transitions = [
+            DummyTransitionCalculation(f'T{i}', allow_multiprocess_pool=True)
+                    .set_in_resources(resources[0])
+                    .set_out_resources(resources[i])
+                for i in range(1, len(resources))
+        ]
+
+        scheduler = (tpp.Scheduler()
+            .add_transitions(*transitions)
+            .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        with multiprocessing.Pool(2) as pool:
+            baseline_thread_count = threading.active_count()
+            max_thread_count = baseline_thread_count
+
+            async def run_and_sample():
+                nonlocal max_thread_count
+                run_task = asyncio.create_task(tpp.Executor(scheduler, pool).run())
+                while not run_task.done():
+                    max_thread_count = max(max_thread_count, threading.active_count())
+                    await asyncio.sleep(0)
+                await run_task
+
+            asyncio.run(run_and_sample())
+
+        assert set(r.status for r in resources) == {tpp.ResourceStatus.READY}
+        assert max_thread_count == baseline_thread_count
+
+    def test_executor_max_in_flight(self):
+        InFlightCountingTransition.max_in_flight_count = 0
+        scheduler = fan_out_scheduler([
+            InFlightCountingTransition(f'T{i}', simulate_async_sleep_period=0.01)
+            for i in range(10)])
+
+        asyncio.run(tpp.Executor(scheduler, max_in_flight=3).run())
+
+        assert scheduler.remaining_resources_count() == 0
+        assert InFlightCountingTransition.max_in_flight_count == 3
+
+    def test_executor_concurrency_limits(self):
+        InFlightCountingTransition.max_in_flight_count = 0
+        scheduler = fan_out_scheduler(
+            [InFlightCountingTransition(f'N{i}', simulate_async_sleep_period=0.01)
+                 .set_concurrency_classes('network')
+             for i in range(10)] +
+            [DummyTransitionCalculation(f'C{i}', simulate_async_sleep_period=0.01)
+             for i in range(10)])
+
+        async def run_and_sample():
+            run_task = asyncio.create_task(tpp.Executor(
+                scheduler, concurrency_limits={'network': 2}).run())
+            await asyncio.sleep(0.005)
+            # Every unlimited transition started at once, network ones wait in the scheduler.
+            assert sorted(t.name for t in scheduler.get_ready_to_execute_transitions()) == [
+                f'N{i}' for i in range(2, 10)]
+            await run_task
+
+        asyncio.run(run_and_sample())
+
+        assert scheduler.remaining_resources_count() == 0
+        assert InFlightCountingTransition.max_in_flight_count == 2
+
+    def test_executor_records_durations(self):
+        history = tpp.DurationHistory()
+        scheduler = tpp.Scheduler(duration_history=history)
+        scheduler.add_transitions(
+            DummyTransitionCalculation('T1', simulate_async_sleep_period=0.01).set_in_resources(
+                DummyResource('A').populate_data('d').update_status(tpp.ResourceStatus.READY)))
+        is_ok, err_msg = scheduler.pull_all_resources_from_transitions().compile()
+        assert is_ok, err_msg
+
+        asyncio.run(tpp.Executor(scheduler).run())
+
+        assert len(history) == 1
+        assert history.estimate(DummyTransitionCalculation('T1')) >= 0.01
+
+    def test_executor_failure_cancels_dependents(self):
+        r = {name: DummyResource(name) for name in 'ABCDE'}
+        r['A'].populate_data('d').update_status(tpp.ResourceStatus.READY)
+        scheduler = tpp.Scheduler().add_transitions(
+            FlakyTransition('TB', failure_count=1, in_res=[r['A']], out_res=[r['B']]),
+            DummyTransitionCalculation('TC', in_res=[r['B']], out_res=[r['C']]),
+            DummyTransitionCalculation('TD', in_res=[r['C']], out_res=[r['D']]),
+            RaisingTransitionCalculation('TE', in_res=[r['A']], out_res=[r['E']]),
+            DummyTransitionCalculation('TF', in_res=[r['A']], out_res=[DummyResource('F')]),
+        ).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+
+        assert not is_ok
+        lines = err_msg.split('\n')
+        assert lines[:4] == ['4 transitions failed or cancelled', 'TB: TB attempt 1 failed',
+                             'TC: Upstream TB failed.', 'TD: Upstream TB failed.']
+        assert lines[4].startswith('TE: Traceback')
+        assert 'ValueError: TE raised' in err_msg
+        assert scheduler.remaining_resources_count() == 0
+        assert [r[name].status for name in 'BCDE'] == [tpp.ResourceStatus.EMPTY] * 4
+        assert [f.name for f, _ in scheduler.get_failures()] == ['TB', 'TC', 'TD', 'TE']
+
+    def test_executor_retries(self):
+        flaky = FlakyTransition('T', failure_count=2).set_retry_policy(
+            tpp.RetryPolicy(max_attempts=3, initial_delay=0.001))
+        flaky.set_in_resources(
+            DummyResource('A').populate_data('d').update_status(tpp.ResourceStatus.READY))
+        scheduler = tpp.Scheduler().add_transitions(flaky).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+
+        assert is_ok, err_msg
+        assert flaky.attempt_count == 3
+
+    def test_executor_pool_failure(self):
+        scheduler = fan_out_scheduler([
+            RaisingTransitionCalculation('TR', allow_multiprocess_pool=True),
+            DummyTransitionCalculation('TOK', allow_multiprocess_pool=True)])
+
+        with multiprocessing.Pool(2) as pool:
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+
+        assert not is_ok
+        assert 'ValueError: TR raised' in err_msg
+        assert [t.name for t, _ in scheduler.get_failures()] == ['TR']
+
+    def test_executor_timeout(self):
+        scheduler = fan_out_scheduler([
+            DummyTransitionCalculation('slow', simulate_async_sleep_period=5.0).set_timeout(0.05),
+            DummyTransitionCalculation('fast', simulate_async_sleep_period=0.01).set_timeout(1.0)])
+
+        start = time.perf_counter()
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+
+        assert time.perf_counter() - start < 1.0
+        assert not is_ok
+        assert err_msg.split('\n') == [
+            '1 transitions failed or cancelled', 'slow: Timed out after 0.05s.']
+
+    def test_executor_pool_timeout_blocking(self):
+        scheduler = fan_out_scheduler([
+            BlockingSleepTransition('blocked', 5.0, allow_multiprocess_pool=True).set_timeout(0.1),
+            DummyTransitionCalculation('ok', allow_multiprocess_pool=True)])
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(2) as pool:
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+
+        assert time.perf_counter() - start < 1.0
+        assert not is_ok
+        assert [t.name for t, _ in scheduler.get_failures()] == ['blocked']
+        assert 'TimeoutError: Timed out after 0.1s.' in err_msg
+
+    def test_executor_pool_timeout_hard_kill(self):
+        scheduler = fan_out_scheduler([
+            BlockingSleepTransition('stuck', 10.0, block_alarm=True,
+                                    allow_multiprocess_pool=True).set_timeout(0.1)])
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(1) as pool:
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+            # The stuck worker was killed and replaced.
+            assert pool.apply(os.getpid) != os.getpid()
+
+        assert time.perf_counter() - start < 5.0
+        assert not is_ok
+        assert err_msg.split('\n')[1] == (
+            'stuck: Timed out after 0.1s, no answer from the pool worker.')
+
+    @pytest.mark.parametrize('make_pool', [
+        multiprocessing.Pool, concurrent.futures.ProcessPoolExecutor])
+    def test_executor_pool_timeout_excludes_queueing(self, make_pool, monkeypatch):
+        # No answer 0.5s after starting is a timeout; the last task starts 0.6s after submission.
+        monkeypatch.setattr('tiny_parallel_pipeline.execute._POOL_TIMEOUT_GRACE_SECONDS', 0.1)
+        scheduler = fan_out_scheduler([
+            DummyTransitionCalculation(f'T{i}', simulate_async_sleep_period=0.2,
+                                       allow_multiprocess_pool=True).set_timeout(0.3)
+            for i in range(4)])
+
+        with make_pool(1) as pool:
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+
+        assert is_ok, err_msg
+
+    @pytest.mark.parametrize('block_alarm', [False, True])
+    def test_executor_deadline_stops_pool_worker(self, block_alarm):
+        scheduler = fan_out_scheduler([
+            BlockingSleepTransition('stuck', 10.0, block_alarm=block_alarm,
+                                    allow_multiprocess_pool=True)])
+
+        start = time.perf_counter()
+        with multiprocessing.Pool(1) as pool:
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool, deadline=0.2).run())
+            # The worker is free again, interrupted or killed and replaced.
+            pool.apply(os.getpid)
+
+        assert time.perf_counter() - start < 5.0
+        assert not is_ok
+        assert err_msg.split('\n')[1] == 'stuck: Pipeline deadline of 0.2s exceeded.'
+
+    def test_executor_deadline(self):
+        outs = [DummyResource(f'out-{i}') for i in range(3)]
+        root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        scheduler = tpp.Scheduler().add_transitions(
+            DummyTransitionCalculation('T0', in_res=[root], out_res=[outs[0]]),
+            DummyTransitionCalculation('T1', in_res=[root], out_res=[outs[1]],
+                                       simulate_async_sleep_period=5.0),
+            DummyTransitionCalculation('T2', in_res=[outs[1]], out_res=[outs[2]]),
+        ).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        start = time.perf_counter()
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, deadline=0.1).run())
+
+        assert time.perf_counter() - start < 1.0
+        assert not is_ok
+        assert [r.status for r in outs] == [
+            tpp.ResourceStatus.READY, tpp.ResourceStatus.EMPTY, tpp.ResourceStatus.EMPTY]
+        assert [(t.name, msg) for t, msg in scheduler.get_failures()] == [
+            ('T1', 'Pipeline deadline of 0.1s exceeded.'),
+            ('T2', 'Pipeline deadline of 0.1s exceeded.')]
+
+    def stream_scheduler(self, producer, events):
+        out = DummyResource('out')
+        stream = tpp.StreamResource('S', max_buffered_chunks=1)
+        producer.set_in_resources(
+            DummyResource('A').populate_data('d').update_status(tpp.ResourceStatus.READY))
+        producer.set_out_resources(stream)
+        scheduler = tpp.Scheduler().add_transitions(
+            producer,
+            ChunkConsumer('C', events, allow_multiprocess_pool=True, in_res=[stream], out_res=[out]),
+        ).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        return scheduler, stream, out
+
+    def test_executor_stream_overlaps_stages(self):
+        events = []
+        scheduler, stream, out = self.stream_scheduler(
+            ChunkProducer('P', ['a', 'b', 'c'], events), events)
+
+        with multiprocessing.Pool(1) as pool:
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool, max_in_flight=2).run())
+
+        assert is_ok, err_msg
+        assert out.data == 'abc'
+        assert stream.status == tpp.ResourceStatus.READY
+        assert events.index('got a') < events.index('producer done')
+
+    @pytest.mark.parametrize('limits', [dict(max_in_flight=1),
+                                        dict(concurrency_limits={'streaming': 1})])
+    def test_executor_stream_within_limits(self, limits):
+        events = []
+        producer = ChunkProducer('P', ['a', 'b', 'c'], events)
+        scheduler, stream, out = self.stream_scheduler(producer, events)
+        for t in scheduler._transitions:
+            t.set_concurrency_classes('streaming')
+
+        is_ok, err_msg = asyncio.run(
+            asyncio.wait_for(tpp.Executor(scheduler, **limits).run(), 5.0))
+
+        assert is_ok, err_msg
+        assert out.data == 'abc'
+
+    def test_executor_stream_producer_failure(self):
+        events = []
+        scheduler, stream, out = self.stream_scheduler(
+            ChunkProducer('P', ['a', 'b', 'c'], events, fail_after=2), events)
+
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+
+        assert not is_ok
+        assert [t.name for t, _ in scheduler.get_failures()] == ['P', 'C']
+        assert 'RuntimeError: Stream producer P failed' in err_msg
+        assert out.status == tpp.ResourceStatus.EMPTY
+
+    @pytest.mark.parametrize('use_pool', [False, True])
+    def test_executor_dynamic_fan_out(self, use_pool):
+        InFlightCountingTransition.max_in_flight_count = 0
+        root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        scheduler = tpp.Scheduler().add_transitions(
+            ListingEmitter('list', 3, allow_multiprocess_pool=True, in_res=[root],
+                           out_res=[DummyResource('listing')]),
+        ).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        if use_pool:
+            with multiprocessing.Pool(3) as pool:
+                is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+        else:
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+
+        assert is_ok, err_msg
+        assert len(scheduler._transitions) == 5
+        gathered = scheduler.get_resource(DummyResource('gathered').id)
+        assert gathered.data == 'by gather item-0|item-1|item-2'
+        if not use_pool:
+            assert InFlightCountingTransition.max_in_flight_count == 3
+
+    def test_executor_refused_emission_empties_emitter(self):
+        root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        listing = DummyResource('listing')
+        scheduler = tpp.Scheduler().add_transitions(
+            ListingEmitter('list', 2, in_res=[root], out_res=[listing]),
+            # Already produces an output the emitter's gather transition would add.
+            DummyTransitionCalculation('other', in_res=[root], out_res=[DummyResource('gathered')]),
+        ).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+
+        assert not is_ok
+        assert [t.name for t, _ in scheduler.get_failures()] == ['list']
+        assert listing.status == tpp.ResourceStatus.EMPTY
+        assert listing.data is None
+
+    @pytest.mark.parametrize('pool_class', [multiprocessing.Pool,
+                                            concurrent.futures.ProcessPoolExecutor])
+    def test_executor_map_transition_pool(self, pool_class):
+        t = square_map(1000, batch_size=64, allow_multiprocess_pool=True)
+        scheduler = tpp.Scheduler().add_transitions(t).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        with pool_class(2) as pool:
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+
+        assert is_ok, err_msg
+        assert t._out_resources[0].data == [i * i for i in range(1000)]
+
+    def test_executor_thread_pool(self):
+        ThreadBlockingTransition.max_in_flight_count = 0
+        transitions = [ThreadBlockingTransition(f'T{i}', 0.2) for i in range(4)]
+        scheduler = fan_out_scheduler(
+            transitions + [DummyTransitionCalculation('loop', simulate_async_sleep_period=0.1)])
+
+        start = time.perf_counter()
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, thread_pool_size=4).run())
+
+        # Blocking transitions overlap and leave the event loop free.
+        assert time.perf_counter() - start < 0.6
+        assert is_ok, err_msg
+        assert ThreadBlockingTransition.max_in_flight_count == 4
+        assert all(t._out_resources[0].data.startswith('tpp-transition') for t in transitions)
+
+    def test_executor_thread_pool_size(self):
+        ThreadBlockingTransition.max_in_flight_count = 0
+        scheduler = fan_out_scheduler([ThreadBlockingTransition(f'T{i}', 0.05) for i in range(6)])
+
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, thread_pool_size=2).run())
+
+        assert is_ok, err_msg
+        assert ThreadBlockingTransition.max_in_flight_count == 2
+
+    def test_executor_thread_pool_timeout(self):
+        scheduler = fan_out_scheduler([
+            ThreadBlockingTransition('blocked', 1.0).set_timeout(0.05),
+            ThreadBlockingTransition('ok', 0.01)])
+
+        start = time.perf_counter()
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+
+        assert time.perf_counter() - start < 0.5
+        assert not is_ok
+        assert err_msg.split('\n') == [
+            '1 transitions failed or cancelled', 'blocked: Timed out after 0.05s.']
+
+    def test_executor_thread_pool_timeout_no_overlap(self):
+        t = (ThreadAttemptsTransition('blocked', 0.3).set_timeout(0.05)
+             .set_retry_policy(tpp.RetryPolicy(max_attempts=3, initial_delay=0.001)))
+        scheduler = fan_out_scheduler([t])
+
+        is_ok, _ = asyncio.run(tpp.Executor(scheduler).run())
+        # Past the end of the abandoned thread.
+        time.sleep(0.4)
+
+        assert not is_ok
+        assert t.attempt_count == 1
+        out = t._out_resources[0]
+        assert out.status == tpp.ResourceStatus.EMPTY
+        assert out.data is None
+
+    def test_notify_changed_reruns_cone(self):
+        r = {name: DummyResource(name) for name in 'abxyzw'}
+        r['a'].populate_data(1).update_status(tpp.ResourceStatus.READY)
+        r['b'].populate_data(10).update_status(tpp.ResourceStatus.READY)
+        t = {
+            'x': FunctionTransition('Tx', lambda a: 2 * a, in_res=[r['a']], out_res=[r['x']]),
+            'y': FunctionTransition('Ty', lambda b: 2 * b, in_res=[r['b']], out_res=[r['y']]),
+            'z': FunctionTransition('Tz', lambda x, y: x + y, in_res=[r['x'], r['y']],
+                                    out_res=[r['z']]),
+            'w': FunctionTransition('Tw', lambda y: y + 1, in_res=[r['y']], out_res=[r['w']]),
+        }
+        scheduler = (tpp.Scheduler().add_transitions(*t.values())
+                     .pull_all_resources_from_transitions())
+        with pytest.raises(ValueError, match='Not compiled yet.'):
+            scheduler.notify_changed(r['a'])
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        executor = tpp.Executor(scheduler)
+        assert asyncio.run(executor.run()) == (True, None)
+        assert r['z'].data == 22
+
+        r['a'].populate_data(5)
+        is_ok, err_msg = scheduler.notify_changed(r['a'].id)
+        assert is_ok, err_msg
+        assert scheduler.remaining_resources_count() == 2
+        assert asyncio.run(executor.run()) == (True, None)
+
+        assert (r['x'].data, r['z'].data, r['w'].data) == (10, 30, 21)
+        assert {name: t.run_count for name, t in t.items()} == {'x': 2, 'y': 1, 'z': 2, 'w': 1}
+
+    def test_notify_changed_early_cutoff(self):
+        resources = [DummyResource(f'r{i}') for i in range(5)]
+        resources[0].populate_data(1).update_status(tpp.ResourceStatus.READY)
+        parity = FunctionTransition('parity', lambda n: n % 2,
+                                    in_res=resources[:1], out_res=resources[1:2])
+        chain = [FunctionTransition(f'T{i}', lambda n: n + 1,
+                                    in_res=[resources[i]], out_res=[resources[i + 1]])
+                 for i in range(1, 4)]
+        scheduler = (tpp.Scheduler().add_transitions(parity, *chain)
+                     .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        assert asyncio.run(tpp.Executor(scheduler).run()) == (True, None)
+
+        resources[0].populate_data(3)
+        assert scheduler.notify_changed(resources[0]) == (True, None)
+        assert asyncio.run(tpp.Executor(scheduler).run()) == (True, None)
+        # Same parity, the chain is not run again.
+        assert (parity.run_count, [t.run_count for t in chain]) == (2, [1, 1, 1])
+        assert resources[-1].data == 4
+
+        resources[0].populate_data(4)
+        assert scheduler.notify_changed(resources[0]) == (True, None)
+        assert asyncio.run(tpp.Executor(scheduler).run()) == (True, None)
+        assert (parity.run_count, [t.run_count for t in chain]) == (3, [2, 2, 2])
+        assert resources[-1].data == 3
+
+    def test_notify_changed_retries_failed(self):
+        r = {name: DummyResource(name) for name in 'abc'}
+        r['a'].populate_data(-1).update_status(tpp.ResourceStatus.READY)
+        def check_positive(a):
+            assert a > 0, 'not positive'
+            return a
+        tb = FunctionTransition('Tb', check_positive, in_res=[r['a']], out_res=[r['b']])
+        tc = FunctionTransition('Tc', lambda b: b * 2, in_res=[r['b']], out_res=[r['c']])
+        scheduler = tpp.Scheduler().add_transitions(tb, tc).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler).run())
+        assert not is_ok
+        assert [t.name for t, _ in scheduler.get_failures()] == ['Tb', 'Tc']
+
+        r['a'].populate_data(2)
+        assert scheduler.notify_changed(r['a']) == (True, None)
+        assert asyncio.run(tpp.Executor(scheduler).run()) == (True, None)
+        assert r['c'].data == 4
+        assert scheduler.get_failures() == []
+
+    def test_notify_changed_refuses_emitters(self):
+        root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        scheduler = tpp.Scheduler().add_transitions(
+            ListingEmitter('list', 2, in_res=[root], out_res=[DummyResource('listing')]),
+        ).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        assert asyncio.run(tpp.Executor(scheduler).run()) == (True, None)
+
+        root.populate_data('e')
+        is_ok, err_msg = scheduler.notify_changed(root)
+
+        assert not is_ok
+        assert err_msg.startswith('<ListingEmitter list : ')
+        assert err_msg.endswith('> emitted transitions, it cannot be re-run.')
+        assert scheduler.remaining_resources_count() == 0
+
+    def test_notify_changed_errors(self):
+        r = {name: DummyResource(name) for name in 'ab'}
+        r['a'].populate_data(1).update_status(tpp.ResourceStatus.READY)
+        t = FunctionTransition('Tb', lambda a: a, in_res=[r['a']], out_res=[r['b']])
+        scheduler = tpp.Scheduler().add_transitions(t).pull_all_resources_from_transitions()
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        with pytest.raises(ValueError, match='Still running.'):
+            scheduler.notify_changed(r['a'])
+        assert asyncio.run(tpp.Executor(scheduler).run()) == (True, None)
+        assert scheduler.notify_changed(DummyResource('unknown')) == (
+            False, 'Unknown resource DummyResource:unknown.')
+        r['b'].populate_data(None).update_status(tpp.ResourceStatus.EMPTY)
+        assert scheduler.notify_changed(r['b']) == (
+            False, '<DummyResource id=DummyResource:b status=EMPTY data=empty> is not READY.')
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+
+class ExecutorMetrics:
+    '''Live counters and gauges of an Executor run.
+
+    Pass to Executor(metrics=...). Plain attributes, updated and read on the event loop, so the
+    scheduler hot path takes no locks; gauges that need a scan, like the ready queue depth, are
+    computed only when a snapshot is taken. Serve them with serve_metrics().
+    '''
+    # Name, type and help of each exposed value, in snapshot() keys without the prefix.
+    _EXPOSED = [
+        ('transitions_started_total', 'counter', 'Transitions handed to execution.'),
+        ('transitions_completed_total', 'counter', 'Transitions succeeded, cache hits included.'),
+        ('transitions_failed_total', 'counter', 'Transitions failed after their retries.'),
+        ('cache_hits_total', 'counter', 'Transitions completed from the result cache.'),
+        ('retries_total', 'counter', 'Attempts repeated after a failure.'),
+        ('in_flight_transitions', 'gauge', 'Transitions executing now.'),
+        ('ready_transitions', 'gauge', 'Transitions ready and waiting for a slot.'),
+        ('remaining_resources', 'gauge', 'Wanted resources not produced yet.'),
+        ('run_seconds', 'gauge', 'Seconds since the run started.'),
+        ('completed_per_second', 'gauge', 'Average completion rate of the run.'),
+        ('pool_bytes_sent_total', 'counter', 'Bytes sent to remote pool workers.'),
+        ('pool_bytes_received_total', 'counter', 'Bytes received from remote pool workers.'),
+        ('pool_input_bytes_reused_total', 'counter',
+         'Input bytes not sent as the remote worker already held them.'),
+    ]
+
+    def __init__(self, prefix: str = 'tpp_'):
+        self._prefix = prefix
+        self.transitions_started_total = 0
+        self.transitions_completed_total = 0
+        self.transitions_failed_total = 0
+        self.cache_hits_total = 0
+        self.retries_total = 0
+        self.in_flight_transitions = 0
+        self._scheduler = None
+        self._pool = None
+        self._run_started: float | None = None
+
+    def attach(self, scheduler: 'Scheduler', pool=None) -> None:
+        '''Called by Executor.run to source the scheduler gauges and the transfer counters of a
+        RemoteWorkerPool, which count over the life of the pool, and start the run clock'''
+        self._scheduler = scheduler
+        self._pool = pool
+        self._run_started = time.monotonic()
+
+    def snapshot(self) -> dict[str, float]:
+        run_seconds = 0.0 if self._run_started is None else time.monotonic() - self._run_started
+        transfer_stats = (self._pool.transfer_stats() if hasattr(self._pool, 'transfer_stats')
+                          else dict())
+        return {
+            'transitions_started_total': self.transitions_started_total,
+            'transitions_completed_total': self.transitions_completed_total,
+            'transitions_failed_total': self.transitions_failed_total,
+            'cache_hits_total': self.cache_hits_total,
+            'retries_total': self.retries_total,
+            'in_flight_transitions': self.in_flight_transitions,
+            'ready_transitions': (
+                0 if self._scheduler is None else self._scheduler.ready_count()),
+            'remaining_resources': (
+                0 if self._scheduler is None else self._scheduler.remaining_resources_count()),
+            'run_seconds': run_seconds,
+            'completed_per_second': (
+                self.transitions_completed_total / run_seconds if run_seconds > 0 else 0.0),
+            'pool_bytes_sent_total': transfer_stats.get('bytes_sent', 0),
+            'pool_bytes_received_total': transfer_stats.get('bytes_received', 0),
+            'pool_input_bytes_reused_total': transfer_stats.get('input_bytes_reused', 0),
+        }
+
+    def render(self) -> str:
+        'Prometheus text exposition format'
+        snapshot = self.snapshot()
+        lines = []
+        for name, metric_type, help_text in ExecutorMetrics._EXPOSED:
+            lines += [f'# HELP {self._prefix}{name} {help_text}',
+                      f'# TYPE {self._prefix}{name} {metric_type}',
+                      f'{self._prefix}{name} {snapshot[name]}']
+        return '\n'.join(lines) + '\n'
+
+
+async def serve_metrics(metrics: ExecutorMetrics, host: str = '127.0.0.1', port: int = 0
+                        ) -> asyncio.Server:
+    '''Serve metrics.render() at GET /metrics from the running event loop.
+
+    The port is in server.sockets[0].getsockname(); close the server when the run is done.
+    '''
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', metrics.render().encode()
+            else:
+                status, body = '404 Not Found', b'Not found\n'
+            writer.write(
+                f'HTTP/1.1 {status}\r\n'
+                f'Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n'
+                f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.entities.resource_test import DummyResource
+from tiny_parallel_pipeline.entities.transition_test import (
+    DummyTransitionCalculation, RaisingTransitionCalculation)
+
+
+def sleeping_scheduler(count, sleep_period):
+    root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+    transitions = [DummyTransitionCalculation(f'T{i}', in_res=[root],
+                                              out_res=[DummyResource(f'out-{i}')],
+                                              simulate_async_sleep_period=sleep_period)
+                   for i in range(count)]
+    transitions.append(RaisingTransitionCalculation('bad', in_res=[root]))
+    scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    return scheduler
+
+
+# --- Tests ---
+
+class TestExecutorMetrics:
+    def test_counters_and_progress(self):
+        snapshots = []
+        metrics = tpp.ExecutorMetrics()
+        scheduler = sleeping_scheduler(6, 0.05)
+        assert scheduler.ready_count() == 7
+        is_ok, _ = asyncio.run(tpp.Executor(
+            scheduler, max_in_flight=2, metrics=metrics, on_progress=snapshots.append,
+            progress_interval=0.02).run())
+
+        assert not is_ok
+        final = metrics.snapshot()
+        assert final['transitions_started_total'] == 7
+        assert final['transitions_completed_total'] == 6
+        assert final['transitions_failed_total'] == 1
+        assert final['in_flight_transitions'] == 0
+        assert final['ready_transitions'] == 0
+        assert final['remaining_resources'] == 0
+        assert len(snapshots) >= 3
+        assert any(s['in_flight_transitions'] == 2 and s['ready_transitions'] > 0
+                   for s in snapshots[:-1])
+        assert snapshots[-1]['transitions_completed_total'] == 6
+
+    def test_render(self):
+        metrics = tpp.ExecutorMetrics(prefix='run_')
+        metrics.transitions_completed_total = 3
+        lines = metrics.render().splitlines()
+        assert '# TYPE run_transitions_completed_total counter' in lines
+        assert 'run_transitions_completed_total 3' in lines
+        assert 'run_ready_transitions 0' in lines
+
+    def test_serve_metrics(self):
+        async def get(port, path):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+            response = await reader.read()
+            writer.close()
+            return response.decode()
+
+        async def impl():
+            metrics = tpp.ExecutorMetrics()
+            server = await tpp.serve_metrics(metrics)
+            port = server.sockets[0].getsockname()[1]
+            try:
+                is_ok, _ = await tpp.Executor(sleeping_scheduler(2, 0.0), metrics=metrics).run()
+                assert not is_ok
+                return await get(port, '/metrics'), await get(port, '/other')
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        found, not_found = asyncio.run(impl())
+        assert found.startswith('HTTP/1.1 200 OK\r\n')
+        assert '\ntpp_transitions_completed_total 2\n' in found
+        assert not_found.startswith('HTTP/1.1 404 Not Found\r\n')
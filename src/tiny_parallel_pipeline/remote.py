@@ -0,0 +1,624 @@
+import collections
+import concurrent.futures
+from dataclasses import dataclass, field
+import hashlib
+import io
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+from typing import Hashable
+
+
+Address = tuple[str, int] | str
+
+
+class WorkerLostError(RuntimeError):
+    'A task was running on workers that were lost more often than max_requeues allows'
+
+
+class RemoteWorkerPool(concurrent.futures.Executor):
+    '''A pool of worker daemons on other hosts, usable as Executor(pool=...).
+
+    Listens on address, a (host, port) or a Unix socket path. Workers started with
+    `python -m tiny_parallel_pipeline.remote_worker ADDRESS`, or launch_local_workers(), connect
+    and register, take one pickled task at a time and send heartbeats while running it. A worker
+    that disconnects or misses heartbeats for heartbeat_timeout seconds is dropped and its task
+    requeued to another one, up to max_requeues times. initializer(*initargs) runs on each
+    worker as it registers, e.g. a TransitionRegistry.install. Tasks wait in the queue until a
+    worker is free.
+
+    Pool and worker authenticate each other with authkey before anything is unpickled, by the
+    challenge of multiprocessing.connection, so only holders of the key can submit or run tasks.
+    It defaults to this process's multiprocessing authkey, which launch_local_workers passes on;
+    daemons started by hand read it, hex encoded, from the TPP_REMOTE_AUTHKEY environment
+    variable. Over TCP, keep it secret, as the connection itself is neither encrypted nor
+    signed.
+
+    With locality, data of at least locality_min_bytes passed to submit_with_data is kept by
+    the workers, up to worker_store_bytes each, by key and content digest. A task then goes to
+    an idle worker already holding its data, which is not sent again, else to any idle worker,
+    which is sent the data it lacks. See transfer_stats() for the bytes moved.
+    '''
+    def __init__(self, address: Address = ('127.0.0.1', 0), heartbeat_timeout: float = 5.0,
+                 max_requeues: int = 2, initializer=None, initargs: tuple = (),
+                 locality: bool = True, locality_min_bytes: int = 64 * 1024,
+                 worker_store_bytes: int = 256 * 2**20, authkey: bytes | None = None):
+        self._authkey = multiprocessing.current_process().authkey if authkey is None else authkey
+        if not self._authkey:
+            raise ValueError('RemoteWorkerPool needs a non-empty authkey.')
+        self._heartbeat_timeout = heartbeat_timeout
+        self._max_requeues = max_requeues
+        self._init_message = (None if initializer is None else
+                              ('init', pickle.dumps((initializer, initargs),
+                                                    pickle.HIGHEST_PROTOCOL)))
+        self._locality = locality
+        self._locality_min_bytes = locality_min_bytes
+        self._worker_store_bytes = worker_store_bytes if locality else 0
+        self._condition = threading.Condition()
+        # Assigned or cancelled tasks are skipped lazily, _queued_count counts the others.
+        self._queue: collections.deque[_Task] = collections.deque()
+        self._queued_count = 0
+        self._key_2_queued_tasks: dict[Hashable, dict[int, _Task]] = dict()
+        self._idle_workers: collections.deque[_WorkerConnection] = collections.deque()
+        self._workers: set[_WorkerConnection] = set()
+        self._task_ids = itertools.count()
+        self._is_shutdown = False
+        self._transfer_stats = dict.fromkeys(
+            ['bytes_sent', 'bytes_received', 'input_bytes_sent', 'input_bytes_reused'], 0)
+
+        self._listener = _listen(address)
+        self._address = self._listener.getsockname()
+        threading.Thread(target=self._accept_workers, name='tpp-remote-accept',
+                         daemon=True).start()
+        threading.Thread(target=self._watch_heartbeats, name='tpp-remote-heartbeats',
+                         daemon=True).start()
+
+    @property
+    def address(self) -> Address:
+        'The bound address, with the actual port when bound to port 0'
+        return self._address
+
+    def worker_infos(self) -> list[dict]:
+        'host, pid and busy of each registered worker'
+        with self._condition:
+            return [dict(w.info, busy=w.task is not None) for w in self._workers]
+
+    def transfer_stats(self) -> dict[str, int]:
+        '''Bytes sent to and received from workers in all, and of submit_with_data data sent
+        along with tasks or reused from the worker stores instead.'''
+        with self._condition:
+            return dict(self._transfer_stats)
+
+    def wait_for_workers(self, count: int, timeout: float | None = None) -> bool:
+        with self._condition:
+            return self._condition.wait_for(lambda: len(self._workers) >= count, timeout)
+
+    def submit(self, fn, /, *args, **kwargs) -> concurrent.futures.Future:
+        return self.submit_with_data({}, fn, *args, **kwargs)
+
+    def submit_with_data(self, data: dict[Hashable, any], fn, /, *args, **kwargs
+                         ) -> concurrent.futures.Future:
+        '''Like submit, for args holding the data values, e.g. Resource.data by ResourceID.
+
+        Large values are pickled as references to their key and digest, see data_digest, and
+        sent only to workers not holding them yet; a key given new data is sent again. The
+        future's add_started_callback(fn) calls fn() once a worker gets the task.
+        '''
+        key_2_data, data_sizes = dict(), dict()
+        if self._locality:
+            for key, value in data.items():
+                if value is not None and (size := data_size(value)) >= self._locality_min_bytes:
+                    versioned_key = (key, data_digest(value))
+                    key_2_data[versioned_key] = value
+                    data_sizes[versioned_key] = size
+        payload = _dumps_with_references((fn, args, kwargs), key_2_data)
+        with self._condition:
+            if self._is_shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            task = _Task(next(self._task_ids), payload, key_2_data, data_sizes)
+            self._enqueue_locked(task)
+            assignments = self._assign_locked()
+        self._send_assignments(assignments)
+        return task.future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        'Queued tasks still run with wait, unless cancel_futures; the rest are cancelled'
+        with self._condition:
+            self._is_shutdown = True
+            if cancel_futures:
+                self._cancel_queued_locked()
+            if wait:
+                self._condition.wait_for(lambda: not self._workers or (
+                    self._queued_count == 0 and all(w.task is None for w in self._workers)))
+            self._cancel_queued_locked()
+            workers = list(self._workers)
+        for worker in workers:
+            worker.send(('shutdown',))
+            worker.close()
+        self._listener.close()
+        if isinstance(self._address, str):
+            try:
+                os.unlink(self._address)
+            except OSError:
+                pass
+
+    def _enqueue_locked(self, task: '_Task', first: bool = False) -> None:
+        task.is_queued = True
+        self._queued_count += 1
+        if first:
+            self._queue.appendleft(task)
+        else:
+            self._queue.append(task)
+        for key in task.data:
+            self._key_2_queued_tasks.setdefault(key, dict())[task.task_id] = task
+
+    def _dequeue_locked(self, task: '_Task') -> None:
+        task.is_queued = False
+        self._queued_count -= 1
+        for key in task.data:
+            key_tasks = self._key_2_queued_tasks[key]
+            del key_tasks[task.task_id]
+            if not key_tasks:
+                del self._key_2_queued_tasks[key]
+
+    def _cancel_queued_locked(self) -> None:
+        for task in self._queue:
+            if not task.is_queued:
+                continue
+            self._dequeue_locked(task)
+            if not task.future.cancel():
+                task.future.set_exception(RuntimeError('RemoteWorkerPool was shut down.'))
+        self._queue.clear()
+
+    def _assign_locked(self) -> list[tuple['_WorkerConnection', '_Task']]:
+        '''Pair queued tasks with idle workers, first the ones holding a task's data, then the
+        others in queue order; sending is left to after the lock is released.'''
+        assignments = []
+        if self._key_2_queued_tasks:
+            for worker in list(self._idle_workers):
+                task = self._pop_local_task_locked(worker)
+                if task is not None:
+                    self._idle_workers.remove(worker)
+                    worker.task = task
+                    assignments.append((worker, task))
+        while self._queued_count > 0 and self._idle_workers:
+            task = self._queue.popleft()
+            if not task.is_queued:
+                continue
+            self._dequeue_locked(task)
+            if task.requeue_count == 0 and not task.future.set_running_or_notify_cancel():
+                continue
+            worker = self._idle_workers.popleft()
+            worker.task = task
+            assignments.append((worker, task))
+        return assignments
+
+    def _pop_local_task_locked(self, worker: '_WorkerConnection') -> '_Task | None':
+        for key in worker.held:
+            for task in list(self._key_2_queued_tasks.get(key, dict()).values()):
+                self._dequeue_locked(task)
+                if task.requeue_count > 0 or task.future.set_running_or_notify_cancel():
+                    return task
+        return None
+
+    def _send_assignments(self, assignments: list[tuple['_WorkerConnection', '_Task']]) -> None:
+        for worker, task in assignments:
+            missing_data = {key: value for key, value in task.data.items()
+                            if key not in worker.held}
+            size = worker.send(('task', task.task_id, task.payload, missing_data))
+            if size is None:
+                self._on_worker_lost(worker)
+                continue
+            with self._condition:
+                stats = self._transfer_stats
+                stats['bytes_sent'] += size
+                for key, input_size in task.data_sizes.items():
+                    stats['input_bytes_sent' if key in missing_data else
+                          'input_bytes_reused'] += input_size
+
+    def _accept_workers(self) -> None:
+        while True:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                # Closed by shutdown.
+                return
+            threading.Thread(target=self._serve_worker, args=(_WorkerConnection(sock),),
+                             name='tpp-remote-worker', daemon=True).start()
+
+    def _serve_worker(self, worker: '_WorkerConnection') -> None:
+        if not worker.authenticate(self._authkey, self._heartbeat_timeout):
+            worker.close()
+            return
+        try:
+            message, _ = worker.receive()
+        except Exception:
+            message = None
+        if message is None or message[0] != 'register':
+            worker.close()
+            return
+        worker.info = message[1]
+        if (worker.send(('configure', self._worker_store_bytes, self._locality_min_bytes))
+                is None or
+                self._init_message is not None and worker.send(self._init_message) is None):
+            worker.close()
+            return
+        with self._condition:
+            if self._is_shutdown:
+                worker.send(('shutdown',))
+                worker.close()
+                return
+            self._workers.add(worker)
+            self._idle_workers.append(worker)
+            assignments = self._assign_locked()
+            self._condition.notify_all()
+        self._send_assignments(assignments)
+
+        error = None
+        while True:
+            try:
+                message, size = worker.receive()
+            except Exception as e:
+                # Most likely the result of its task, which fails instead of going round the
+                # workers.
+                error = e
+                break
+            if message is None:
+                break
+            worker.last_seen = time.monotonic()
+            if message[0] != 'result':
+                continue
+            _, task_id, is_ok, value, stored, evicted = message
+            with self._condition:
+                self._transfer_stats['bytes_received'] += size
+                task = worker.task
+                if task is None or task.task_id != task_id:
+                    continue
+                worker.held.update(stored)
+                for key in evicted:
+                    worker.held.pop(key, None)
+                worker.task = None
+                self._idle_workers.append(worker)
+                assignments = self._assign_locked()
+                self._condition.notify_all()
+            self._send_assignments(assignments)
+            if is_ok:
+                task.future.set_result(value)
+            else:
+                task.future.set_exception(value)
+        self._on_worker_lost(worker, error)
+
+    def _on_worker_lost(self, worker: '_WorkerConnection', error: Exception | None = None
+                        ) -> None:
+        'Requeue the task of the worker, or fail it with error if given'
+        worker.close()
+        failed_task = None
+        with self._condition:
+            if worker not in self._workers:
+                return
+            self._workers.discard(worker)
+            if worker in self._idle_workers:
+                self._idle_workers.remove(worker)
+            task, worker.task = worker.task, None
+            if task is not None:
+                if error is not None or task.requeue_count >= self._max_requeues:
+                    failed_task = task
+                else:
+                    task.requeue_count += 1
+                    self._enqueue_locked(task, first=True)
+            assignments = self._assign_locked()
+            self._condition.notify_all()
+        self._send_assignments(assignments)
+        if failed_task is not None:
+            failed_task.future.set_exception(error or WorkerLostError(
+                f'Worker {worker.info} lost, the task was already requeued '
+                f'{failed_task.requeue_count} times.'))
+
+    def _watch_heartbeats(self) -> None:
+        while True:
+            time.sleep(self._heartbeat_timeout / 4)
+            with self._condition:
+                if self._is_shutdown and not self._workers:
+                    return
+                deadline = time.monotonic() - self._heartbeat_timeout
+                stale_workers = [w for w in self._workers if w.last_seen < deadline]
+            for worker in stale_workers:
+                # Its reader then sees the connection end and drops it.
+                worker.close()
+
+
+@dataclass(eq=False)
+class _Task:
+    task_id: int
+    # Pickled once at submission, requeues resend the same bytes.
+    payload: bytes
+    # Referenced from the payload by key, see _dumps_with_references.
+    data: dict[Hashable, any]
+    data_sizes: dict[Hashable, int]
+    requeue_count: int = 0
+    is_queued: bool = False
+    future: '_TaskFuture' = field(default_factory=lambda: _TaskFuture())
+
+
+class _TaskFuture(concurrent.futures.Future):
+    def __init__(self):
+        super().__init__()
+        self._started_callbacks = []
+
+    def add_started_callback(self, fn) -> None:
+        'Call fn() once a worker gets the task, right away if one has or the future is done'
+        with self._condition:
+            if not self.running() and not self.done():
+                self._started_callbacks.append(fn)
+                return
+        fn()
+
+    def set_running_or_notify_cancel(self) -> bool:
+        is_running = super().set_running_or_notify_cancel()
+        if is_running:
+            for fn in self._started_callbacks:
+                fn()
+        return is_running
+
+
+class _WorkerConnection:
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._send_lock = threading.Lock()
+        self.info: dict = dict()
+        self.last_seen = time.monotonic()
+        self.task: _Task | None = None
+        # Size of each data key in the worker store, as reported with results.
+        self.held: dict[Hashable, int] = dict()
+
+    def send(self, message: tuple) -> int | None:
+        'Bytes sent, None if the connection is gone'
+        try:
+            with self._send_lock:
+                return _send_message(self._sock, message)
+        except OSError:
+            return None
+
+    def authenticate(self, authkey: bytes, timeout: float) -> bool:
+        'Challenge the worker, then answer its challenge, within timeout seconds for each read'
+        channel = _BytesChannel(self._sock)
+        self._sock.settimeout(timeout)
+        try:
+            multiprocessing.connection.deliver_challenge(channel, authkey)
+            multiprocessing.connection.answer_challenge(channel, authkey)
+        except (OSError, EOFError, multiprocessing.AuthenticationError):
+            return False
+        self._sock.settimeout(None)
+        return True
+
+    def receive(self) -> tuple[tuple | None, int]:
+        'None once the connection is gone, raises what unpickling the message raised'
+        try:
+            return _receive_message(self._sock)
+        except (OSError, EOFError):
+            return None, 0
+
+    def close(self) -> None:
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+def data_digest(data: any) -> bytes:
+    'Digest of a Resource.data, of its buffer for bytes-like and numpy data, else of its pickle'
+    try:
+        view = memoryview(data)
+    except TypeError:
+        view = None
+    h = hashlib.blake2b(type(data).__qualname__.encode(), digest_size=16)
+    if view is not None and view.c_contiguous:
+        h.update(f'{view.format}{view.shape}'.encode())
+        h.update(view.cast('B') if view.ndim > 0 else view.tobytes())
+    else:
+        h.update(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+    return h.digest()
+
+
+def data_size(data: any) -> int:
+    'Approximate size of a Resource.data: the buffer size of bytes-like and numpy data'
+    nbytes = getattr(data, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(data, (bytes, bytearray, str)):
+        return len(data)
+    return sys.getsizeof(data)
+
+
+class WorkerDataStore:
+    '''Data kept by a remote worker for later tasks, least recently used dropped first.
+
+    Holds the task data sent by the pool and whatever tasks put, e.g. their out resources'
+    data. Evictions happen between tasks, and the changes are reported to the pool with each
+    result so it knows what this worker holds.
+    '''
+    def __init__(self, capacity_bytes: int, min_bytes: int):
+        self._capacity_bytes = capacity_bytes
+        self._min_bytes = min_bytes
+        self._key_2_data: collections.OrderedDict[Hashable, tuple[any, int]] = (
+            collections.OrderedDict())
+        self._size = 0
+        self._added: dict[Hashable, int] = dict()
+        self._evicted: set[Hashable] = set()
+
+    def get(self, key: Hashable) -> any:
+        self._key_2_data.move_to_end(key)
+        return self._key_2_data[key][0]
+
+    def put(self, key: Hashable, data: any) -> None:
+        'Data under min_bytes is cheap to send along and not kept'
+        size = data_size(data)
+        if size < self._min_bytes or size > self._capacity_bytes:
+            return
+        self._put(key, data, size)
+
+    def put_output(self, key: Hashable, data: any) -> None:
+        'Keep data a task made under key and its digest, the key the pool refers to it by'
+        size = data_size(data)
+        if self._min_bytes <= size <= self._capacity_bytes:
+            self._put((key, data_digest(data)), data, size)
+
+    def _put(self, key: Hashable, data: any, size: int) -> None:
+        old = self._key_2_data.pop(key, None)
+        if old is not None:
+            self._size -= old[1]
+        self._key_2_data[key] = (data, size)
+        self._size += size
+        self._added[key] = size
+        self._evicted.discard(key)
+
+    def install(self) -> None:
+        global _worker_data_store
+        _worker_data_store = self
+
+    def take_changes(self) -> tuple[dict[Hashable, int], list[Hashable]]:
+        'Evict down to capacity; the keys added with their sizes, and the evicted keys'
+        while self._size > self._capacity_bytes:
+            key, (_, size) = self._key_2_data.popitem(last=False)
+            self._size -= size
+            if self._added.pop(key, None) is None:
+                self._evicted.add(key)
+        changes = self._added, list(self._evicted)
+        self._added, self._evicted = dict(), set()
+        return changes
+
+
+_worker_data_store: WorkerDataStore | None = None
+
+
+def worker_data_store() -> WorkerDataStore | None:
+    'The store of this remote worker process, None elsewhere or without locality'
+    return _worker_data_store
+
+
+class _ReferencePickler(pickle.Pickler):
+    def __init__(self, file, id_2_key: dict[int, Hashable]):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._id_2_key = id_2_key
+
+    def persistent_id(self, obj):
+        return self._id_2_key.get(id(obj))
+
+
+def _dumps_with_references(obj: any, key_2_data: dict[Hashable, any]) -> bytes:
+    'Pickle obj with each value of key_2_data inside it replaced by its key'
+    if not key_2_data:
+        return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    f = io.BytesIO()
+    _ReferencePickler(f, {id(data): key for key, data in key_2_data.items()}).dump(obj)
+    return f.getvalue()
+
+
+_HEADER = struct.Struct('!Q')
+
+
+def _send_message(sock: socket.socket, message: tuple) -> int:
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_HEADER.pack(len(data)) + data)
+    return _HEADER.size + len(data)
+
+
+def _receive_message(sock: socket.socket) -> tuple[tuple | None, int]:
+    'The message and its size in bytes, None once the peer closed the connection'
+    header = _receive_exactly(sock, _HEADER.size)
+    if header is None:
+        return None, 0
+    size = _HEADER.unpack(header)[0]
+    data = _receive_exactly(sock, size)
+    if data is None:
+        raise EOFError('Connection closed inside a message.')
+    return pickle.loads(data), _HEADER.size + size
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> bytearray | None:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:])
+        if n == 0:
+            return None
+        received += n
+    return buffer
+
+
+class _BytesChannel:
+    'The send_bytes and recv_bytes the challenges of multiprocessing.connection need'
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+
+    def send_bytes(self, data: bytes) -> None:
+        self._sock.sendall(_HEADER.pack(len(data)) + data)
+
+    def recv_bytes(self, maxlength: int | None = None) -> bytes:
+        header = _receive_exactly(self._sock, _HEADER.size)
+        if header is None:
+            raise EOFError('Connection closed during authentication.')
+        size = _HEADER.unpack(header)[0]
+        if maxlength is not None and size > maxlength:
+            raise OSError(f'Authentication message of {size} bytes, at most {maxlength} expected.')
+        data = _receive_exactly(self._sock, size)
+        if data is None:
+            raise EOFError('Connection closed during authentication.')
+        return bytes(data)
+
+
+def _listen(address: Address) -> socket.socket:
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(address)
+    sock.listen()
+    return sock
+
+
+def _connect(address: Address) -> socket.socket:
+    if isinstance(address, str):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+    else:
+        sock = socket.create_connection(address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def format_address(address: Address) -> str:
+    return address if isinstance(address, str) else f'{address[0]}:{address[1]}'
+
+
+def parse_address(address: str) -> Address:
+    'host:port, else a Unix socket path'
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and '/' not in address:
+        return host, int(port)
+    return address
+
+
+def launch_local_workers(address: Address, count: int, heartbeat_interval: float = 1.0,
+                         authkey: bytes | None = None) -> list[subprocess.Popen]:
+    '''Start count worker daemons on this host, with this interpreter and import path, and
+    authkey, by default this process's multiprocessing authkey as for RemoteWorkerPool'''
+    if authkey is None:
+        authkey = multiprocessing.current_process().authkey
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(os.path.abspath(p) for p in sys.path),
+               TPP_REMOTE_AUTHKEY=authkey.hex())
+    return [subprocess.Popen([sys.executable, '-m', 'tiny_parallel_pipeline.remote_worker',
+                              format_address(address), '--heartbeat-interval',
+                              str(heartbeat_interval)], env=env)
+            for _ in range(count)]
@@ -0,0 +1,289 @@
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import pytest
+import signal
+import time
+from typing import override
+
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.entities.resource_test import DummyResource
+from tiny_parallel_pipeline.entities.transition_test import DummyTransitionCalculation
+from tiny_parallel_pipeline.remote_worker import run_worker
+
+
+def sleep_and_get_pid(sleep_period: float) -> int:
+    time.sleep(sleep_period)
+    return os.getpid()
+
+
+def raise_value_error() -> None:
+    raise ValueError('raised in the worker')
+
+
+def sleep_and_get_data_pid(data: bytes, sleep_period: float) -> tuple[int, int]:
+    time.sleep(sleep_period)
+    return len(data), os.getpid()
+
+
+def wait_released_and_get_data_pid(data: bytes, release_path: str) -> tuple[int, int]:
+    'Blocks until the test creates release_path'
+    while not os.path.exists(release_path):
+        time.sleep(0.01)
+    return len(data), os.getpid()
+
+
+def raise_on_load() -> None:
+    raise ValueError('raised unpickling the result')
+
+
+class UnloadableResult:
+    'Pickles in the worker, raises when unpickled back in the pool'
+    def __reduce__(self):
+        return raise_on_load, ()
+
+
+def get_unloadable_result() -> UnloadableResult:
+    return UnloadableResult()
+
+
+def first_byte(data: bytes) -> bytes:
+    return data[:1]
+
+
+class PassThroughTransition(DummyTransitionCalculation):
+    @override
+    async def _execute_impl(self, in_resources, out_resources):
+        out_resources[0].populate_data(in_resources[0].data)
+        return True, None
+
+
+@contextlib.contextmanager
+def local_pool(address=('127.0.0.1', 0), worker_count=3, **pool_kwargs):
+    pool = tpp.RemoteWorkerPool(address, heartbeat_timeout=0.5, max_requeues=1, **pool_kwargs)
+    workers = tpp.launch_local_workers(pool.address, worker_count, heartbeat_interval=0.05)
+    try:
+        assert pool.wait_for_workers(worker_count, timeout=10.0)
+        yield pool, workers
+    finally:
+        pool.shutdown(cancel_futures=True)
+        for p in workers:
+            try:
+                p.kill()
+            except OSError:
+                pass
+            p.wait()
+
+
+@pytest.fixture
+def remote_pool(request, tmp_path):
+    'A RemoteWorkerPool with 3 local workers, over TCP or a Unix socket per the param'
+    address = (str(tmp_path / 'pool.sock') if getattr(request, 'param', 'tcp') == 'unix' else
+               ('127.0.0.1', 0))
+    with local_pool(address) as pool_and_workers:
+        yield pool_and_workers
+
+
+def wait_busy_worker_pid(pool: tpp.RemoteWorkerPool) -> int:
+    for _ in range(200):
+        busy = [info['pid'] for info in pool.worker_infos() if info['busy']]
+        if busy:
+            return busy[0]
+        time.sleep(0.01)
+    raise AssertionError('No worker took the task.')
+
+
+# --- Tests ---
+
+class TestRemoteWorkerPool:
+    @pytest.mark.parametrize('remote_pool', ['tcp', 'unix'], indirect=True)
+    def test_executor_runs_on_workers(self, remote_pool):
+        pool, workers = remote_pool
+        root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        transitions = [DummyTransitionCalculation(f'T{i}', in_res=[root],
+                                                  out_res=[DummyResource(f'out-{i}')],
+                                                  simulate_async_sleep_period=0.05,
+                                                  data_add_pid=True, allow_multiprocess_pool=True)
+                       for i in range(9)]
+        scheduler = (tpp.Scheduler().add_transitions(*transitions)
+                     .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+
+        assert is_ok, err_msg
+        pids = {t._out_resources[0].data[1] for t in transitions}
+        assert len(pids) > 1
+        assert pids <= {p.pid for p in workers}
+
+    def test_executor_timeout_excludes_queueing(self, monkeypatch):
+        monkeypatch.setattr('tiny_parallel_pipeline.execute._POOL_TIMEOUT_GRACE_SECONDS', 0.1)
+        root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+        transitions = [DummyTransitionCalculation(f'T{i}', in_res=[root],
+                                                  out_res=[DummyResource(f'out-{i}')],
+                                                  simulate_async_sleep_period=0.2,
+                                                  allow_multiprocess_pool=True).set_timeout(0.3)
+                       for i in range(4)]
+        scheduler = (tpp.Scheduler().add_transitions(*transitions)
+                     .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+
+        with local_pool(worker_count=1) as (pool, _):
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+
+        assert is_ok, err_msg
+
+    def test_exception(self, remote_pool):
+        pool, _ = remote_pool
+        with pytest.raises(ValueError, match='raised in the worker'):
+            pool.submit(raise_value_error).result(timeout=5.0)
+
+    def test_unloadable_result(self, remote_pool):
+        pool, _ = remote_pool
+        with pytest.raises(ValueError, match='raised unpickling the result'):
+            pool.submit(get_unloadable_result).result(timeout=5.0)
+
+        # Its worker is dropped, the others keep serving.
+        assert pool.submit(sleep_and_get_pid, 0.0).result(timeout=5.0)
+        assert len(pool.worker_infos()) == 2
+
+    def test_worker_with_wrong_authkey(self, remote_pool):
+        pool, _ = remote_pool
+        with pytest.raises(multiprocessing.AuthenticationError):
+            run_worker(pool.address, authkey=b'wrong')
+        assert len(pool.worker_infos()) == 3
+
+    def test_empty_authkey(self):
+        with pytest.raises(ValueError, match='RemoteWorkerPool needs a non-empty authkey.'):
+            tpp.RemoteWorkerPool(authkey=b'')
+
+    def test_requeue_on_worker_exit(self, remote_pool):
+        pool, _ = remote_pool
+        future = pool.submit(sleep_and_get_pid, 0.5)
+        killed_pid = wait_busy_worker_pid(pool)
+        os.kill(killed_pid, signal.SIGKILL)
+
+        pid = future.result(timeout=5.0)
+
+        assert pid != killed_pid
+        assert killed_pid not in [info['pid'] for info in pool.worker_infos()]
+
+    def test_requeue_on_missed_heartbeats(self, remote_pool):
+        pool, _ = remote_pool
+        future = pool.submit(sleep_and_get_pid, 0.5)
+        stopped_pid = wait_busy_worker_pid(pool)
+        os.kill(stopped_pid, signal.SIGSTOP)
+
+        pid = future.result(timeout=5.0)
+
+        assert pid != stopped_pid
+        assert len(pool.worker_infos()) == 2
+
+    def test_worker_lost_too_often(self, remote_pool):
+        pool, _ = remote_pool
+        future = pool.submit(sleep_and_get_pid, 1.0)
+        for _ in range(2):
+            os.kill(wait_busy_worker_pid(pool), signal.SIGKILL)
+            time.sleep(0.05)
+
+        with pytest.raises(tpp.WorkerLostError):
+            future.result(timeout=5.0)
+
+    def test_shutdown_stops_workers(self, remote_pool):
+        pool, workers = remote_pool
+        assert pool.submit(sleep_and_get_pid, 0.0).result(timeout=5.0) in {p.pid for p in workers}
+
+        pool.shutdown()
+
+        assert [p.wait(timeout=5.0) for p in workers] == [0, 0, 0]
+        with pytest.raises(RuntimeError):
+            pool.submit(sleep_and_get_pid, 0.0)
+
+    def test_locality_prefers_holding_worker(self, remote_pool, tmp_path):
+        pool, _ = remote_pool
+        data = b'x' * 2**20
+        _, first_pid = pool.submit_with_data({'d': data}, sleep_and_get_data_pid, data, 0.0
+                                             ).result(timeout=5.0)
+        assert pool.transfer_stats()['input_bytes_sent'] == 2**20
+
+        for _ in range(3):
+            _, pid = pool.submit_with_data({'d': data}, sleep_and_get_data_pid, data, 0.0
+                                           ).result(timeout=5.0)
+            assert pid == first_pid
+        stats = pool.transfer_stats()
+        assert stats['input_bytes_sent'] == 2**20
+        assert stats['input_bytes_reused'] == 3 * 2**20
+        assert stats['bytes_sent'] < 1.1 * 2**20
+
+        # Busy holder, an idle worker steals the task and gets the data.
+        release_path = str(tmp_path / 'release')
+        busy = pool.submit_with_data({'d': data}, wait_released_and_get_data_pid, data,
+                                     release_path)
+        size, pid = pool.submit_with_data({'d': data}, sleep_and_get_data_pid, data, 0.0
+                                          ).result(timeout=5.0)
+        assert not busy.done()
+        open(release_path, 'w').close()
+        assert (size, busy.result(timeout=5.0)[1]) == (2**20, first_pid)
+        assert pid != first_pid
+        assert pool.transfer_stats()['input_bytes_sent'] == 2 * 2**20
+
+    def test_locality_new_data_under_same_key(self):
+        with local_pool(worker_count=1) as (pool, _):
+            for data in [b'A' * 2**20, b'B' * 2**20, b'A' * 2**20]:
+                assert pool.submit_with_data({'d': data}, first_byte, data
+                                             ).result(timeout=5.0) == data[:1]
+            stats = pool.transfer_stats()
+        assert (stats['input_bytes_sent'], stats['input_bytes_reused']) == (2 * 2**20, 2**20)
+
+    def test_executor_runs_reusing_resource_names(self):
+        def run_chain(pool, data):
+            resources = [DummyResource(f'r{i}') for i in range(3)]
+            resources[0].populate_data(data).update_status(tpp.ResourceStatus.READY)
+            scheduler = tpp.Scheduler().add_transitions(*[
+                PassThroughTransition(f'T{i}', in_res=[resources[i]], out_res=[resources[i + 1]],
+                                      allow_multiprocess_pool=True)
+                for i in range(2)]).pull_all_resources_from_transitions()
+            is_ok, err_msg = scheduler.compile()
+            assert is_ok, err_msg
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool).run())
+            assert is_ok, err_msg
+            return resources[-1].data
+
+        with local_pool(worker_count=1) as (pool, _):
+            assert run_chain(pool, b'A' * 2**20)[:1] == b'A'
+            assert run_chain(pool, b'B' * 2**20)[:1] == b'B'
+
+    @pytest.mark.parametrize('locality', [True, False])
+    def test_executor_chain_bytes_moved(self, locality):
+        data_bytes, chain_length = 2**20, 4
+        resources = [DummyResource(f'r{i}') for i in range(chain_length + 1)]
+        resources[0].populate_data(b'x' * data_bytes).update_status(tpp.ResourceStatus.READY)
+        transitions = [PassThroughTransition(f'T{i}', in_res=[resources[i]],
+                                             out_res=[resources[i + 1]],
+                                             allow_multiprocess_pool=True)
+                       for i in range(chain_length)]
+        scheduler = (tpp.Scheduler().add_transitions(*transitions)
+                     .pull_all_resources_from_transitions())
+        is_ok, err_msg = scheduler.compile()
+        assert is_ok, err_msg
+        metrics = tpp.ExecutorMetrics()
+
+        with local_pool(locality=locality) as (pool, _):
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, pool, metrics=metrics).run())
+
+        assert is_ok, err_msg
+        assert len(resources[-1].data) == data_bytes
+        snapshot = metrics.snapshot()
+        # Outputs always come back, inputs go out once with locality.
+        assert snapshot['pool_bytes_received_total'] > chain_length * data_bytes
+        if locality:
+            assert snapshot['pool_bytes_sent_total'] < 1.1 * data_bytes
+            assert snapshot['pool_input_bytes_reused_total'] == (chain_length - 1) * data_bytes
+        else:
+            assert snapshot['pool_bytes_sent_total'] > chain_length * data_bytes
+            assert snapshot['pool_input_bytes_reused_total'] == 0
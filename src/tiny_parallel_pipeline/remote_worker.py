@@ -0,0 +1,113 @@
+import argparse
+import io
+import multiprocessing.connection
+import os
+import pickle
+import socket
+import threading
+import traceback
+from typing import Hashable
+
+
+from tiny_parallel_pipeline.remote import (
+    Address, WorkerDataStore, _BytesChannel, _connect, _receive_message, _send_message,
+    parse_address, worker_data_store)
+
+
+class _ReferenceUnpickler(pickle.Unpickler):
+    def __init__(self, file, key_2_data: dict[Hashable, any], store: WorkerDataStore | None):
+        super().__init__(file)
+        self._key_2_data = key_2_data
+        self._store = store
+
+    def persistent_load(self, key):
+        # Sent along with the task, which the store may have declined as too large.
+        if key in self._key_2_data:
+            return self._key_2_data[key]
+        return self._store.get(key)
+
+
+def run_worker(address: Address, heartbeat_interval: float = 1.0, authkey: bytes | None = None
+               ) -> None:
+    '''Serve tasks of the RemoteWorkerPool at address until it shuts down or goes away.
+
+    Tasks run one at a time in the main thread, so transition timeouts work as in a local pool
+    worker; a background thread keeps sending heartbeats meanwhile. authkey, by default this
+    process's multiprocessing authkey, must be the pool's; else AuthenticationError is raised.
+    '''
+    if authkey is None:
+        authkey = multiprocessing.current_process().authkey
+    sock = _connect(address)
+    channel = _BytesChannel(sock)
+    try:
+        multiprocessing.connection.answer_challenge(channel, authkey)
+        multiprocessing.connection.deliver_challenge(channel, authkey)
+    except BaseException:
+        sock.close()
+        raise
+    send_lock = threading.Lock()
+    def send(message: tuple) -> None:
+        with send_lock:
+            _send_message(sock, message)
+
+    send(('register', {'host': socket.gethostname(), 'pid': os.getpid()}))
+    stopped = threading.Event()
+    def send_heartbeats() -> None:
+        while not stopped.wait(heartbeat_interval):
+            try:
+                send(('heartbeat',))
+            except OSError:
+                return
+    threading.Thread(target=send_heartbeats, name='tpp-remote-heartbeat', daemon=True).start()
+
+    try:
+        while (message := _receive_message(sock)[0]) is not None:
+            if message[0] == 'shutdown':
+                break
+            if message[0] == 'configure':
+                _, capacity_bytes, min_bytes = message
+                if capacity_bytes > 0:
+                    WorkerDataStore(capacity_bytes, min_bytes).install()
+                continue
+            if message[0] == 'init':
+                initializer, initargs = pickle.loads(message[1])
+                initializer(*initargs)
+                continue
+            _, task_id, payload, key_2_data = message
+            store = worker_data_store()
+            try:
+                if store is not None:
+                    for key, data in key_2_data.items():
+                        store.put(key, data)
+                fn, args, kwargs = _ReferenceUnpickler(
+                    io.BytesIO(payload), key_2_data, store).load()
+                result = (True, fn(*args, **kwargs))
+            except Exception as e:
+                result = (False, e)
+            stored, evicted = store.take_changes() if store is not None else (dict(), [])
+            try:
+                send(('result', task_id, *result, stored, evicted))
+            except (pickle.PicklingError, TypeError, AttributeError):
+                send(('result', task_id, False, RuntimeError(traceback.format_exc()),
+                      stored, evicted))
+    except (OSError, EOFError):
+        pass
+    finally:
+        stopped.set()
+        sock.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description='Worker daemon of a RemoteWorkerPool')
+    ap.add_argument('address', help='host:port or Unix socket path of the pool')
+    ap.add_argument('--heartbeat-interval', type=float, default=1.0)
+    args = ap.parse_args()
+    # Not an argument, which other users of the host could read.
+    authkey = os.environ.get('TPP_REMOTE_AUTHKEY')
+    if not authkey:
+        ap.error('the TPP_REMOTE_AUTHKEY environment variable must hold the pool authkey in hex')
+    run_worker(parse_address(args.address), args.heartbeat_interval, bytes.fromhex(authkey))
+
+
+if __name__ == '__main__':
+    main()
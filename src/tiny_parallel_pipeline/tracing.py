@@ -0,0 +1,204 @@
+from dataclasses import dataclass, field
+import json
+import os
+import time
+
+
+from tiny_parallel_pipeline import ResourceID, TransitionCalculation
+
+
+@dataclass
+class TransitionTrace:
+    'Wall clock times, time.time(), of one transition in an Executor run'
+    name: str
+    in_resource_ids: list[ResourceID]
+    out_resource_ids: list[ResourceID]
+    # All inputs were READY, or the run started.
+    ready: float
+    # Taken from the scheduler; cache hits are applied right away and never start.
+    dispatched: float
+    # Of the first attempt, and the end of the last one.
+    started: float | None = None
+    finished: float | None = None
+    applied: float | None = None
+    attempt_count: int = 0
+    is_ok: bool | None = None
+    cached: bool = False
+    # Where it executed, 'event loop', 'thread pool' or 'pid N'.
+    worker: str | None = None
+    # Pickled pool task arguments and result, summed over attempts.
+    request_bytes: int = 0
+    response_bytes: int = 0
+
+
+@dataclass
+class _WorkerSummary:
+    busy_seconds: float = 0.0
+    idle_gap_count: int = 0
+    longest_idle_gap_seconds: float = 0.0
+    intervals: list[tuple[float, float]] = field(default_factory=list)
+
+
+class Tracer:
+    '''Records the life of each transition of an Executor run, see TransitionTrace.
+
+    Pass it to Executor(tracer=...); without one the Executor skips all of this. Pool payload
+    sizes are measured by pickling once more, so tracing costs extra on pool transitions.
+    Export with save_chrome_trace() for chrome://tracing or https://ui.perfetto.dev.
+    '''
+    def __init__(self, idle_gap_threshold: float = 0.01):
+        'Worker idle time between executions counts as a gap from idle_gap_threshold seconds'
+        self._idle_gap_threshold = idle_gap_threshold
+        self._run_started: float | None = None
+        self._run_finished: float | None = None
+        self._transition_2_trace: dict[TransitionCalculation, TransitionTrace] = dict()
+        self._resource_id_2_applied: dict[ResourceID, float] = dict()
+
+    @property
+    def traces(self) -> list[TransitionTrace]:
+        return list(self._transition_2_trace.values())
+
+    def on_run_started(self) -> None:
+        self._run_started = time.time()
+
+    def on_run_finished(self) -> None:
+        self._run_finished = time.time()
+
+    def on_dispatched(self, transition: TransitionCalculation) -> None:
+        now = time.time()
+        ready = max([self._resource_id_2_applied.get(r.id, self._run_started)
+                     for r in transition._in_resources], default=self._run_started)
+        self._transition_2_trace[transition] = TransitionTrace(
+            transition.name, [r.id for r in transition._in_resources],
+            [r.id for r in transition._out_resources], min(ready, now), now)
+
+    def on_request_pickled(self, transition: TransitionCalculation, size: int) -> None:
+        self._transition_2_trace[transition].request_bytes += size
+
+    def on_executed(self, transition: TransitionCalculation, worker: str, started: float,
+                    finished: float, response_bytes: int = 0) -> None:
+        'One attempt, in a pool worker or on the event loop'
+        trace = self._transition_2_trace[transition]
+        if trace.started is None:
+            trace.started = started
+        trace.finished = finished
+        trace.attempt_count += 1
+        trace.worker = worker
+        trace.response_bytes += response_bytes
+
+    def on_applied(self, transition: TransitionCalculation, is_ok: bool,
+                   cached: bool = False) -> None:
+        now = time.time()
+        trace = self._transition_2_trace[transition]
+        trace.applied = now
+        trace.is_ok = is_ok
+        trace.cached = cached
+        if is_ok:
+            for rid in trace.out_resource_ids:
+                self._resource_id_2_applied[rid] = now
+
+    def chrome_trace(self) -> dict:
+        'Trace Event Format: a lane per worker, queued and result handling as async spans'
+        main_pid = os.getpid()
+        origin = self._run_started or 0.0
+        def us(t: float) -> float:
+            return (t - origin) * 1e6
+
+        worker_2_pid = {'event loop': main_pid}
+        events = [{'ph': 'M', 'name': 'process_name', 'pid': main_pid,
+                   'args': {'name': 'Executor'}}]
+        for i, trace in enumerate(self._transition_2_trace.values()):
+            args = {'attempts': trace.attempt_count, 'ok': trace.is_ok,
+                    'request_bytes': trace.request_bytes, 'response_bytes': trace.response_bytes}
+            spans = [('queued', trace.ready, trace.dispatched),
+                     ('applying', trace.finished, trace.applied)]
+            if trace.cached:
+                spans.append(('cached', trace.dispatched, trace.applied))
+            elif trace.worker in ('event loop', 'thread pool'):
+                # Coroutines on the loop and pool threads overlap, so they are async spans too.
+                spans.append(('executing', trace.started, trace.finished))
+            elif trace.worker is not None and trace.started is not None:
+                pid = worker_2_pid.get(trace.worker)
+                if pid is None:
+                    pid = worker_2_pid[trace.worker] = int(trace.worker.split()[-1])
+                    events.append({'ph': 'M', 'name': 'process_name', 'pid': pid,
+                                   'args': {'name': trace.worker}})
+                events.append({'ph': 'X', 'name': trace.name, 'cat': 'executing', 'pid': pid,
+                               'tid': pid, 'ts': us(trace.started),
+                               'dur': us(trace.finished) - us(trace.started), 'args': args})
+            for cat, begin, end in spans:
+                if begin is None or end is None:
+                    continue
+                for ph, ts in (('b', begin), ('e', end)):
+                    events.append({'ph': ph, 'name': trace.name, 'cat': cat, 'id': i,
+                                   'pid': main_pid, 'tid': main_pid, 'ts': us(ts), 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def save_chrome_trace(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self) -> dict:
+        '''Wall time, time spent queued, the critical path of the run, and per worker busy time,
+        utilization and idle gaps.'''
+        run_started = self._run_started or 0.0
+        run_finished = self._run_finished or time.time()
+        wall_seconds = run_finished - run_started
+        traces = self._transition_2_trace.values()
+
+        workers: dict[str, _WorkerSummary] = dict()
+        for trace in traces:
+            if trace.worker is not None and trace.started is not None:
+                workers.setdefault(trace.worker, _WorkerSummary()).intervals.append(
+                    (trace.started, trace.finished))
+        for worker in workers.values():
+            busy_until = run_started
+            for started, finished in sorted(worker.intervals):
+                gap = started - busy_until
+                if gap >= self._idle_gap_threshold:
+                    worker.idle_gap_count += 1
+                    worker.longest_idle_gap_seconds = max(worker.longest_idle_gap_seconds, gap)
+                # Overlapping intervals, coroutines on the loop, are counted once.
+                worker.busy_seconds += max(0.0, finished - max(started, busy_until))
+                busy_until = max(busy_until, finished)
+
+        return {
+            'wall_seconds': wall_seconds,
+            'queued_seconds': sum(t.dispatched - t.ready for t in traces),
+            'critical_path': [(t.name, t.applied - t.ready) for t in self._critical_path()],
+            'workers': {
+                name: {'busy_seconds': w.busy_seconds,
+                       'utilization': w.busy_seconds / wall_seconds if wall_seconds > 0 else 0.0,
+                       'idle_gap_count': w.idle_gap_count,
+                       'longest_idle_gap_seconds': w.longest_idle_gap_seconds}
+                for name, w in sorted(workers.items())},
+        }
+
+    def _critical_path(self) -> list[TransitionTrace]:
+        'Back from the last applied transition, each time through the input that came in last'
+        resource_id_2_trace = {rid: trace for trace in self._transition_2_trace.values()
+                               for rid in trace.out_resource_ids}
+        applied = [t for t in self._transition_2_trace.values() if t.applied is not None]
+        if not applied:
+            return []
+        path = [max(applied, key=lambda t: t.applied)]
+        while True:
+            producers = [resource_id_2_trace[rid] for rid in path[-1].in_resource_ids
+                         if rid in resource_id_2_trace and
+                         resource_id_2_trace[rid].applied is not None]
+            if not producers:
+                break
+            path.append(max(producers, key=lambda t: t.applied))
+        return path[::-1]
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = [f'wall {summary['wall_seconds']:.3f}s, '
+                 f'queued {summary['queued_seconds']:.3f}s summed over transitions',
+                 'critical path: ' + ' -> '.join(
+                     f'{name} {seconds:.3f}s' for name, seconds in summary['critical_path'])]
+        for name, w in summary['workers'].items():
+            lines.append(
+                f'{name}: busy {w['busy_seconds']:.3f}s ({w['utilization']:.0%}), '
+                f'{w['idle_gap_count']} idle gaps, longest {w['longest_idle_gap_seconds']:.3f}s')
+        return '\n'.join(lines)
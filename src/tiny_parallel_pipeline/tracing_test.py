@@ -0,0 +1,87 @@
+import asyncio
+import json
+import multiprocessing
+import pytest
+
+
+import tiny_parallel_pipeline as tpp
+
+from tiny_parallel_pipeline.entities.resource_test import DummyResource
+from tiny_parallel_pipeline.entities.transition_test import DummyTransitionCalculation
+
+
+def diamond_scheduler(allow_multiprocess_pool=False):
+    'Root feeds a slow and a fast branch, joined at the end'
+    root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+    slow, fast, joined = DummyResource('slow'), DummyResource('fast'), DummyResource('joined')
+    scheduler = tpp.Scheduler().add_transitions(
+        DummyTransitionCalculation('slow', in_res=[root], out_res=[slow],
+                                   simulate_async_sleep_period=0.1,
+                                   allow_multiprocess_pool=allow_multiprocess_pool),
+        DummyTransitionCalculation('fast', in_res=[root], out_res=[fast],
+                                   allow_multiprocess_pool=allow_multiprocess_pool),
+        DummyTransitionCalculation('join', in_res=[slow, fast], out_res=[joined]),
+    ).pull_all_resources_from_transitions()
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    return scheduler
+
+
+# --- Tests ---
+
+class TestTracer:
+    def test_event_loop_run(self):
+        tracer = tpp.Tracer()
+        is_ok, err_msg = asyncio.run(tpp.Executor(diamond_scheduler(), tracer=tracer).run())
+        assert is_ok, err_msg
+
+        traces = {t.name: t for t in tracer.traces}
+        assert sorted(traces) == ['fast', 'join', 'slow']
+        for t in traces.values():
+            assert t.ready <= t.dispatched <= t.started <= t.finished <= t.applied
+            assert t.worker == 'event loop' and t.attempt_count == 1 and t.is_ok
+        assert traces['join'].ready == traces['slow'].applied
+
+        summary = tracer.summary()
+        assert [name for name, _ in summary['critical_path']] == ['slow', 'join']
+        assert list(summary['workers']) == ['event loop']
+        assert 0.0 < summary['workers']['event loop']['utilization'] <= 1.0
+        assert 'critical path: slow' in tracer.format_summary()
+
+    def test_pool_run_chrome_trace(self, tmp_path):
+        tracer = tpp.Tracer()
+        with multiprocessing.Pool(2) as pool:
+            is_ok, err_msg = asyncio.run(
+                tpp.Executor(diamond_scheduler(True), pool, tracer=tracer).run())
+        assert is_ok, err_msg
+
+        traces = {t.name: t for t in tracer.traces}
+        for name in ['slow', 'fast']:
+            assert traces[name].worker.startswith('pid ')
+            assert traces[name].request_bytes > 0 and traces[name].response_bytes > 0
+        assert traces['join'].worker == 'event loop'
+        assert traces['join'].request_bytes == 0
+
+        path = tmp_path / 'trace.json'
+        tracer.save_chrome_trace(str(path))
+        events = json.loads(path.read_text())['traceEvents']
+        assert sorted(e['name'] for e in events if e['ph'] == 'X') == ['fast', 'slow']
+        assert {e['cat'] for e in events if e['ph'] == 'b'} == {'queued', 'applying', 'executing'}
+        assert sum(e['ph'] == 'b' for e in events) == sum(e['ph'] == 'e' for e in events)
+
+    def test_cache_hit(self, tmp_path):
+        def run():
+            root = DummyResource('root').populate_data('d').update_status(tpp.ResourceStatus.READY)
+            scheduler = tpp.Scheduler().add_transitions(DummyTransitionCalculation(
+                'T1', in_res=[root]).set_cache_fingerprint('v1')
+            ).pull_all_resources_from_transitions()
+            assert scheduler.compile()[0]
+            tracer = tpp.Tracer()
+            is_ok, err_msg = asyncio.run(tpp.Executor(scheduler, cache=cache, tracer=tracer).run())
+            assert is_ok, err_msg
+            return tracer.traces[0]
+
+        cache = tpp.ResultCache()
+        assert not run().cached
+        trace = run()
+        assert trace.cached and trace.started is None and trace.is_ok
@@ -0,0 +1,141 @@
+import asyncio
+import contextlib
+import copy
+import faulthandler
+import os
+import pickle
+import signal
+import threading
+import time
+
+
+from tiny_parallel_pipeline import ResourceStatus, Resource, TransitionCalculation
+
+
+class TransitionRegistry:
+    '''Static configuration of pool transitions, installed once per pool worker.
+
+    Pass registry.install as the pool initializer and the registry as Executor(registry=...);
+    with fork the registry is inherited, with spawn it is pickled once per worker. A task for a
+    registered transition then carries only the registry key and the data of inputs that were
+    not READY when the registry was built, and brings back only the out resources.
+    '''
+    def __init__(self, *transitions: list[TransitionCalculation]):
+        self._transition_2_key: dict[TransitionCalculation, int] = dict()
+        self._key_2_shell: list[TransitionCalculation] = []
+        self._key_2_dynamic_input_indices: list[list[int]] = []
+        for t in transitions:
+            self._add(t)
+
+    @classmethod
+    def from_scheduler(cls, scheduler: 'Scheduler') -> 'TransitionRegistry':
+        'Registry of every transition of the scheduler that may run in the pool'
+        return cls(*[t for t in scheduler._transitions if t.allow_multiprocess_pool])
+
+    def _add(self, transition: TransitionCalculation) -> None:
+        if transition in self._transition_2_key:
+            return
+        dynamic_input_indices = [i for i, r in enumerate(transition._in_resources)
+                                 if r.status != ResourceStatus.READY]
+        shell = copy.copy(transition)
+        shell._in_resources = [copy.copy(r) if i in dynamic_input_indices else r
+                               for i, r in enumerate(transition._in_resources)]
+        shell._out_resources = [copy.copy(r) for r in transition._out_resources]
+        self._transition_2_key[transition] = len(self._key_2_shell)
+        self._key_2_shell.append(shell)
+        self._key_2_dynamic_input_indices.append(dynamic_input_indices)
+
+    def __len__(self):
+        return len(self._key_2_shell)
+
+    def task_args(self, transition: TransitionCalculation) -> tuple[int, list[any]] | None:
+        'Arguments of run_registered_transition_execute for transition, None if not registered'
+        key = self._transition_2_key.get(transition)
+        if key is None:
+            return None
+        return key, [transition._in_resources[i].data
+                     for i in self._key_2_dynamic_input_indices[key]]
+
+    def install(self) -> None:
+        global _worker_registry
+        _worker_registry = self
+
+    def __getstate__(self):
+        # Worker side lookups go by key only.
+        return {'_transition_2_key': dict(), '_key_2_shell': self._key_2_shell,
+                '_key_2_dynamic_input_indices': self._key_2_dynamic_input_indices}
+
+
+_worker_registry: TransitionRegistry | None = None
+
+
+@contextlib.contextmanager
+def worker_deadline(timeout: float | None, hard_kill_grace: float | None = None,
+                    deadline: float | None = None):
+    '''Enforce a transition timeout and the pipeline deadline in a pool worker, also on blocking
+    code.
+
+    SIGALRM raises TimeoutError in the worker's main thread after timeout seconds or at deadline,
+    a time.time() instant, whichever comes first. If the worker is still stuck in native code
+    hard_kill_grace seconds later, faulthandler exits the process.
+    '''
+    message = f'Timed out after {timeout}s.'
+    if deadline is not None:
+        time_left = deadline - time.time()
+        if timeout is None or time_left < timeout:
+            timeout, message = time_left, 'Pipeline deadline exceeded.'
+        if timeout <= 0:
+            raise TimeoutError(message)
+    use_alarm = (timeout is not None and hasattr(signal, 'setitimer') and
+                 threading.current_thread() is threading.main_thread())
+    if use_alarm:
+        def on_alarm(signum, frame):
+            raise TimeoutError(message)
+        previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    hard_kill = timeout is not None and hard_kill_grace is not None
+    if hard_kill:
+        faulthandler.dump_traceback_later(timeout + hard_kill_grace, exit=True)
+    try:
+        yield
+    finally:
+        if hard_kill:
+            faulthandler.cancel_dump_traceback_later()
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+def worker_trace(started: float, result: tuple) -> tuple[str, float, float, int]:
+    'Where and when a pool task ran and its pickled result size, see Tracer.on_executed'
+    finished = time.time()
+    return (f'pid {os.getpid()}', started, finished,
+            len(pickle.dumps(result, pickle.HIGHEST_PROTOCOL)))
+
+
+def run_registered_transition_execute(
+        key: int, dynamic_in_data: list[any], hard_kill_grace: float | None = None,
+        deadline: float | None = None, traced: bool = False
+        ) -> tuple[bool, str | None, list[Resource], list[TransitionCalculation],
+                   tuple[str, float, float, int] | None]:
+    if _worker_registry is None:
+        raise RuntimeError(
+            'Pool worker has no TransitionRegistry, pass registry.install as pool initializer')
+    started = time.time()
+    shell = _worker_registry._key_2_shell[key]
+    dynamic_inputs = [shell._in_resources[i]
+                      for i in _worker_registry._key_2_dynamic_input_indices[key]]
+    for r, data in zip(dynamic_inputs, dynamic_in_data):
+        r.populate_data(data).update_status(ResourceStatus.READY)
+    for r in shell._out_resources:
+        r.populate_data(None).update_status(ResourceStatus.EMPTY)
+    try:
+        with worker_deadline(shell.timeout, hard_kill_grace, deadline):
+            is_ok, err_msg = asyncio.run(shell.execute())
+        result = is_ok, err_msg, list(shell._out_resources), shell.pop_emitted_transitions()
+    except TimeoutError as e:
+        result = False, str(e), list(shell._out_resources), []
+    finally:
+        for r in dynamic_inputs:
+            r.populate_data(None).update_status(ResourceStatus.EMPTY)
+    return result + (worker_trace(started, result) if traced else None,)
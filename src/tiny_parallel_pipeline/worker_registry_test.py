@@ -0,0 +1,75 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import pickle
+import pytest
+
+
+import tiny_parallel_pipeline as tpp
+from tiny_parallel_pipeline.worker_registry import run_registered_transition_execute
+
+from tiny_parallel_pipeline.entities.resource_test import DummyResource
+from tiny_parallel_pipeline.entities.transition_test import DummyTransitionCalculation
+
+
+def pool_chain_scheduler():
+    resources = [DummyResource(f'r{i}') for i in range(4)]
+    resources[0].populate_data('d0').update_status(tpp.ResourceStatus.READY)
+    transitions = [
+        DummyTransitionCalculation(f'T{i}', data_add_pid=True, allow_multiprocess_pool=True)
+                .set_in_resources(resources[i - 1])
+                .set_out_resources(resources[i])
+            for i in range(1, len(resources))
+    ]
+    scheduler = tpp.Scheduler().add_transitions(*transitions).pull_all_resources_from_transitions()
+    is_ok, err_msg = scheduler.compile()
+    assert is_ok, err_msg
+    return scheduler, resources, transitions
+
+
+# --- Tests ---
+
+class TestTransitionRegistry:
+    def test_task_args(self):
+        scheduler, resources, transitions = pool_chain_scheduler()
+        registry = tpp.TransitionRegistry.from_scheduler(scheduler)
+        assert len(registry) == 3
+
+        assert registry.task_args(transitions[0]) == (0, [])
+        resources[1].populate_data('d1')
+        assert registry.task_args(transitions[1]) == (1, ['d1'])
+        assert registry.task_args(DummyTransitionCalculation('other')) is None
+
+    def test_registry_pickles_without_lookup(self):
+        _, _, transitions = pool_chain_scheduler()
+        registry = pickle.loads(pickle.dumps(tpp.TransitionRegistry(*transitions)))
+        assert len(registry) == 3
+        assert registry.task_args(transitions[0]) is None
+
+    def test_executor_with_registry(self):
+        scheduler, resources, _ = pool_chain_scheduler()
+        registry = tpp.TransitionRegistry.from_scheduler(scheduler)
+
+        with multiprocessing.Pool(2, initializer=registry.install) as pool:
+            asyncio.run(tpp.Executor(scheduler, pool, registry=registry).run())
+
+        assert scheduler.remaining_resources_count() == 0
+        assert [r.data[0] for r in resources[1:]] == ['by T1 r0', 'by T2 r1', 'by T3 r2']
+        assert os.getpid() not in set(r.data[1] for r in resources[1:])
+
+    def test_executor_with_registry_spawn(self):
+        scheduler, resources, _ = pool_chain_scheduler()
+        registry = tpp.TransitionRegistry.from_scheduler(scheduler)
+
+        with concurrent.futures.ProcessPoolExecutor(
+                1, mp_context=multiprocessing.get_context('spawn'),
+                initializer=registry.install) as pool:
+            asyncio.run(tpp.Executor(scheduler, pool, registry=registry).run())
+
+        assert [r.data[0] for r in resources[1:]] == ['by T1 r0', 'by T2 r1', 'by T3 r2']
+
+    def test_worker_without_registry(self):
+        with multiprocessing.Pool(1) as pool:
+            with pytest.raises(RuntimeError, match='no TransitionRegistry'):
+                pool.apply(run_registered_transition_execute, (0, []))